@@ -14,11 +14,22 @@ from collections import defaultdict
 current_dir = Path(__file__).parent
 sys.path.insert(0, str(current_dir))
 
-from renamer import suggest_name, FileRenamer, RenameStatus
+from renamer import suggest_name, parse_demo_metadata, FileRenamer, RenameStatus
+from prefetch import DEFAULT_DEPTH, Prefetcher
 
 class BatchDemoRenamer:
-    def __init__(self):
-        self.renamer = FileRenamer()
+    def __init__(self, use_index: bool = False, prefetch_depth: int = DEFAULT_DEPTH, dedupe_runs: bool = False):
+        # use_index: answer collision checks from one scan of the directory
+        # instead of a stat per demo (see renamer.DirectoryIndex).
+        self.renamer = FileRenamer(use_index=use_index)
+        # prefetch_depth: demos read ahead into the page cache while the
+        # current one is hashed or parsed (see prefetch.py).
+        self.prefetcher = Prefetcher(prefetch_depth)
+        # dedupe_runs: also delete demos whose run fingerprint was already seen
+        # (same run, different bytes; see demoparser/fingerprint.py).
+        self.dedupe_runs = dedupe_runs
+        self._run_fingerprints = {}
+        self._conflict_dirs = set()
 
     def calculate_md5(self, file_path: Path) -> str:
         """Calculate MD5 hash of a file"""
@@ -35,7 +46,7 @@ class BatchDemoRenamer:
         md5_groups = defaultdict(list)
 
         # Group files by MD5 hash
-        for demo_file in demo_files:
+        for demo_file in self.prefetcher.iterate(demo_files):
             try:
                 md5_hash = self.calculate_md5(demo_file)
                 md5_groups[md5_hash].append(demo_file)
@@ -56,7 +67,7 @@ class BatchDemoRenamer:
                 for duplicate in identical_files:
                     if duplicate != keep_file:
                         try:
-                            duplicate.unlink()
+                            self.renamer.delete(duplicate)
                             deleted_count += 1
                             print(f"    Deleted duplicate: {duplicate.name}")
                         except Exception as e:
@@ -76,6 +87,17 @@ class BatchDemoRenamer:
             print(f"    Error parsing {demo_file}: {e}")
             return None
 
+    def get_name_and_fingerprint(self, demo_file: Path):
+        """(suggested filename, run fingerprint) from one parse; (None, None) if it fails"""
+        try:
+            metadata = parse_demo_metadata(demo_file, fingerprint=True)
+        except Exception as e:
+            print(f"    Error parsing {demo_file}: {e}")
+            return None, None
+        if not metadata:
+            return None, None
+        return metadata['suggested_filename'], metadata.get('fingerprint')
+
     def rename_demo(self, demo_file: Path, suggested_name: str, create_conflicts_dir: bool = True) -> str:
         """Rename a demo file, handling conflicts (same name, different content)"""
         new_path = demo_file.parent / suggested_name
@@ -98,14 +120,16 @@ class BatchDemoRenamer:
                 if create_conflicts_dir:
                     # Move to conflicts directory
                     conflicts_dir = demo_file.parent / "_conflicts"
-                    conflicts_dir.mkdir(exist_ok=True)
+                    if conflicts_dir not in self._conflict_dirs:
+                        conflicts_dir.mkdir(exist_ok=True)
+                        self._conflict_dirs.add(conflicts_dir)
 
                     import time
                     timestamp = int(time.time())
                     conflict_name = f"{demo_file.stem}_{timestamp}{demo_file.suffix}"
                     conflict_path = conflicts_dir / conflict_name
 
-                    demo_file.rename(conflict_path)
+                    self.renamer.relocate(demo_file, conflict_path)
                     return f"conflict_moved_to_{conflict_path.name}"
                 else:
                     return "name_conflict_skipped"
@@ -130,30 +154,50 @@ class BatchDemoRenamer:
         # Step 1: Deduplicate by MD5 first
         demo_files = self.deduplicate_by_md5(demo_files)
         print(f"After MD5 deduplication: {len(demo_files)} unique files remaining")
+        if self.dedupe_runs:
+            # Oldest first, so the copy of a run that is kept is the oldest one
+            demo_files.sort(key=lambda x: x.stat().st_mtime)
 
         stats = {
             "processed": 0,
             "renamed": 0,
             "already_named": 0,
             "identical_deleted": 0,
+            "same_run_deleted": 0,
             "conflicts": 0,
             "errors": 0
         }
 
-        for i, demo_file in enumerate(demo_files, 1):
+        for i, demo_file in enumerate(self.prefetcher.iterate(demo_files), 1):
             stats["processed"] += 1
             print(f"[{i}/{len(demo_files)}] Processing {demo_file.name}...", end="")
 
             try:
                 # Get suggested name from new Python implementation
-                suggested_name = self.get_suggested_name(demo_file)
+                if self.dedupe_runs:
+                    suggested_name, fingerprint = self.get_name_and_fingerprint(demo_file)
+                else:
+                    suggested_name, fingerprint = self.get_suggested_name(demo_file), None
                 if not suggested_name:
                     print(" ERROR: Could not parse demo")
                     stats["errors"] += 1
                     continue
 
+                kept = self._run_fingerprints.get(fingerprint) if fingerprint else None
+                if kept is not None:
+                    self.renamer.delete(demo_file)
+                    stats["same_run_deleted"] += 1
+                    print(f" (same run as {kept.name}, deleted)")
+                    continue
+
                 # Rename the file
                 result = self.rename_demo(demo_file, suggested_name, create_conflicts_dir)
+                # A run is only kept by a copy that ends up under its proper
+                # name; one moved to _conflicts or left alone does not count.
+                if fingerprint and result in ("renamed", "identical_deleted"):
+                    self._run_fingerprints[fingerprint] = demo_file.parent / suggested_name
+                elif fingerprint and result == "already_named":
+                    self._run_fingerprints[fingerprint] = demo_file
 
                 if result == "renamed":
                     stats["renamed"] += 1
@@ -182,17 +226,30 @@ class BatchDemoRenamer:
 
 def main():
     if len(sys.argv) < 2:
-        print("Usage: python BatchDemoRenamer.py <demo_directory> [--no-conflicts-dir]")
+        print("Usage: python BatchDemoRenamer.py <demo_directory> [--no-conflicts-dir] [--name-index] [--prefetch K] [--dedupe-runs]")
         print("Renames all demo files in the specified directory based on their content.")
         print("Options:")
         print("  --no-conflicts-dir    Don't create _conflicts directory, just skip duplicates")
+        print("  --name-index          Scan the directory once and check name collisions in memory")
+        print(f"  --prefetch K          Read K demos ahead into the page cache (default: {DEFAULT_DEPTH}, 0 disables)")
+        print("  --dedupe-runs         Delete demos holding the same run as an older one, even if their bytes differ")
         sys.exit(1)
 
     demo_directory = sys.argv[1]
     create_conflicts_dir = "--no-conflicts-dir" not in sys.argv
+    use_index = "--name-index" in sys.argv
+    dedupe_runs = "--dedupe-runs" in sys.argv
+    prefetch_depth = DEFAULT_DEPTH
+    if "--prefetch" in sys.argv:
+        index = sys.argv.index("--prefetch")
+        try:
+            prefetch_depth = int(sys.argv[index + 1])
+        except (IndexError, ValueError):
+            print("Error: --prefetch expects a number")
+            sys.exit(1)
 
     try:
-        renamer = BatchDemoRenamer()
+        renamer = BatchDemoRenamer(use_index=use_index, prefetch_depth=prefetch_depth, dedupe_runs=dedupe_runs)
         stats = renamer.process_directory(demo_directory, create_conflicts_dir)
 
         print(f"\nSummary:")
@@ -200,8 +257,11 @@ def main():
         print(f"  Renamed: {stats['renamed']}")
         print(f"  Already named: {stats['already_named']}")
         print(f"  Identical deleted: {stats['identical_deleted']}")
+        if dedupe_runs:
+            print(f"  Same run deleted: {stats['same_run_deleted']}")
         print(f"  Name conflicts: {stats['conflicts']}")
         print(f"  Errors: {stats['errors']}")
+        print(f"  I/O: {renamer.prefetcher.summary()}")
 
     except Exception as e:
         print(f"Error: {e}")
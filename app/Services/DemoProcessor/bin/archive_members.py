@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Parse every demo in an uploaded archive without extracting it.
+
+ExtractAndQueueArchiveJob unpacks a whole ZIP/RAR/7z upload to disk before it
+looks at a single demo. This walks the archive's members in memory instead
+(demoparser/sources.py) and prints one JSON line per member:
+
+    {"member": "demos/map[df.vq3]00.12.345(player).dm_68", "name": "...",
+     "size": 123456, "mtime": 1700000000, "md5": "...", "sha256": "...",
+     "is_demo": true, "duplicate_of": null, "metadata": {...}}
+
+`metadata` is what process_single_demo.py --json prints for the demo, or
+`error` says why it could not be parsed (a demo over the size limit in
+demoparser/sources.py is not even read). Members that are not demos are
+listed with "is_demo": false and no digests, since they are never
+decompressed, and a demo with the same MD5 as an earlier member names
+that member in `duplicate_of` and is not parsed again. A demo with other bytes
+but the same run as an earlier member (the run fingerprint,
+demoparser/fingerprint.py) names it in `same_run_as`. So invalid, duplicate
+and stray files are all known before anything is written to disk.
+
+Exits 1, with {"error": ...} on stderr, when the archive itself cannot be read
+(corrupt, password-protected, 7-Zip missing).
+
+Usage: archive_members.py <archive.zip|.7z|.rar> [--output FILE]
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import warnings
+from pathlib import Path
+from typing import Dict, Iterator
+
+warnings.filterwarnings('ignore')
+
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir))
+
+from demoparser.sources import ArchiveMember, iter_archive
+
+
+def member_record(member: ArchiveMember, seen: Dict[str, str], runs: Dict[str, str]) -> dict:
+    """The JSON record for one member.
+
+    `seen` maps MD5, and `runs` run fingerprints, to the first member that had it.
+    """
+    from renamer import parse_demo_metadata
+
+    record: dict = {
+        'member': member.name,
+        'name': os.path.basename(member.name),
+        'size': member.size,
+        'mtime': member.mtime,
+        'md5': None,
+        'sha256': None,
+        'is_demo': member.is_demo,
+        'duplicate_of': None,
+    }
+    # Only demos are decompressed into memory (see sources.iter_archive).
+    if member.data is None:
+        if member.error:
+            record['error'] = member.error
+        return record
+    md5 = record['md5'] = hashlib.md5(member.data).hexdigest()
+    record['sha256'] = hashlib.sha256(member.data).hexdigest()
+    record['duplicate_of'] = seen.get(md5)
+    seen.setdefault(md5, member.name)
+    if record['duplicate_of'] is not None:
+        return record
+    try:
+        metadata = parse_demo_metadata(Path(record['name']), data=member.data, fingerprint=True)
+    except Exception as e:
+        record['error'] = str(e)
+        return record
+    if metadata:
+        record['metadata'] = metadata
+        fingerprint = metadata.get('fingerprint')
+        if fingerprint:
+            record['same_run_as'] = runs.get(fingerprint)
+            runs.setdefault(fingerprint, member.name)
+    else:
+        record['error'] = 'Could not parse demo file'
+    return record
+
+
+def iter_records(archive: Path) -> Iterator[dict]:
+    seen: Dict[str, str] = {}
+    runs: Dict[str, str] = {}
+    for member in iter_archive(archive):
+        yield member_record(member, seen, runs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Parse every demo in a ZIP/RAR/7z upload without extracting it')
+    parser.add_argument('archive', type=Path, help='The uploaded archive')
+    parser.add_argument('--output', type=Path, help='Write the JSON lines here instead of stdout')
+    args = parser.parse_args()
+
+    if not args.archive.exists():
+        print(json.dumps({'error': f'Archive not found: {args.archive}'}), file=sys.stderr)
+        sys.exit(1)
+
+    output = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    counts = {'members': 0, 'demos': 0, 'parsed': 0, 'failed': 0, 'duplicates': 0, 'same_run': 0}
+    try:
+        for record in iter_records(args.archive):
+            counts['members'] += 1
+            if record['is_demo']:
+                counts['demos'] += 1
+                if record['duplicate_of'] is not None:
+                    counts['duplicates'] += 1
+                else:
+                    counts['failed' if 'error' in record else 'parsed'] += 1
+                if record.get('same_run_as'):
+                    counts['same_run'] += 1
+            output.write(json.dumps(record) + '\n')
+            output.flush()
+    except Exception as e:
+        print(json.dumps({'error': str(e) or type(e).__name__}), file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    print(f"Members: {counts['members']}, demos: {counts['demos']}, parsed: {counts['parsed']}, "
+          f"failed: {counts['failed']}, duplicates: {counts['duplicates']}, same run: {counts['same_run']}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
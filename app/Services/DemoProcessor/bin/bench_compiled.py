@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Compares the parser builds a deploy can choose from:
+
+  python    sources, pure-Python Huffman reader
+  c-reader  sources, _q3huff reader, message by message
+  compiled  mypyc-compiled modules (demoparser/setup_mypyc.py), _q3huff reader
+  native    whole demo decoded in one _q3huff call (demoparser/native.py)
+
+Each mode runs in its own interpreter, parses every demo --runs times and
+reports the median. Modes that are not built here are skipped.
+
+Usage: python3 bench_compiled.py <demo>... [--runs N] [--json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+current_dir = Path(__file__).parent
+
+MODES = ('python', 'c-reader', 'compiled', 'native')
+# The builds build_bundle.py chooses between; native is used on top of either.
+BUILD_MODES = ('python', 'c-reader', 'compiled')
+
+
+def run_child(mode: str, demos, runs: int) -> None:
+    """Inside the benchmark interpreter: parse the demos and print the timings as JSON."""
+    sys.path.insert(0, str(current_dir))
+    from demoparser import _compiled, native
+    import demoparser.huffman as huffman
+    import demoparser.parser as parser_mod
+
+    if mode == 'compiled' and not _compiled.ACTIVE:
+        print(json.dumps({'skipped': 'compiled modules are not built or are out of date'}))
+        return
+    if mode != 'python' and not huffman._HAS_C_EXTENSION:
+        print(json.dumps({'skipped': '_q3huff is not built'}))
+        return
+    if mode == 'native' and not native.AVAILABLE:
+        print(json.dumps({'skipped': '_q3huff was built without decode_demo'}))
+        return
+    if mode == 'python':
+        parser_mod.Q3HuffmanReader = huffman._Q3HuffmanReaderPython
+
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        for demo in demos:
+            parser_mod.Q3DemoParser(demo).parse_config()
+        timings.append(time.perf_counter() - started)
+    print(json.dumps({'timings': timings}))
+
+
+def bench_mode(mode: str, demos, runs: int) -> dict:
+    env = dict(os.environ)
+    if mode == 'compiled':
+        env.pop('DEMOPARSER_NO_COMPILED', None)
+    else:
+        env['DEMOPARSER_NO_COMPILED'] = '1'
+    if mode == 'native':
+        env.pop('DEMOPARSER_NO_NATIVE', None)
+    else:
+        env['DEMOPARSER_NO_NATIVE'] = '1'
+    result = subprocess.run(
+        [sys.executable, '-W', 'ignore', str(Path(__file__).resolve()), '--child', mode, '--runs', str(runs), *demos],
+        capture_output=True,
+        text=True,
+        env=env,
+    )
+    if result.returncode != 0:
+        return {'skipped': result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'failed'}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def run_benchmark(demos, runs: int, modes=MODES) -> dict:
+    """{mode: {'median': seconds, 'mb_per_s': ...} or {'skipped': reason}}."""
+    total_bytes = sum(os.path.getsize(demo) for demo in demos)
+    results = {}
+    for mode in modes:
+        outcome = bench_mode(mode, demos, runs)
+        if 'timings' in outcome:
+            median = statistics.median(outcome['timings'])
+            outcome = {'median': median, 'mb_per_s': total_bytes / (1024 * 1024) / median if median else 0.0}
+        results[mode] = outcome
+    return results
+
+
+def fastest(results: dict):
+    timed = {mode: result['median'] for mode, result in results.items() if 'median' in result}
+    return min(timed, key=timed.get) if timed else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare pure-Python, C-reader, mypyc-compiled and native parser builds')
+    parser.add_argument('demos', nargs='+', help='Demo files to parse in every mode')
+    parser.add_argument('--runs', type=int, default=5, help='Parses of the whole set per mode (default: 5)')
+    parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+    parser.add_argument('--child', choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.demos, args.runs)
+        return
+
+    results = run_benchmark(args.demos, args.runs)
+    best = fastest(results)
+    if args.json:
+        print(json.dumps({'results': results, 'fastest': best}))
+        return
+    for mode, result in results.items():
+        if 'median' in result:
+            print(f"{mode:<10} {result['median'] * 1000:9.1f} ms {result['mb_per_s']:8.2f} MB/s")
+        else:
+            print(f"{mode:<10} skipped: {result['skipped']}")
+    print(f"Fastest: {best or 'none'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+"""
+Stage-level benchmark of the demo pipeline, with stored baselines.
+
+bench_compiled.py compares whole builds; this times each stage of one build on
+its own, so a change can be shown to have made a stage faster or slower:
+
+  framing   Q3MessageStream splitting the file into messages
+  huffman   decoding every symbol of every message, nothing else
+  snapshots Q3DemoConfigParser applying gamestate, snapshot and entity deltas,
+            fed values already decoded (the replay phase of parallel.py)
+  raw_info  RawInfo construction, console parsing and finish search included
+  console   ConsoleComandsParser on its own
+  naming    Demo.GetDemoFromRawInfo
+  pipeline  the whole parse_config plus naming, as an upload pays for it
+
+The corpus is a directory of demos, or by default a synthetic one written by
+this script from a fixed seed, so numbers from different machines or branches
+describe the same input. Each stage's figure is the median, over --runs, of
+its total time across the corpus.
+
+--save FILE stores the result as a JSON baseline; --compare FILE reports the
+change against one and exits non-zero when a stage got slower by more than
+--threshold.
+
+Usage: bench_stages.py [--corpus DIR | --synthetic DIR] [--runs N] [--save FILE] [--compare FILE [--threshold 0.1]]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import struct
+import sys
+import tempfile
+import time
+import warnings
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+warnings.filterwarnings('ignore')
+
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir))
+
+STAGES = ('framing', 'huffman', 'snapshots', 'raw_info', 'console', 'naming', 'pipeline')
+DEFAULT_THRESHOLD = 0.10
+SYNTHETIC_SEED = 20240101
+
+
+# ----------------------------------------------------------------------
+# Synthetic corpus
+
+class _BitWriter:
+    """The inverse of Q3HuffmanReader, for as much of the protocol as the corpus uses."""
+
+    _codes: Optional[Dict[int, List[int]]] = None
+
+    def __init__(self) -> None:
+        self.bits: List[int] = []
+        if _BitWriter._codes is None:
+            _BitWriter._codes = self._build_codes()
+
+    @staticmethod
+    def _build_codes() -> Dict[int, List[int]]:
+        from demoparser import const
+        from demoparser.huffman import Q3HuffmanMapper
+
+        Q3HuffmanMapper.init()
+        codes: Dict[int, List[int]] = {}
+        pending = [(Q3HuffmanMapper.rootNode, [])]
+        while pending:
+            node, path = pending.pop()
+            if node is None:
+                continue
+            if node.symbol != const.Q3_HUFFMAN_NYT_SYM:
+                codes[node.symbol] = path
+                continue
+            pending.append((node.left, path + [0]))
+            pending.append((node.right, path + [1]))
+        return codes
+
+    def raw(self, value: int, bits: int) -> None:
+        self.bits.extend((value >> shift) & 1 for shift in range(bits))
+
+    def symbol(self, value: int) -> None:
+        self.bits.extend(self._codes[value])
+
+    def num(self, value: int, bits: int) -> None:
+        value &= (1 << bits) - 1
+        fragment = bits & 7
+        if fragment:
+            self.raw(value, fragment)
+            value >>= fragment
+            bits -= fragment
+        for offset in range(0, bits, 8):
+            self.symbol((value >> offset) & 0xFF)
+
+    def long(self, value: int) -> None:
+        self.num(value, 32)
+
+    def string(self, text: str) -> None:
+        for byte in text.encode('ascii'):
+            self.symbol(byte)
+        self.symbol(0)
+
+    def float_integral(self, value: int) -> None:
+        self.raw(0, 1)
+        self.num(value + 4096, 13)
+
+    def delta_fields(self, fields: Dict[int, object], write) -> None:
+        count = max(fields) + 1 if fields else 0
+        self.symbol(count)
+        for index in range(count):
+            self.raw(1 if index in fields else 0, 1)
+            if index in fields:
+                write(index, fields[index])
+
+    def data(self) -> bytes:
+        out = bytearray((len(self.bits) + 7) // 8)
+        for index, bit in enumerate(self.bits):
+            if bit:
+                out[index >> 3] |= 1 << (index & 7)
+        return bytes(out)
+
+
+def _write_demo(path: Path, rng: random.Random, runs: int, frames: int, entities: int, chat: int, mapname: str) -> None:
+    messages = []
+    w = _BitWriter()
+    w.long(0)
+    w.symbol(2)  # gamestate
+    w.long(0)
+    configs = {
+        0: f'\\mapname\\{mapname}\\defrag_vers\\19123\\defrag_gametype\\5\\defrag_mode\\0\\df_promode\\0'
+           '\\sv_fps\\125\\g_speed\\320\\g_gravity\\800\\timescale\\1\\sv_cheats\\0\\fs_game\\defrag',
+        1: '\\g_synchronousclients\\0\\pmove_fixed\\1\\pmove_msec\\8\\sv_cheats\\0',
+        3: mapname,
+        544: 'n\\Bench\\dfn\\Bench\\c1\\4',
+    }
+    for key, value in configs.items():
+        w.symbol(3)  # configstring
+        w.num(key, 16)
+        w.string(value)
+    w.symbol(8)
+    w.long(0)
+    w.long(0)
+    w.symbol(8)
+    messages.append(w.data())
+
+    server_time = 1000
+    stat = 0
+    command = 0
+    for run in range(runs):
+        run_ms = rng.randint(5000, 30000)
+        for frame in range(frames):
+            server_time += 8
+            w = _BitWriter()
+            w.long(0)
+            for _ in range(chat):
+                command += 1
+                w.symbol(5)  # server command
+                w.long(command)
+                w.string(f'chat "^2Player{rng.randint(1, 9)}^7: message {command}"')
+            w.symbol(7)  # snapshot
+            w.long(server_time)
+            w.symbol(0 if not messages[1:] else 1)
+            w.symbol(0)
+            w.symbol(0)
+            player = {0: server_time, 1: rng.randint(-2000, 2000), 2: rng.randint(-2000, 2000),
+                      4: rng.randint(-900, 900), 5: rng.randint(-900, 900), 9: rng.randint(-100, 100)}
+            w.delta_fields(player, lambda index, value: w.long(value) if index == 0 else w.float_integral(value))
+            stats = {}
+            if frame == 2:
+                stat ^= 4
+                stats[12] = stat
+            elif frame == frames - 3:
+                stat ^= 8
+                stats.update({12: stat, 7: (run_ms >> 16) & 0xFFFF, 8: run_ms & 0xFFFF})
+            w.raw(1 if stats else 0, 1)
+            if stats:
+                w.raw(1, 1)
+                w.num(sum(1 << index for index in stats), 16)
+                for index in sorted(stats):
+                    w.num(stats[index], 16)
+                w.raw(0, 3)
+            for number in range(1, entities + 1):
+                w.num(number, 10)
+                w.raw(0, 1)
+                w.raw(1, 1)
+                origin = {24: rng.randint(-4000, 4000), 25: rng.randint(-4000, 4000), 26: rng.randint(-500, 500)}
+
+                def entity_field(index, value):
+                    w.raw(1, 1)  # not reset
+                    w.float_integral(value)
+                w.delta_fields(origin, entity_field)
+            w.num(1023, 10)
+            if frame == frames - 2:
+                minutes, seconds = divmod(run_ms // 1000, 60)
+                command += 1
+                w.symbol(5)
+                w.long(command)
+                w.string(f'print "Bench^7 reached the finish line in ^3{minutes}:{seconds:02}:{run_ms % 1000:03}^7\n"')
+            w.symbol(8)
+            messages.append(w.data())
+
+    with open(path, 'wb') as handle:
+        for sequence, data in enumerate(messages):
+            handle.write(struct.pack('<ii', sequence, len(data)))
+            handle.write(data)
+        handle.write(struct.pack('<ii', -1, -1))
+
+
+def write_synthetic_corpus(directory: Path) -> List[Path]:
+    """A fixed set of demos: a short run, practice runs, a chatty demo and an entity-heavy one."""
+    directory.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(SYNTHETIC_SEED)
+    shapes = (
+        ('short_run', 1, 60, 0, 0),
+        ('practice', 8, 200, 2, 0),
+        ('chatty', 1, 800, 4, 0),
+        ('entities', 2, 500, 32, 1),
+    )
+    demos = []
+    for name, runs, frames, entities, chat in shapes:
+        path = directory / f'{name}.dm_68'
+        _write_demo(path, rng, runs, frames, entities, chat, f'bench_{name}')
+        demos.append(path)
+    return demos
+
+
+def find_corpus(directory: Path) -> List[Path]:
+    return sorted(p for pattern in ('*.dm_6?', '*.dm_9?') for p in directory.rglob(pattern))
+
+
+# ----------------------------------------------------------------------
+# Stages
+
+def _timed(function) -> float:
+    started = time.perf_counter()
+    function()
+    return time.perf_counter() - started
+
+
+def _read_messages(demo: Path) -> list:
+    from demoparser.parser import Q3MessageStream
+
+    stream = Q3MessageStream(str(demo))
+    messages = []
+    try:
+        while True:
+            message = stream.next_message()
+            if message is None:
+                return messages
+            messages.append(message)
+    finally:
+        stream.close()
+
+
+def _decode_symbols(messages) -> None:
+    from demoparser.parser import Q3HuffmanReader
+
+    for message in messages:
+        reader = Q3HuffmanReader(message.data)
+        while not reader.isEOD():
+            reader.readByte()
+
+
+def _replay(messages, records):
+    from demoparser.parallel import _ReplayReader
+    from demoparser.parser import Q3DemoConfigParser
+
+    parser = Q3DemoConfigParser()
+    for message, recorded in zip(messages, records):
+        if recorded is None:
+            parser.parse(message)
+        else:
+            parser.parse_with_reader(message, _ReplayReader(recorded))
+    return parser
+
+
+def _pipeline(demo: Path) -> None:
+    from demo import Demo
+    from demoparser.parser import Q3DemoParser
+
+    Demo.GetDemoFromRawInfo(Q3DemoParser(str(demo)).parse_config())
+
+
+def time_demo(demo: Path) -> Dict[str, float]:
+    """Seconds each stage took on one demo, once."""
+    from console_commands_parser import ConsoleComandsParser
+    from demo import Demo
+    from demoparser.parallel import _decode_chunk
+    from raw_info import RawInfo
+
+    timings: Dict[str, float] = {}
+    messages: list = []
+    timings['framing'] = _timed(lambda: messages.extend(_read_messages(demo)))
+    timings['huffman'] = _timed(lambda: _decode_symbols(messages))
+    records = _decode_chunk([(message.sequence, message.data) for message in messages])
+    parsed: list = []
+    timings['snapshots'] = _timed(lambda: parsed.append(_replay(messages, records)))
+    parser = parsed[0]
+    raws: list = []
+    timings['raw_info'] = _timed(lambda: raws.append(RawInfo(str(demo), parser.clc, parser.client)))
+    timings['console'] = _timed(lambda: ConsoleComandsParser(parser.clc.console))
+    timings['naming'] = _timed(lambda: Demo.GetDemoFromRawInfo(raws[0]))
+    timings['pipeline'] = _timed(lambda: _pipeline(demo))
+    return timings
+
+
+def run_suite(demos: List[Path], runs: int) -> Dict[str, float]:
+    """{stage: median over runs of the stage's total time across the corpus}."""
+    totals: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+    for _ in range(runs):
+        run = dict.fromkeys(STAGES, 0.0)
+        for demo in demos:
+            for stage, seconds in time_demo(demo).items():
+                run[stage] += seconds
+        for stage in STAGES:
+            totals[stage].append(run[stage])
+    return {stage: statistics.median(values) for stage, values in totals.items()}
+
+
+# ----------------------------------------------------------------------
+# Baselines
+
+def describe_build() -> Dict[str, object]:
+    from demoparser import _compiled, native
+    from demoparser.huffman import _HAS_C_EXTENSION
+
+    return {
+        'python': sys.version.split()[0],
+        'c_reader': _HAS_C_EXTENSION,
+        'native': native.AVAILABLE,
+        'compiled': _compiled.ACTIVE,
+    }
+
+
+def make_baseline(demos: List[Path], runs: int, stages: Dict[str, float]) -> dict:
+    return {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'build': describe_build(),
+        'runs': runs,
+        'corpus': {demo.name: os.path.getsize(demo) for demo in demos},
+        'stages': stages,
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> List[dict]:
+    """One row per stage: {'stage', 'baseline', 'current', 'change', 'regression'}."""
+    rows = []
+    for stage in STAGES:
+        before = baseline['stages'].get(stage)
+        after = current['stages'].get(stage)
+        if before is None or after is None:
+            continue
+        change = (after - before) / before if before else 0.0
+        rows.append({'stage': stage, 'baseline': before, 'current': after, 'change': change,
+                     'regression': change > threshold})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time each stage of the demo pipeline and compare with a stored baseline')
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--corpus', type=Path, help='Directory of demos to benchmark')
+    source.add_argument('--synthetic', type=Path, help='Write the synthetic corpus here (default: a temporary directory)')
+    parser.add_argument('--runs', type=int, default=5, help='Passes over the corpus; the median is kept (default: 5)')
+    parser.add_argument('--save', type=Path, help='Store the result as a JSON baseline')
+    parser.add_argument('--compare', type=Path, help='Baseline to compare against')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='Slowdown that counts as a regression, as a fraction (default: 0.10)')
+    parser.add_argument('--json', action='store_true', help='Print the result as JSON')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='bench_stages_') as scratch:
+        if args.corpus:
+            demos = find_corpus(args.corpus)
+        else:
+            demos = write_synthetic_corpus(args.synthetic or Path(scratch))
+        if not demos:
+            print(f"No demo files found in {args.corpus}", file=sys.stderr)
+            sys.exit(1)
+        total_bytes = sum(os.path.getsize(demo) for demo in demos)
+        current = make_baseline(demos, args.runs, run_suite(demos, max(1, args.runs)))
+
+    if args.save:
+        args.save.write_text(json.dumps(current, indent=2) + '\n')
+
+    rows = None
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())
+        if baseline.get('corpus') != current['corpus']:
+            print("Warning: the baseline was taken on a different corpus", file=sys.stderr)
+        if baseline.get('build') != current['build']:
+            print(f"Warning: the baseline was taken on another build: {baseline.get('build')}", file=sys.stderr)
+        rows = compare(baseline, current, args.threshold)
+
+    if args.json:
+        print(json.dumps({'result': current, 'comparison': rows}))
+    else:
+        print(f"{len(demos)} demos, {total_bytes / (1024 * 1024):.2f} MB, median of {args.runs} runs")
+        for stage, seconds in current['stages'].items():
+            line = f"{stage:<10} {seconds * 1000:9.1f} ms {total_bytes / (1024 * 1024) / seconds if seconds else 0.0:9.2f} MB/s"
+            row = next((r for r in rows or () if r['stage'] == stage), None)
+            if row is not None:
+                line += f"   baseline {row['baseline'] * 1000:9.1f} ms {row['change']:+7.1%}"
+                line += '  REGRESSION' if row['regression'] else ''
+            print(line)
+
+    if rows and any(row['regression'] for row in rows):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
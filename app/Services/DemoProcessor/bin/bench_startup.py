@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for process_single_demo.py.
+
+Spawns the processor the way DemoProcessorService does, once per run, and
+reports wall-clock times. With --importtime it also runs one `python -X
+importtime` pass and lists the modules that cost the most to import.
+
+Usage: python3 bench_startup.py <demo_file> [--runs N] [--importtime] [--top N]
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+current_dir = Path(__file__).parent
+script = current_dir / 'process_single_demo.py'
+
+
+def time_runs(demo: str, runs: int):
+    """Wall-clock seconds for each cold invocation."""
+    timings = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        subprocess.run(
+            [sys.executable, '-W', 'ignore', str(script), demo, '--json'],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        timings.append(time.perf_counter() - t0)
+    return timings
+
+
+def import_profile(demo: str):
+    """(self_us, cumulative_us, module) for every import of one invocation."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-W', 'ignore', str(script), demo, '--json'],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue
+        rows.append((int(parts[0]), int(parts[1]), parts[2].rstrip()))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure cold start of process_single_demo.py')
+    parser.add_argument('demo', help='Demo file to process on each run')
+    parser.add_argument('--runs', type=int, default=20, help='Number of cold invocations (default: 20)')
+    parser.add_argument('--importtime', action='store_true', help='Also print the most expensive imports')
+    parser.add_argument('--top', type=int, default=15, help='Modules to list with --importtime (default: 15)')
+    args = parser.parse_args()
+
+    timings = time_runs(args.demo, args.runs)
+    print(f"Runs:   {len(timings)}")
+    print(f"Min:    {min(timings) * 1000:.1f} ms")
+    print(f"Median: {statistics.median(timings) * 1000:.1f} ms")
+    print(f"Max:    {max(timings) * 1000:.1f} ms")
+
+    if args.importtime:
+        rows = import_profile(args.demo)
+        total = sum(row[0] for row in rows)
+        print(f"\nImports: {len(rows)} modules, {total / 1000:.1f} ms self time")
+        print(f"{'self ms':>8} {'cum ms':>8}  module")
+        for self_us, cumulative_us, module in sorted(rows, reverse=True)[:args.top]:
+            print(f"{self_us / 1000:8.1f} {cumulative_us / 1000:8.1f}  {module}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Prepares the demo processor for fast cold starts.
+
+PHP spawns a fresh `process_single_demo.py` for every demo, so whatever the
+interpreter does before the first byte is parsed is paid on every upload.
+This builds the `_q3huff` extension and writes bytecode for every module up
+front. The PHP workers run as a user that usually cannot write `__pycache__`
+here, and without it every single invocation recompiles the whole parser from
+source before it starts.
+
+A zipapp would be smaller to ship, but extension modules cannot be imported
+from inside a zip and the parser would silently drop to the pure-Python
+reader, so the bundle is this directory, compiled in place.
+
+--mypyc also compiles the parser modules with mypyc (needs mypy installed).
+With --bench, the compiled modules are kept only if bench_compiled.py finds
+them fastest on those demos.
+
+Usage: python3 build_bundle.py [--no-ext] [--mypyc] [--bench DEMO ...] [--check]
+"""
+import argparse
+import compileall
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+current_dir = Path(__file__).parent
+
+
+def build_extension() -> bool:
+    """Build `_q3huff` in place; returns False if no compiler is available."""
+    result = subprocess.run(
+        [sys.executable, 'setup.py', 'build_ext', '--inplace'],
+        cwd=current_dir / 'demoparser',
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        print(result.stderr, file=sys.stderr)
+        return False
+    return True
+
+
+def build_compiled_modules() -> bool:
+    """mypyc-compile the parser modules in place (demoparser/setup_mypyc.py)."""
+    result = subprocess.run(
+        [sys.executable, 'setup_mypyc.py', 'build_ext', '--inplace'],
+        cwd=current_dir / 'demoparser',
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        print(result.stderr, file=sys.stderr)
+        return False
+    return True
+
+
+def remove_compiled_modules() -> None:
+    from demoparser._compiled import compiled_files
+
+    for path in compiled_files():
+        os.remove(path)
+
+
+def compile_bytecode() -> bool:
+    return compileall.compile_dir(str(current_dir), quiet=1, workers=0)
+
+
+def check_extension() -> bool:
+    """Import the parser in a clean interpreter and report which reader it got."""
+    result = subprocess.run(
+        [sys.executable, '-c', 'from demoparser.huffman import _HAS_C_EXTENSION; print(_HAS_C_EXTENSION)'],
+        cwd=current_dir,
+        capture_output=True,
+        text=True,
+    )
+    return result.stdout.strip() == 'True'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the demo processor for fast cold starts')
+    parser.add_argument('--no-ext', action='store_true', help='Skip building the C extension')
+    parser.add_argument('--mypyc', action='store_true', help='Also compile the parser modules with mypyc')
+    parser.add_argument('--bench', nargs='+', metavar='DEMO', help='Keep the mypyc build only if it is fastest on these demos')
+    parser.add_argument('--check', action='store_true', help='Fail if the C extension does not load afterwards')
+    args = parser.parse_args()
+
+    if not args.no_ext:
+        if build_extension():
+            print('Built _q3huff extension')
+        else:
+            print('WARNING: could not build _q3huff, the parser will use the pure-Python reader', file=sys.stderr)
+
+    if args.mypyc:
+        if build_compiled_modules():
+            print('Built mypyc-compiled parser modules')
+            if args.bench:
+                from bench_compiled import BUILD_MODES, fastest, run_benchmark
+
+                results = run_benchmark(args.bench, runs=3, modes=BUILD_MODES)
+                best = fastest(results)
+                for mode, result in results.items():
+                    if 'median' in result:
+                        print(f"  {mode:<10} {result['median'] * 1000:9.1f} ms")
+                if best != 'compiled':
+                    remove_compiled_modules()
+                    print(f'Removed mypyc modules: {best} was faster')
+        else:
+            print('WARNING: mypyc build failed, the parser will run from source', file=sys.stderr)
+
+    if not compile_bytecode():
+        print('ERROR: bytecode compilation failed', file=sys.stderr)
+        sys.exit(1)
+    print('Compiled bytecode')
+
+    has_c = check_extension()
+    print(f'C extension loaded: {has_c}')
+    if args.check and not has_c:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Sharded, resumable bulk parse of stored demos.
+
+A full reparse of the archive used to be one long loop in one process that
+started again from the top whenever it died. This parses a list of demos on a
+pool of worker processes and appends one JSON line per demo - the same record
+ingest_daemon.py writes (size, digests, metadata or error) plus its path - and
+can be stopped and started again at any point:
+
+- --shard i/n keeps only the paths whose CRC-32 is i modulo n (0 <= i < n),
+  so n machines or processes given the same path list split it without
+  coordinating and without overlap. Give every shard the paths spelled the
+  same way, since the path string is what is hashed.
+- --checkpoint FILE lists the demos already done, one JSON line each, written
+  after the demo's result. A restarted run skips them; one killed between the
+  two writes parses that demo again, so the output can hold the same path
+  twice but never misses one. --retry-failed parses demos that failed before
+  again.
+
+Demos are started longest first, and those over --large-mb run in a lane of
+their own with a timeout (scheduling.py), so the batch does not end with one
+huge demo on one worker. The next --prefetch demos are read into the page
+cache while the current ones decode (prefetch.py).
+
+Sources are directories (searched recursively for demos), demo files, or
+files listing one path per line (- for stdin). Compressed demos (.7z, .zip,
+.gz, .xz) are decompressed in memory, without a temporary file.
+
+Usage: bulk_process.py <source>... [--output FILE] [--checkpoint FILE] [--shard i/n] [--workers N] [--retry-failed]
+                       [--large-mb MB] [--large-workers N] [--large-timeout SECONDS] [--prefetch K]
+"""
+import argparse
+import json
+import os
+import sys
+import zlib
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir))
+
+from demoparser.sources import is_compressed
+from ingest_daemon import is_demo_name, process_demo, process_pool
+from prefetch import DEFAULT_DEPTH, Prefetcher
+from scheduling import LARGE_DEMO_BYTES, LARGE_DEMO_TIMEOUT, TimeoutLane, split_lanes
+
+
+def parse_shard(value: str) -> Tuple[int, int]:
+    """'i/n' -> (i, n), for argparse."""
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"shard must look like i/n, got {value!r}")
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"shard index must be in 0..n-1, got {value!r}")
+    return index, count
+
+
+def in_shard(path: str, shard: Tuple[int, int]) -> bool:
+    index, count = shard
+    return zlib.crc32(path.encode('utf-8', 'surrogateescape')) % count == index
+
+
+def _is_demo_source(name: str) -> bool:
+    # Stored demos are compressed (demoparser/sources.py) and parsed as they are.
+    return is_demo_name(name) or is_compressed(name)
+
+
+def iter_sources(sources: Iterable[str]) -> Iterator[str]:
+    """Every demo path named by the sources, in the order given."""
+    for source in sources:
+        if source == '-':
+            yield from (line.strip() for line in sys.stdin if line.strip())
+            continue
+        path = Path(source)
+        if path.is_dir():
+            yield from sorted(str(p) for p in path.rglob('*') if p.is_file() and _is_demo_source(p.name))
+        elif _is_demo_source(path.name):
+            yield source
+        else:
+            with open(path, encoding='utf-8') as handle:
+                yield from (line.strip() for line in handle if line.strip())
+
+
+def load_checkpoint(path: Path) -> Dict[str, bool]:
+    """{demo path: whether it failed} for every complete line of the checkpoint."""
+    done: Dict[str, bool] = {}
+    if not path.exists():
+        return done
+    with open(path, encoding='utf-8') as handle:
+        for line in handle:
+            if not line.endswith('\n'):
+                break  # torn by a crash mid-write
+            try:
+                entry = json.loads(line)
+                done[entry['path']] = bool(entry.get('error'))
+            except (ValueError, KeyError, TypeError):
+                continue
+    return done
+
+
+def open_append(path: Path) -> TextIO:
+    """Open for appending, first ending a line a crash left unfinished."""
+    handle = open(path, 'a+', encoding='utf-8')
+    if handle.tell():
+        handle.seek(handle.tell() - 1)
+        if handle.read(1) != '\n':
+            handle.write('\n')
+    return handle
+
+
+def _write_line(handle: TextIO, record: dict) -> None:
+    handle.write(json.dumps(record) + '\n')
+    handle.flush()
+
+
+def run(paths: List[str], output: TextIO, checkpoint: Optional[TextIO], workers: int,
+        large_bytes: int = LARGE_DEMO_BYTES, large_workers: int = 1, large_timeout: Optional[float] = LARGE_DEMO_TIMEOUT,
+        prefetcher: Optional[Prefetcher] = None) -> dict:
+    """Parse every path, appending results in completion order.
+
+    Demos are started longest first; those of `large_bytes` or more run in a
+    TimeoutLane of `large_workers` processes next to the pool. With a
+    `prefetcher`, ordinary demos are read ahead before they are handed out.
+
+    A worker that dies breaks the pool and every demo in flight with it; those
+    run again, one at a time, on a new pool. Only a demo whose worker dies
+    while it runs alone is recorded as failed.
+    """
+    stats = {'parsed': 0, 'failed': 0}
+    ordinary, large = split_lanes(paths, large_bytes)
+    pending = prefetcher.iterate(ordinary) if prefetcher else iter(ordinary)
+    pending_large = iter(large)
+    in_flight: Dict = {}
+    suspects: Deque[str] = deque()
+    alone: Optional[str] = None
+    lane = TimeoutLane(large_workers, large_timeout)
+    pool = process_pool(workers)
+
+    def start(path: str) -> bool:
+        try:
+            in_flight[pool.submit(process_demo, path, False)] = path
+        except BrokenProcessPool:
+            suspects.appendleft(path)
+            replace_pool()
+            return False
+        return True
+
+    def replace_pool() -> None:
+        nonlocal pool, alone
+        suspects.extend(in_flight.values())
+        in_flight.clear()
+        alone = None
+        pool.shutdown(wait=False)
+        pool = process_pool(workers)
+
+    def submit() -> None:
+        nonlocal alone
+        while suspects and not in_flight:
+            path = suspects.popleft()
+            if start(path):
+                alone = path
+        # Bounded, so a long path list never sits in memory as futures.
+        while not suspects and len(in_flight) < 2 * workers:
+            path = next(pending, None)
+            if path is None:
+                break
+            start(path)
+        while lane.has_room:
+            path = next(pending_large, None)
+            if path is None:
+                break
+            lane.submit(path, process_demo, path, False)
+
+    def record(path: str, result: Optional[dict], error: Optional[str]) -> None:
+        if result is None:
+            result = {'file': Path(path).name, 'error': error}
+        failed = 'error' in result
+        stats['failed' if failed else 'parsed'] += 1
+        _write_line(output, {'path': path, **result})
+        if checkpoint is not None:
+            _write_line(checkpoint, {'path': path, 'error': failed})
+
+    try:
+        submit()
+        while in_flight or len(lane):
+            finished, _ = wait(in_flight, timeout=0.2 if len(lane) else None, return_when=FIRST_COMPLETED)
+            broken = False
+            for future in finished:
+                path = in_flight.pop(future)
+                try:
+                    record(path, future.result(), None)
+                except BrokenProcessPool as e:
+                    broken = True
+                    if path == alone:
+                        record(path, None, f'worker died parsing this demo: {e}')
+                    else:
+                        suspects.append(path)
+                except Exception as e:
+                    record(path, None, str(e) or type(e).__name__)
+                if path == alone:
+                    alone = None
+            if broken:
+                replace_pool()
+            for path, result, error in lane.poll():
+                record(path, result, error)
+            submit()
+    finally:
+        lane.close()
+        pool.shutdown()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Parse many stored demos, sharded and resumable, into JSON lines')
+    parser.add_argument('sources', nargs='+', help='Directories, demo files, or files listing one path per line (- for stdin)')
+    parser.add_argument('--output', type=Path, help='Append results here instead of printing them')
+    parser.add_argument('--checkpoint', type=Path, help='Record finished demos here and skip them when restarted')
+    parser.add_argument('--shard', type=parse_shard, default=(0, 1), help='Process only shard i of n (0-based, e.g. 2/8)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Parser processes (default: CPU count)')
+    parser.add_argument('--large-mb', type=float, default=LARGE_DEMO_BYTES / (1024 * 1024),
+                        help='Demos this large go to their own lane (default: %(default)g, 0 disables)')
+    parser.add_argument('--large-workers', type=int, default=1, help='Processes for the large-demo lane (default: 1)')
+    parser.add_argument('--large-timeout', type=float, default=LARGE_DEMO_TIMEOUT,
+                        help='Seconds before a large demo is given up on (default: %(default)g, 0 for none)')
+    parser.add_argument('--prefetch', type=int, default=DEFAULT_DEPTH,
+                        help='Demos to read into the page cache ahead of the workers (default: %(default)s, 0 disables)')
+    parser.add_argument('--retry-failed', action='store_true', help='Parse demos the checkpoint lists as failed again')
+    args = parser.parse_args()
+
+    done = load_checkpoint(args.checkpoint) if args.checkpoint else {}
+    paths: List[str] = []
+    seen = set()
+    skipped = 0
+    for path in iter_sources(args.sources):
+        if path in seen or not in_shard(path, args.shard):
+            continue
+        seen.add(path)
+        if path in done and not (args.retry_failed and done[path]):
+            skipped += 1
+            continue
+        paths.append(path)
+
+    print(f"Shard {args.shard[0]}/{args.shard[1]}: {len(paths)} to parse, {skipped} already done", file=sys.stderr)
+    output = open_append(args.output) if args.output else sys.stdout
+    checkpoint = open_append(args.checkpoint) if args.checkpoint else None
+    prefetcher = Prefetcher(args.prefetch)
+    try:
+        stats = run(paths, output, checkpoint, max(1, args.workers), int(args.large_mb * 1024 * 1024),
+                    args.large_workers, args.large_timeout or None, prefetcher)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        if checkpoint is not None:
+            checkpoint.close()
+    print(f"Parsed: {stats['parsed']}, failed: {stats['failed']}, skipped: {skipped}; {prefetcher.summary()}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -8,6 +8,8 @@ from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Dict, Iterable, List, Optional
 
+from demoparser import console_kind
+from demoparser.structures.client import ConsoleLine
 from ext import Ext
 from console_string_utils import (
     AdditionalTimeInfo,
@@ -41,28 +43,23 @@ class DateStringInfo:
 
 
 class ConsoleComandsParser:
-    def __init__(self, console_commands: Dict[int, tuple[int, str]]) -> None:
+    def __init__(self, console_commands: Dict[int, ConsoleLine]) -> None:
         self.timeStrings: List[TimeStringInfo] = []
         self.dateStrings: List[DateStringInfo] = []
         self.additionalInfos: List[AdditionalTimeInfo] = []
 
+        # The parser has already classified every line (demoparser/console_kind.py).
         timer_started_count = 0
-        for _, (_, value) in console_commands.items():
-            if value.startswith('print "Date:'):
+        for _, kind, value in console_commands.values():
+            if kind == console_kind.DATE:
                 self.dateStrings.append(DateStringInfo(source=value, recordDate=get_date_for_demo(value)))
-            elif 'reached the finish line in' in value:
+            elif kind == console_kind.ONLINE_FINISH:
                 self.timeStrings.append(TimeStringInfo(
                     source=value,
                     time=get_time_online(value),
                     oName=get_name_online(value),
                 ))
-            elif any(token in value for token in (
-                'broke the server record',
-                'you are now rank',
-                'is now rank',
-                'set the first record with',
-                'equalled the server record with',
-            )):
+            elif kind == console_kind.Q3DF_RANK:
                 result = get_name_q3df(value)
                 if result is not None:
                     self.timeStrings.append(TimeStringInfo(
@@ -72,31 +69,31 @@ class ConsoleComandsParser:
                         lName=result.q3dfName,
                         lNameColored=result.q3dfNameColored,
                     ))
-            elif value.startswith('print "Time performed by'):
+            elif kind == console_kind.OFFLINE_TIME:
                 self.timeStrings.append(TimeStringInfo(
                     source=value,
                     time=get_time_offline_normal(value),
                     oName=get_name_offline(value),
                 ))
-            elif value.startswith('NewTime'):
+            elif kind == console_kind.OLD1_TIME:
                 self.timeStrings.append(TimeStringInfo(
                     source=value,
                     time=get_time_old1(value),
                     oName=get_name_offline_old1(value),
                 ))
-            elif value.startswith('print "^3Time Performed:'):
+            elif kind == console_kind.OFFLINE_TIME_NO_NAME:
                 self.timeStrings.append(TimeStringInfo(
                     source=value,
                     time=get_time_offline_normal(value),
                 ))
-            elif value.startswith('newTime'):
+            elif kind == console_kind.OLD3_TIME:
                 self.timeStrings.append(TimeStringInfo(
                     source=value,
                     time=get_time_old3(value),
                 ))
-            elif value.startswith('TimerStarted'):
+            elif kind == console_kind.TIMER_STARTED:
                 timer_started_count += 1
-            elif value.startswith('TimerStopped'):
+            elif kind == console_kind.TIMER_STOPPED:
                 info = parse_additional_info(value)
                 if timer_started_count > 1:
                     info.isTr = True
@@ -18,6 +18,16 @@ from game_info import GameInfo
 from raw_info import RawInfo
 
 
+# The filename extractors run once per demo here, and over whole directory
+# listings in filename_classifier, so their patterns are compiled up front.
+_NAME_AND_COUNTRY_RE = re.compile(r"[^(]*\(([^)]*)\).*")
+_TIME_PARTS_SPLIT_RE = re.compile(r"[\[\]()_]")
+_TIME_TOKENS_SPLIT_RE = re.compile(r"[-.]")
+_VALIDITY_RE = re.compile(r"^[^\[]+\[[^.\]]+.[^\]]+]\d{2,3}\.\d{2}\.\d{3}\(.+\){(\w+)=(\w+)}(?:\[\d+\])?\.\w+$")
+_USER_ID_DOUBLE_RE = re.compile(r"^.+\[(\d+)\]\[(\d+)\]$")
+_USER_ID_RE = re.compile(r"^.+\[.+\].+\(.+\)(?:{.+})*\[(\d+)\]$")
+
+
 # Country name to ISO 2-letter code mapping
 COUNTRY_CODE_MAP = {
     # Full names
@@ -354,7 +364,7 @@ class Demo:
 
     @staticmethod
     def _get_name_and_country(filename: str) -> str:
-        match = re.search(r"[^(]*\(([^)]*)\).*", filename)
+        match = _NAME_AND_COUNTRY_RE.search(filename)
         return match.group(1) if match else ''
 
     @staticmethod
@@ -376,7 +386,7 @@ class Demo:
 
     @staticmethod
     def _try_get_time_from_file_name(filename: str) -> Optional[timedelta]:
-        parts = re.split(r"[\[\]()_]", filename)
+        parts = _TIME_PARTS_SPLIT_RE.split(filename)
         for part in parts:
             res = Demo._try_get_time_from_brackets(part)
             if res:
@@ -391,7 +401,7 @@ class Demo:
         # run of ten minutes and seven seconds, and "Tutorial_4.1" became four
         # seconds. Measured over the demos whose time came from their name:
         # 491 carry the real shape, 8 carried a speed, a chapter or a date.
-        tokens = re.split(r"[-.]", part)
+        tokens = _TIME_TOKENS_SPLIT_RE.split(part)
 
         if len(tokens) != 3:
             return None
@@ -465,18 +475,21 @@ class Demo:
         # Keeps a note an earlier rename put in the filename, like
         # dfwc2014-5[df.vq3]00.36.904(Enter.Russia){old_map_version=true}.dm_68,
         # when the demo itself reports nothing wrong.
-        match = re.match(r"^[^\[]+\[[^.\]]+.[^\]]+]\d{2,3}\.\d{2}\.\d{3}\(.+\){(\w+)=(\w+)}(?:\[\d+\])?\.\w+$", filename)
+        match = _VALIDITY_RE.match(filename)
         if match:
             return match.group(1), match.group(2)
         return None
 
     @staticmethod
     def _try_get_user_id_from_file_name(file: Path) -> int:
-        name_no_ext = file.stem
-        match = re.match(r"^.+\[(\d+)\]\[(\d+)\]$", name_no_ext)
+        return Demo._try_get_user_id_from_stem(file.stem)
+
+    @staticmethod
+    def _try_get_user_id_from_stem(name_no_ext: str) -> int:
+        match = _USER_ID_DOUBLE_RE.match(name_no_ext)
         if match:
             return int(match.group(2))
-        match = re.match(r"^.+\[.+\].+\(.+\)(?:{.+})*\[(\d+)\]$", name_no_ext)
+        match = _USER_ID_RE.match(name_no_ext)
         if match:
             return int(match.group(1))
         return -1
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Persistent index of every demo the processor has seen, across uploads.
+
+The same demo is uploaded again and again by different people. The index maps
+size plus MD5 (the site's file_hash) to the first, canonical copy, and keeps
+the metadata each parse produced, so a known demo is answered from SQLite
+without decoding it again.
+
+Metadata is cached per file name as well as per content: the naming layer
+reads the player's country, TAS markers and a fallback time from the file name,
+so the same bytes under another name are parsed again (and still reported as a
+duplicate). Cached metadata is also dropped whenever the contents of the parser
+or naming sources change, so a deploy never serves results an older parser
+produced, while a checkout or a change to unrelated scripts keeps it.
+
+Copies of one run that differ in a few bytes - re-saved, or with garbage
+appended - have different MD5s but the same run fingerprint
+(demoparser/fingerprint.py). The index keeps the first demo seen with each
+fingerprint, and metadata for a later one names it under '_same_run'.
+
+Several processes may use one index at once; SQLite's WAL mode and a busy
+timeout take care of that.
+
+Usage: demo_index.py <index.sqlite> stats
+       demo_index.py <index.sqlite> lookup <demo>
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Callable, Optional, Tuple
+
+current_dir = Path(__file__).parent
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS demos (
+    size INTEGER NOT NULL,
+    md5 TEXT NOT NULL,
+    stored_as TEXT,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    uploads INTEGER NOT NULL DEFAULT 1,
+    PRIMARY KEY (size, md5)
+);
+CREATE TABLE IF NOT EXISTS metadata (
+    size INTEGER NOT NULL,
+    md5 TEXT NOT NULL,
+    file_name TEXT NOT NULL,
+    parser TEXT NOT NULL,
+    metadata TEXT NOT NULL,
+    PRIMARY KEY (size, md5, file_name)
+);
+CREATE TABLE IF NOT EXISTS runs (
+    fingerprint TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    md5 TEXT NOT NULL
+);
+"""
+
+# Seconds a writer waits for another process's transaction before giving up.
+BUSY_TIMEOUT = 30.0
+
+# The naming-layer modules that shape the metadata, next to everything in
+# demoparser/. The daemon, batch tools and benchmarks are left out, so changing
+# them keeps the cache.
+METADATA_SOURCES = (
+    'renamer.py', 'demo.py', 'raw_info.py', 'game_info.py', 'ext.py',
+    'console_commands_parser.py', 'console_string_utils.py', 'demo_names.py',
+)
+
+_parser_fingerprint: Optional[str] = None
+
+
+def parser_fingerprint() -> str:
+    """Identifies the parser and naming sources by content; cached metadata from any other is stale."""
+    global _parser_fingerprint
+    if _parser_fingerprint is None:
+        digest = hashlib.md5()
+        parser_dir = current_dir / 'demoparser'
+        sources = [current_dir / name for name in METADATA_SOURCES]
+        sources += sorted(parser_dir.rglob('*.py')) + sorted(parser_dir.glob('*.c'))
+        for source in sources:
+            digest.update(f'{source.relative_to(current_dir).as_posix()}\n'.encode())
+            digest.update(source.read_bytes())
+        _parser_fingerprint = digest.hexdigest()
+    return _parser_fingerprint
+
+
+def content_key(path: Path, data: Optional[bytes] = None) -> Tuple[int, str]:
+    """(size, MD5) of a demo, in one read; of `data` when the demo is in memory."""
+    if data is not None:
+        return len(data), hashlib.md5(data).hexdigest()
+    md5 = hashlib.md5()
+    size = 0
+    with open(path, 'rb') as handle:
+        for chunk in iter(lambda: handle.read(1024 * 1024), b''):
+            md5.update(chunk)
+            size += len(chunk)
+    return size, md5.hexdigest()
+
+
+class DemoIndex:
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self._db = sqlite3.connect(str(self.path), timeout=BUSY_TIMEOUT, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self._db.close()
+
+    def __enter__(self) -> 'DemoIndex':
+        return self
+
+    def __exit__(self, *_exc) -> None:
+        self.close()
+
+    def canonical(self, size: int, md5: str) -> Optional[dict]:
+        """The first copy of this demo: {'stored_as', 'first_seen', 'uploads'}, or None if it is new."""
+        row = self._db.execute(
+            'SELECT stored_as, first_seen, uploads FROM demos WHERE size = ? AND md5 = ?', (size, md5)
+        ).fetchone()
+        if row is None:
+            return None
+        return {'stored_as': row[0], 'first_seen': row[1], 'uploads': row[2]}
+
+    def lookup(self, size: int, md5: str, file_name: str) -> Optional[dict]:
+        """Metadata this parser produced for these bytes under this name, or None."""
+        row = self._db.execute(
+            'SELECT metadata FROM metadata WHERE size = ? AND md5 = ? AND file_name = ? AND parser = ?',
+            (size, md5, file_name, parser_fingerprint()),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def same_run(self, fingerprint: str) -> Optional[dict]:
+        """The first demo with this run fingerprint: {'size', 'md5', 'stored_as', 'first_seen'}, or None."""
+        row = self._db.execute(
+            'SELECT runs.size, runs.md5, demos.stored_as, demos.first_seen FROM runs '
+            'JOIN demos ON demos.size = runs.size AND demos.md5 = runs.md5 WHERE runs.fingerprint = ?',
+            (fingerprint,),
+        ).fetchone()
+        if row is None:
+            return None
+        return {'size': row[0], 'md5': row[1], 'stored_as': row[2], 'first_seen': row[3]}
+
+    def record(self, size: int, md5: str, file_name: str, metadata: Optional[dict], stored_as: Optional[str] = None) -> None:
+        """Count an upload of this demo and keep its metadata, if it parsed.
+
+        The first upload is the canonical one; a later `stored_as` only fills
+        one in if the first upload had none. The same goes for the first demo
+        with a run fingerprint.
+        """
+        now = time.time()
+        with self._db:
+            self._db.execute('BEGIN IMMEDIATE')
+            self._db.execute(
+                'INSERT INTO demos (size, md5, stored_as, first_seen, last_seen) VALUES (?, ?, ?, ?, ?) '
+                'ON CONFLICT (size, md5) DO UPDATE SET uploads = uploads + 1, last_seen = excluded.last_seen, '
+                'stored_as = COALESCE(demos.stored_as, excluded.stored_as)',
+                (size, md5, stored_as, now, now),
+            )
+            if metadata is not None:
+                self._db.execute(
+                    'INSERT OR REPLACE INTO metadata (size, md5, file_name, parser, metadata) VALUES (?, ?, ?, ?, ?)',
+                    (size, md5, file_name, parser_fingerprint(), json.dumps(metadata)),
+                )
+                if metadata.get('fingerprint'):
+                    self._db.execute(
+                        'INSERT OR IGNORE INTO runs (fingerprint, size, md5) VALUES (?, ?, ?)',
+                        (metadata['fingerprint'], size, md5),
+                    )
+
+    def stats(self) -> dict:
+        demos, uploads = self._db.execute('SELECT COUNT(*), COALESCE(SUM(uploads), 0) FROM demos').fetchone()
+        cached = self._db.execute('SELECT COUNT(*) FROM metadata WHERE parser = ?', (parser_fingerprint(),)).fetchone()[0]
+        runs = self._db.execute('SELECT COUNT(*) FROM runs').fetchone()[0]
+        return {'demos': demos, 'uploads': uploads, 'duplicates': uploads - demos, 'cached_metadata': cached, 'runs': runs}
+
+
+def metadata_with_index(index_path: Path, demo: Path, parse: Callable[[Path], Optional[dict]], stored_as: Optional[str] = None,
+                        data: Optional[bytes] = None, key: Optional[Tuple[int, str]] = None) -> Optional[dict]:
+    """Check-before-parse: metadata for `demo` from the index, or from `parse` and then recorded.
+
+    Metadata for a demo the index has seen before carries '_index' with the
+    canonical copy and how often it has been uploaded. Metadata for other
+    bytes holding a run the index has seen carries '_same_run' with the first
+    demo that had it. `data` is the demo's content when `demo` is only its
+    name. `key` is the demo's (size, MD5) when the caller has already hashed
+    it, so the file is not read again. Metadata from a parse cut short by its
+    deadline is returned but not kept.
+    """
+    import metrics
+
+    size, md5 = key or content_key(demo, data)
+    with DemoIndex(index_path) as index:
+        known = index.canonical(size, md5)
+        metadata = index.lookup(size, md5, demo.name) if known else None
+        if metadata is not None:
+            metrics.CACHE_HITS.inc(labels=('demo_index',))
+        else:
+            metadata = parse(demo)
+        keep = None if metadata and metadata.get('partial') else metadata
+        index.record(size, md5, demo.name, keep, stored_as)
+        run = index.same_run(metadata['fingerprint']) if metadata and metadata.get('fingerprint') else None
+    if metadata is not None and known is not None:
+        metadata['_index'] = {'duplicate_of': known['stored_as'], 'first_seen': known['first_seen'], 'uploads': known['uploads'] + 1}
+    if run is not None and (run['size'], run['md5']) != (size, md5):
+        metadata['_same_run'] = {'duplicate_of': run['stored_as'], 'md5': run['md5'], 'first_seen': run['first_seen']}
+    return metadata
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Inspect the duplicate-demo index')
+    parser.add_argument('index', type=Path, help='SQLite index file')
+    parser.add_argument('command', choices=('stats', 'lookup'))
+    parser.add_argument('demo', type=Path, nargs='?', help='Demo to look up')
+    args = parser.parse_args()
+
+    with DemoIndex(args.index) as index:
+        if args.command == 'stats':
+            print(json.dumps(index.stats()))
+            return
+        if args.demo is None:
+            parser.error('lookup needs a demo')
+        size, md5 = content_key(args.demo)
+        metadata = index.lookup(size, md5, args.demo.name)
+        print(json.dumps({
+            'size': size,
+            'md5': md5,
+            'canonical': index.canonical(size, md5),
+            'metadata': metadata,
+            'same_run': index.same_run(metadata['fingerprint']) if metadata and metadata.get('fingerprint') else None,
+        }))
+
+
+if __name__ == '__main__':
+    main()
@@ -1 +1,4 @@
+from . import _compiled
 
+# Must run before any module setup_mypyc.py may have compiled is imported.
+_compiled.select()
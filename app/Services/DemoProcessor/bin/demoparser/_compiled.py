@@ -0,0 +1,82 @@
+"""
+Chooses between the mypyc-compiled parser modules (setup_mypyc.py) and their
+sources.
+
+A compiled module next to its .py always wins the import, so this runs from
+the package's __init__ before anything else is imported. The compiled copies
+are all-or-nothing - they reach into each other's native classes - and are
+used only when every one of them is present, newer than its source, and the
+shared runtime library loads. Otherwise, or with DEMOPARSER_NO_COMPILED=1,
+the sources are imported instead.
+"""
+import importlib.machinery
+import importlib.util
+import os
+import sys
+
+COMPILED_MODULES = ('parser', 'structures.mapper', 'structures.player', 'structures.client')
+# mypyc puts the code shared by the compiled modules in <group>__mypyc, next to the package.
+RUNTIME_GROUP = 'demoparser_compiled'
+
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+_BIN_DIR = os.path.dirname(_PACKAGE_DIR)
+
+# True once the compiled modules have been chosen for this process.
+ACTIVE = False
+
+
+def source_path(module: str) -> str:
+    return os.path.join(_PACKAGE_DIR, *module.split('.')) + '.py'
+
+
+def compiled_path(module: str):
+    base = os.path.join(_PACKAGE_DIR, *module.split('.'))
+    for suffix in importlib.machinery.EXTENSION_SUFFIXES:
+        if os.path.exists(base + suffix):
+            return base + suffix
+    return None
+
+
+def compiled_files():
+    """Every compiled file for this interpreter, runtime library included."""
+    paths = [compiled_path(module) for module in COMPILED_MODULES]
+    for suffix in importlib.machinery.EXTENSION_SUFFIXES:
+        paths.append(os.path.join(_BIN_DIR, f'{RUNTIME_GROUP}__mypyc{suffix}'))
+    return [path for path in paths if path and os.path.exists(path)]
+
+
+class _SourceFinder:
+    """Imports the listed modules from their .py files, past the compiled copies."""
+
+    def __init__(self) -> None:
+        self._sources = {f'{__package__}.{module}': source_path(module) for module in COMPILED_MODULES}
+
+    def find_spec(self, name, path=None, target=None):
+        source = self._sources.get(name)
+        if source is None:
+            return None
+        return importlib.util.spec_from_file_location(name, source)
+
+
+def _usable(paths) -> bool:
+    for module, path in zip(COMPILED_MODULES, paths):
+        if path is None or os.path.getmtime(path) < os.path.getmtime(source_path(module)):
+            return False
+    if _BIN_DIR not in sys.path:
+        sys.path.append(_BIN_DIR)
+    try:
+        importlib.import_module(f'{RUNTIME_GROUP}__mypyc')
+    except ImportError:
+        return False
+    return True
+
+
+def select() -> None:
+    global ACTIVE
+    paths = [compiled_path(module) for module in COMPILED_MODULES]
+    if not any(paths):
+        return
+    if not os.environ.get('DEMOPARSER_NO_COMPILED') and _usable(paths):
+        ACTIVE = True
+        return
+    sys.meta_path.insert(0, _SourceFinder())
@@ -115,9 +115,11 @@ typedef struct {
     Py_ssize_t bit_idx;
     Py_ssize_t word_idx;
     uint32_t current_bits;
+    unsigned long long symbols;  /* Huffman symbols decoded from this stream */
 } BitStream;
 
 static void bs_init(BitStream *bs, const uint8_t *buf, Py_ssize_t buflen) {
+    bs->symbols = 0;
     bs->bit_length = buflen * 8;
     Py_ssize_t add = (4 - (buflen & 3)) & 3;
     Py_ssize_t padded_len = buflen + add;
@@ -170,6 +172,12 @@ static inline uint32_t bs_read_bits(BitStream *bs, int bits) {
 
 /* ── Huffman decode ────────────────────────────────────────────────── */
 
+/* Symbols decoded by finished readers, for the metrics surface. Streams count
+ * their own (they may be decoded without the GIL) and are added here once they
+ * are done. Kept per thread, so the before/after difference a caller takes
+ * around one parse stays that parse's own when demos are parsed on threads. */
+static _Thread_local unsigned long long g_symbol_count = 0;
+
 static inline int huff_decode_symbol(BitStream *bs) {
     HuffNode *node = g_root;
     while (node && node->symbol == Q3_HUFFMAN_NYT_SYM) {
@@ -177,6 +185,7 @@ static inline int huff_decode_symbol(BitStream *bs) {
         if (bit < 0) return -1;
         node = (bit == 0) ? node->left : node->right;
     }
+    bs->symbols++;
     return node ? (int)node->symbol : (int)Q3_HUFFMAN_NYT_SYM;
 }
 
@@ -197,6 +206,7 @@ typedef struct {
 } FastHuffmanReader;
 
 static void FHR_dealloc(FastHuffmanReader *self) {
+    g_symbol_count += self->bs.symbols;
     bs_free(&self->bs);
     Py_TYPE(self)->tp_free((PyObject *)self);
 }
@@ -447,14 +457,580 @@ static PyTypeObject FastHuffmanReaderType = {
     .tp_new = PyType_GenericNew,
 };
 
+/* ── Whole-demo decode ─────────────────────────────────────────────── */
+/*
+ * decode_demo(buffer) runs Q3DemoConfigParser's message loop - framing,
+ * gamestate, snapshots, packet entities - on plain C state, so the GIL is
+ * released for the whole demo. It keeps only what the naming layer reads:
+ * configstrings, server commands, the errors the parser logs and a summary of
+ * the player state of every valid snapshot. Entity deltas are decoded only as
+ * far as their numbers, which is all the snapshot bookkeeping uses.
+ *
+ * Values are read exactly as FastHuffmanReader reads them. Where the Python
+ * parser would raise (a trajectory type that is not a TrType) this stops with
+ * DECODE_FALLBACK, and the caller parses the demo the ordinary way.
+ */
+
+#define PACKET_BACKUP        32
+#define PACKET_MASK          (PACKET_BACKUP - 1)
+#define MAX_PARSE_ENTITIES   2048
+#define MAX_MAP_AREA_BYTES   16
+#define Q3_MESSAGE_MAX_SIZE  0x4000
+#define MAX_CONFIGSTRINGS    1024
+#define GENTITYNUM_BITS      10
+#define ES_FIELD_COUNT       51
+#define PS_FIELD_COUNT       48
+#define PS_ARRAY_COUNT       4      /* stats, persistant, ammo, powerups */
+#define PS_ARRAY_LENGTH      16
+#define NO_OLD_ENTITY        99999
+
+#define SVC_GAMESTATE        2
+#define SVC_CONFIGSTRING     3
+#define SVC_BASELINE         4
+#define SVC_SERVERCOMMAND    5
+#define SVC_SNAPSHOT         7
+#define SVC_EOF              8
+
+/* Netfield reads, in MapperFactory's field order: a bit count for
+ * readNumBits (negative = signed), FIELD_FLOAT for readFloatIntegral,
+ * FIELD_TRTYPE for a readByte that must be a TrType. */
+#define FIELD_FLOAT          0
+#define FIELD_TRTYPE         100
+#define TR_TYPE_MAX          5
+
+static const int g_entity_fields[ES_FIELD_COUNT] = {
+    32,                                                         /* 0  pos.trTime */
+    FIELD_FLOAT, FIELD_FLOAT, FIELD_FLOAT, FIELD_FLOAT,         /* 1-4 pos.trBase/trDelta */
+    FIELD_FLOAT, FIELD_FLOAT, FIELD_FLOAT, FIELD_FLOAT,         /* 5-8 */
+    10,                                                         /* 9  events */
+    FIELD_FLOAT,                                                /* 10 angles2[1] */
+    8, 8, 8, 8,                                                 /* 11-14 eType, torsoAnim, eventParm, legsAnim */
+    10,                                                         /* 15 groundEntityNum */
+    FIELD_TRTYPE,                                               /* 16 pos.trType */
+    19, 10, 8, 8,                                               /* 17-20 eFlags, otherEntityNum, weapon, clientNum */
+    FIELD_FLOAT,                                                /* 21 angles[1] */
+    32,                                                         /* 22 pos.trDuration */
+    FIELD_TRTYPE,                                               /* 23 apos.trType */
+    FIELD_FLOAT, FIELD_FLOAT, FIELD_FLOAT,                      /* 24-26 origin */
+    24, 16, 8, 10, 8, 8,                                        /* 27-32 solid .. generic1 */
+    FIELD_FLOAT, FIELD_FLOAT, FIELD_FLOAT,                      /* 33-35 origin2 */
+    8,                                                          /* 36 modelindex2 */
+    FIELD_FLOAT,                                                /* 37 angles[0] */
+    32, 32, 32,                                                 /* 38-40 time, apos.trTime, apos.trDuration */
+    FIELD_FLOAT, FIELD_FLOAT, FIELD_FLOAT, FIELD_FLOAT,         /* 41-44 apos.trBase[2], apos.trDelta */
+    32,                                                         /* 45 time2 */
+    FIELD_FLOAT, FIELD_FLOAT, FIELD_FLOAT,                      /* 46-48 angles[2], angles2[0], angles2[2] */
+    32,                                                         /* 49 constantLight */
+    16,                                                         /* 50 frame */
+};
+
+static const int g_player_fields[PS_FIELD_COUNT] = {
+    32,                                                         /* 0  commandTime */
+    FIELD_FLOAT, FIELD_FLOAT,                                   /* 1-2 origin[0], origin[1] */
+    8,                                                          /* 3  bobCycle */
+    FIELD_FLOAT, FIELD_FLOAT, FIELD_FLOAT, FIELD_FLOAT,         /* 4-7 velocity[0..1], viewangles[1], viewangles[0] */
+    -16,                                                        /* 8  weaponTime */
+    FIELD_FLOAT, FIELD_FLOAT,                                   /* 9-10 origin[2], velocity[2] */
+    8, -16, 16, 8, 4, 8, 8, 8, 16, 10, 4, 16, 10, 16, 16, 16,   /* 11-26 */
+    8, -8, 8, 8, 8, 8, 8, 8, 16, 16, 12, 8, 8, 8, 5,            /* 27-41 */
+    FIELD_FLOAT, FIELD_FLOAT, FIELD_FLOAT, FIELD_FLOAT,         /* 42-45 viewangles[2], grapplePoint */
+    10, 16,                                                     /* 46-47 jumppad_ent, loopSound */
+};
+
+/* PlayerState fields the snapshot summary carries. */
+#define PS_COMMAND_TIME      0
+#define PS_ORIGIN_0          1
+#define PS_ORIGIN_1          2
+#define PS_VELOCITY_0        4
+#define PS_VELOCITY_1        5
+#define PS_VIEWANGLES_1      6
+#define PS_VIEWANGLES_0      7
+#define PS_ORIGIN_2          9
+#define PS_VELOCITY_2        10
+#define PS_MOVEMENT_DIR      15
+#define PS_PM_FLAGS          19
+#define PS_GROUND_ENTITY     20
+#define PS_PM_TYPE           34
+#define PS_CLIENT_NUM        40
+#define PS_WEAPON            41
+#define PS_VIEWANGLES_2      42
+
+/* Indexes into demoparser.native.ERRORS, one per ParserEx the parser logs. */
+enum {
+    ERR_BASELINE_OUT_OF_RANGE = 0,
+    ERR_UNABLE_TO_PARSE_DELTA_ENTITY,
+    ERR_BAD_COMMAND_IN_GAMESTATE,
+    ERR_DELTA_FROM_INVALID_FRAME,
+    ERR_DELTA_FRAME_TOO_OLD,
+    ERR_DELTA_PARSE_ENTITIES_TOO_OLD,
+    ERR_SNAPSHOT_INVALID_SIZE,
+    ERR_PACKET_ENTITIES_END_OF_MESSAGE,
+};
+
+enum {
+    DECODE_OK = 0,
+    DECODE_BAD_LENGTH,     /* Q3MessageStream raises ErrorCantOpenFile */
+    DECODE_FALLBACK,       /* the Python parser would raise; parse it there */
+    DECODE_NO_MEMORY,
+};
+
+typedef struct {
+    char *data;
+    size_t len;
+    size_t cap;
+} ByteBuf;
+
+static int buf_append(ByteBuf *buf, const void *src, size_t n) {
+    if (buf->len + n > buf->cap) {
+        size_t cap = buf->cap ? buf->cap : 4096;
+        while (cap < buf->len + n) cap *= 2;
+        char *data = (char *)realloc(buf->data, cap);
+        if (!data) return 0;
+        buf->data = data;
+        buf->cap = cap;
+    }
+    memcpy(buf->data + buf->len, src, n);
+    buf->len += n;
+    return 1;
+}
+
+typedef struct {
+    double f[PS_FIELD_COUNT];
+    int32_t arrays[PS_ARRAY_COUNT][PS_ARRAY_LENGTH];
+} NativePlayerState;
+
+typedef struct {
+    int valid;
+    int64_t messageNum;
+    int64_t parseEntitiesNum;
+    int numEntities;
+    NativePlayerState ps;
+} NativeSnapshot;
+
+typedef struct {
+    NativeSnapshot snapshots[PACKET_BACKUP];
+    int entityNumbers[MAX_PARSE_ENTITIES];
+    int64_t parseEntitiesNum;
+    int64_t lastSnapMessageNum;
+    int32_t serverTime;
+    int32_t sequence;
+    int32_t clientNum;
+    int32_t checksumFeed;
+    long configCount;
+    long configsBeforeFirstSnapshot;
+    ByteBuf configs;      /* int32 key, int32 length, text */
+    ByteBuf commands;     /* int32 key, int32 serverTime, int32 snapshots before it, int32 length, text */
+    ByteBuf errors;       /* one byte per logged error */
+    ByteBuf snapshotRecords;
+    unsigned long long symbols;
+    int status;
+} DemoDecoder;
+
+/* One valid snapshot, as demoparser.native.SNAPSHOT_RECORD ('=9i9f16i'):
+ * serverTime, messageNum, commandTime, pm_type, pm_flags, clientNum,
+ * movementDir, groundEntityNum, weapon, origin[3], velocity[3],
+ * viewangles[3], stats[16]. Every float in a player state came off the wire
+ * as a float32 or a 13-bit integer, so float32 loses nothing. */
+#define SNAPSHOT_RECORD_SIZE (9 * 4 + 9 * 4 + PS_ARRAY_LENGTH * 4)
+
+static void dd_fail(DemoDecoder *d, int status) {
+    if (d->status == DECODE_OK) d->status = status;
+}
+
+static void dd_error(DemoDecoder *d, uint8_t code) {
+    if (!buf_append(&d->errors, &code, 1)) dd_fail(d, DECODE_NO_MEMORY);
+}
+
+static double bs_read_float_integral(BitStream *bs) {
+    if (bs_read_bits(bs, 1) == 0) {
+        return (double)(_readNumBits_fast(bs, FLOAT_INT_BITS) - FLOAT_INT_BIAS);
+    }
+    int32_t bits = _readNumBits_fast(bs, 32);
+    if (bs_is_eod(bs)) return -1.0;
+    return (double)raw_bits_to_float((uint32_t)bits);
+}
+
+/* Reads a string the way _readStringBase does and appends it as int32 length + bytes. */
+static int dd_append_string(BitStream *bs, int limit, ByteBuf *out) {
+    char chars[Q3_BIG_INFO_STRING];
+    int32_t pos = 0;
+    for (int i = 0; i < limit; i++) {
+        int byte = huff_decode_symbol(bs);
+        if (byte <= 0) break;
+        if (byte > 127 || byte == Q3_PERCENT_CHAR_BYTE)
+            byte = Q3_DOT_CHAR_BYTE;
+        chars[pos++] = (char)byte;
+    }
+    return buf_append(out, &pos, 4) && buf_append(out, chars, (size_t)pos);
+}
+
+/* readDeltaEntity, keeping only the entity number. Returns 0 for an invalid
+ * field count, leaving the number as it was. */
+static int dd_read_delta_entity(DemoDecoder *d, BitStream *bs, int *number, int newnum) {
+    if (_readNumBits_fast(bs, 1) == 1) {
+        *number = MAX_GENTITIES - 1;
+        return 1;
+    }
+    if (_readNumBits_fast(bs, 1) == 0) {
+        *number = newnum;
+        return 1;
+    }
+    int count = huff_decode_symbol(bs);
+    if (count < 0 || count > ES_FIELD_COUNT) return 0;
+    *number = newnum;
+    for (int index = 0; index < count; index++) {
+        if (_readNumBits_fast(bs, 1) == 0) continue;
+        if (_readNumBits_fast(bs, 1) == 0) continue;   /* reset to zero, nothing on the wire */
+        int field = g_entity_fields[index];
+        if (field == FIELD_FLOAT) {
+            bs_read_float_integral(bs);
+        } else if (field == FIELD_TRTYPE) {
+            int tr_type = huff_decode_symbol(bs);
+            if (tr_type < 0 || tr_type > TR_TYPE_MAX) {
+                dd_fail(d, DECODE_FALLBACK);
+                return 0;
+            }
+        } else {
+            _readNumBits_fast(bs, field);
+        }
+    }
+    return 1;
+}
+
+static void dd_read_delta_player_state(BitStream *bs, NativePlayerState *ps) {
+    int count = huff_decode_symbol(bs);
+    if (count < 0 || count > PS_FIELD_COUNT) return;
+    for (int index = 0; index < count; index++) {
+        if (_readNumBits_fast(bs, 1) == 0) continue;
+        int field = g_player_fields[index];
+        ps->f[index] = field == FIELD_FLOAT ? bs_read_float_integral(bs) : (double)_readNumBits_fast(bs, field);
+    }
+    if (_readNumBits_fast(bs, 1) == 0) return;
+    for (int array = 0; array < PS_ARRAY_COUNT; array++) {
+        if (_readNumBits_fast(bs, 1) == 0) continue;
+        int32_t bits = _readNumBits_fast(bs, PS_ARRAY_LENGTH);
+        for (int idx = 0; idx < PS_ARRAY_LENGTH; idx++) {
+            if (bits & (1 << idx)) {
+                /* powerups are longs, the rest shorts */
+                ps->arrays[array][idx] = _readNumBits_fast(bs, array == PS_ARRAY_COUNT - 1 ? 32 : 16);
+            }
+        }
+    }
+}
+
+static void dd_delta_entity(DemoDecoder *d, BitStream *bs, NativeSnapshot *frame, int newnum, int old_slot, int unchanged) {
+    int slot = (int)(d->parseEntitiesNum & (MAX_PARSE_ENTITIES - 1));
+    if (unchanged && old_slot >= 0) {
+        d->entityNumbers[slot] = d->entityNumbers[old_slot];
+    } else {
+        dd_read_delta_entity(d, bs, &d->entityNumbers[slot], newnum);
+    }
+    if (d->entityNumbers[slot] == MAX_GENTITIES - 1) return;
+    d->parseEntitiesNum++;
+    frame->numEntities++;
+}
+
+static void dd_parse_packet_entities(DemoDecoder *d, BitStream *bs, NativeSnapshot *oldframe, NativeSnapshot *newframe) {
+    newframe->parseEntitiesNum = d->parseEntitiesNum;
+    newframe->numEntities = 0;
+    int oldindex = 0;
+    int oldnum = NO_OLD_ENTITY;
+    int old_slot = -1;
+
+#define DD_NEXT_OLD()                                                                       \
+    do {                                                                                    \
+        oldindex++;                                                                         \
+        if (oldindex >= oldframe->numEntities) {                                            \
+            oldnum = NO_OLD_ENTITY;                                                         \
+            old_slot = -1;                                                                  \
+        } else {                                                                            \
+            old_slot = (int)((oldframe->parseEntitiesNum + oldindex) & (MAX_PARSE_ENTITIES - 1)); \
+            oldnum = d->entityNumbers[old_slot];                                            \
+        }                                                                                   \
+    } while (0)
+
+    if (oldframe && oldframe->numEntities != 0) {
+        old_slot = (int)(oldframe->parseEntitiesNum & (MAX_PARSE_ENTITIES - 1));
+        oldnum = d->entityNumbers[old_slot];
+    }
+    for (;;) {
+        int newnum = _readNumBits_fast(bs, GENTITYNUM_BITS);
+        if (newnum == MAX_GENTITIES - 1) break;
+        if (bs_is_eod(bs)) {
+            dd_error(d, ERR_PACKET_ENTITIES_END_OF_MESSAGE);
+            return;
+        }
+        while (oldframe && oldnum < newnum) {
+            dd_delta_entity(d, bs, newframe, oldnum, old_slot, 1);
+            DD_NEXT_OLD();
+        }
+        if (oldframe && oldnum == newnum) {
+            dd_delta_entity(d, bs, newframe, newnum, old_slot, 0);
+            if (d->status != DECODE_OK) return;
+            DD_NEXT_OLD();
+            continue;
+        }
+        if (oldnum > newnum || !oldframe) {
+            dd_delta_entity(d, bs, newframe, newnum, -1, 0);
+            if (d->status != DECODE_OK) return;
+        }
+    }
+    while (oldframe && oldnum != NO_OLD_ENTITY) {
+        dd_delta_entity(d, bs, newframe, oldnum, old_slot, 1);
+        DD_NEXT_OLD();
+    }
+#undef DD_NEXT_OLD
+}
+
+static void dd_record_snapshot(DemoDecoder *d, int32_t server_time, const NativeSnapshot *snap) {
+    const double *f = snap->ps.f;
+    int32_t ints[9] = {
+        server_time, (int32_t)snap->messageNum, (int32_t)f[PS_COMMAND_TIME], (int32_t)f[PS_PM_TYPE],
+        (int32_t)f[PS_PM_FLAGS], (int32_t)f[PS_CLIENT_NUM], (int32_t)f[PS_MOVEMENT_DIR],
+        (int32_t)f[PS_GROUND_ENTITY], (int32_t)f[PS_WEAPON],
+    };
+    float floats[9] = {
+        (float)f[PS_ORIGIN_0], (float)f[PS_ORIGIN_1], (float)f[PS_ORIGIN_2],
+        (float)f[PS_VELOCITY_0], (float)f[PS_VELOCITY_1], (float)f[PS_VELOCITY_2],
+        (float)f[PS_VIEWANGLES_0], (float)f[PS_VIEWANGLES_1], (float)f[PS_VIEWANGLES_2],
+    };
+    if (!buf_append(&d->snapshotRecords, ints, sizeof(ints))
+        || !buf_append(&d->snapshotRecords, floats, sizeof(floats))
+        || !buf_append(&d->snapshotRecords, snap->ps.arrays[0], sizeof(snap->ps.arrays[0]))) {
+        dd_fail(d, DECODE_NO_MEMORY);
+    }
+}
+
+static void dd_parse_snapshot(DemoDecoder *d, BitStream *bs) {
+    if (d->configsBeforeFirstSnapshot < 0) d->configsBeforeFirstSnapshot = d->configCount;
+
+    NativeSnapshot snap;
+    memset(&snap, 0, sizeof(snap));
+    int32_t server_time = _readNumBits_fast(bs, 32);
+    snap.messageNum = d->sequence;
+    d->serverTime = server_time;
+    int delta_num = huff_decode_symbol(bs);
+    int64_t delta = delta_num == 0 ? -1 : snap.messageNum - delta_num;
+    huff_decode_symbol(bs);   /* snapFlags */
+
+    NativeSnapshot *old = NULL;
+    if (delta <= 0) {
+        snap.valid = 1;
+    } else {
+        old = &d->snapshots[delta & PACKET_MASK];
+        if (!old->valid) {
+            dd_error(d, ERR_DELTA_FROM_INVALID_FRAME);
+        } else if (old->messageNum != delta) {
+            dd_error(d, ERR_DELTA_FRAME_TOO_OLD);
+        } else if (d->parseEntitiesNum - old->parseEntitiesNum > MAX_PARSE_ENTITIES - 128) {
+            dd_error(d, ERR_DELTA_PARSE_ENTITIES_TOO_OLD);
+        } else {
+            snap.valid = 1;
+        }
+    }
+    int length = huff_decode_symbol(bs);
+    if (length > MAX_MAP_AREA_BYTES) {
+        dd_error(d, ERR_SNAPSHOT_INVALID_SIZE);
+        return;
+    }
+    for (int i = 0; i < length; i++) huff_decode_symbol(bs);   /* areamask */
+    if (old) snap.ps = old->ps;
+    dd_read_delta_player_state(bs, &snap.ps);
+    dd_parse_packet_entities(d, bs, old, &snap);
+    if (d->status != DECODE_OK || !snap.valid) return;
+
+    int64_t old_message = d->lastSnapMessageNum + 1;
+    if (snap.messageNum - old_message >= PACKET_BACKUP) old_message = snap.messageNum - (PACKET_BACKUP - 1);
+    for (int64_t message_num = old_message; message_num < snap.messageNum; message_num++) {
+        d->snapshots[message_num & PACKET_MASK].valid = 0;
+    }
+    d->lastSnapMessageNum = snap.messageNum;
+    d->snapshots[snap.messageNum & PACKET_MASK] = snap;
+    dd_record_snapshot(d, server_time, &snap);
+}
+
+static void dd_parse_game_state(DemoDecoder *d, BitStream *bs) {
+    _readNumBits_fast(bs, 32);
+    for (;;) {
+        int command = huff_decode_symbol(bs);
+        if (command == SVC_EOF) break;
+        if (command == SVC_CONFIGSTRING) {
+            int32_t key = _readNumBits_fast(bs, 16);
+            if (key < 0 || key > MAX_CONFIGSTRINGS) return;
+            if (!buf_append(&d->configs, &key, 4) || !dd_append_string(bs, Q3_BIG_INFO_STRING, &d->configs)) {
+                dd_fail(d, DECODE_NO_MEMORY);
+                return;
+            }
+            d->configCount++;
+        } else if (command == SVC_BASELINE) {
+            int newnum = _readNumBits_fast(bs, GENTITYNUM_BITS);
+            if (newnum < 0 || newnum >= MAX_GENTITIES) {
+                dd_error(d, ERR_BASELINE_OUT_OF_RANGE);
+                return;
+            }
+            int number = 0;
+            if (!dd_read_delta_entity(d, bs, &number, newnum)) {
+                if (d->status == DECODE_OK) dd_error(d, ERR_UNABLE_TO_PARSE_DELTA_ENTITY);
+                return;
+            }
+        } else {
+            dd_error(d, ERR_BAD_COMMAND_IN_GAMESTATE);
+            return;
+        }
+    }
+    d->clientNum = _readNumBits_fast(bs, 32);
+    d->checksumFeed = _readNumBits_fast(bs, 32);
+}
+
+static void dd_parse_server_command(DemoDecoder *d, BitStream *bs) {
+    int32_t header[3] = {
+        _readNumBits_fast(bs, 32), d->serverTime, (int32_t)(d->snapshotRecords.len / SNAPSHOT_RECORD_SIZE)
+    };
+    if (!buf_append(&d->commands, header, sizeof(header)) || !dd_append_string(bs, Q3_MAX_STRING_CHARS, &d->commands)) {
+        dd_fail(d, DECODE_NO_MEMORY);
+    }
+}
+
+static void dd_parse_message(DemoDecoder *d, BitStream *bs) {
+    d->serverTime = 0;
+    _readNumBits_fast(bs, 32);
+    while (!bs_is_eod(bs) && d->status == DECODE_OK) {
+        int command = huff_decode_symbol(bs);
+        if (command == SVC_SERVERCOMMAND) {
+            dd_parse_server_command(d, bs);
+        } else if (command == SVC_GAMESTATE) {
+            dd_parse_game_state(d, bs);
+        } else if (command == SVC_SNAPSHOT) {
+            dd_parse_snapshot(d, bs);
+        } else {
+            return;   /* bad, nop, EOF or unknown: the rest of the message is ignored */
+        }
+    }
+}
+
+static int32_t read_le32(const uint8_t *p) {
+    return (int32_t)((uint32_t)p[0] | ((uint32_t)p[1] << 8) | ((uint32_t)p[2] << 16) | ((uint32_t)p[3] << 24));
+}
+
+/* Q3MessageStream plus Q3DemoParser.parse_config's loop. Runs without the GIL. */
+static void dd_decode(DemoDecoder *d, const uint8_t *buf, Py_ssize_t len) {
+    Py_ssize_t pos = 0;
+    while (d->status == DECODE_OK && len - pos >= 8) {
+        int32_t sequence = read_le32(buf + pos);
+        int32_t length = read_le32(buf + pos + 4);
+        pos += 8;
+        if (sequence == -1 && length == -1) break;
+        if (length < 0 || length > Q3_MESSAGE_MAX_SIZE) {
+            dd_fail(d, DECODE_BAD_LENGTH);
+            break;
+        }
+        if (len - pos < length) break;
+        BitStream bs;
+        bs_init(&bs, buf + pos, length);
+        if (!bs.data && length > 0) {
+            dd_fail(d, DECODE_NO_MEMORY);
+            break;
+        }
+        d->sequence = sequence;
+        dd_parse_message(d, &bs);
+        d->symbols += bs.symbols;
+        bs_free(&bs);
+        pos += length;
+    }
+}
+
+static PyObject *dd_strings(const ByteBuf *buf, int header_ints) {
+    PyObject *list = PyList_New(0);
+    if (!list) return NULL;
+    size_t pos = 0;
+    while (pos < buf->len) {
+        int32_t header[3];
+        memcpy(header, buf->data + pos, (size_t)header_ints * 4);
+        pos += (size_t)header_ints * 4;
+        int32_t length;
+        memcpy(&length, buf->data + pos, 4);
+        pos += 4;
+        PyObject *text = PyUnicode_FromStringAndSize(buf->data + pos, length);
+        pos += (size_t)length;
+        PyObject *item = text == NULL ? NULL
+            : header_ints == 1 ? Py_BuildValue("(iN)", header[0], text)
+            : Py_BuildValue("(iiiN)", header[0], header[1], header[2], text);
+        if (!item || PyList_Append(list, item) < 0) {
+            Py_XDECREF(item);
+            Py_DECREF(list);
+            return NULL;
+        }
+        Py_DECREF(item);
+    }
+    return list;
+}
+
+static PyObject *q3huff_decode_demo(PyObject *Py_UNUSED(module), PyObject *args) {
+    Py_buffer buf;
+    if (!PyArg_ParseTuple(args, "y*", &buf))
+        return NULL;
+    init_huffman();
+    DemoDecoder *d = (DemoDecoder *)calloc(1, sizeof(DemoDecoder));
+    if (!d) {
+        PyBuffer_Release(&buf);
+        return PyErr_NoMemory();
+    }
+    d->configsBeforeFirstSnapshot = -1;
+
+    Py_BEGIN_ALLOW_THREADS
+    dd_decode(d, (const uint8_t *)buf.buf, buf.len);
+    Py_END_ALLOW_THREADS
+
+    PyBuffer_Release(&buf);
+    g_symbol_count += d->symbols;
+    PyObject *result = NULL;
+    if (d->status == DECODE_NO_MEMORY) {
+        PyErr_NoMemory();
+    } else {
+        PyObject *configs = dd_strings(&d->configs, 1);
+        PyObject *commands = configs ? dd_strings(&d->commands, 3) : NULL;
+        if (commands) {
+            result = Py_BuildValue(
+                "{s:i,s:N,s:l,s:N,s:y#,s:y#,s:i,s:i,s:i}",
+                "status", d->status,
+                "configs", configs,
+                "configs_before_first_snapshot", d->configsBeforeFirstSnapshot,
+                "commands", commands,
+                "errors", d->errors.data ? d->errors.data : "", (Py_ssize_t)d->errors.len,
+                "snapshots", d->snapshotRecords.data ? d->snapshotRecords.data : "", (Py_ssize_t)d->snapshotRecords.len,
+                "client_num", d->clientNum,
+                "checksum_feed", d->checksumFeed,
+                "sequence", d->sequence);
+        } else {
+            Py_XDECREF(configs);
+        }
+    }
+    free(d->configs.data);
+    free(d->commands.data);
+    free(d->errors.data);
+    free(d->snapshotRecords.data);
+    free(d);
+    return result;
+}
+
 /* ── Module definition ─────────────────────────────────────────────── */
 
+static PyObject *q3huff_symbol_count(PyObject *Py_UNUSED(module), PyObject *Py_UNUSED(args)) {
+    return PyLong_FromUnsignedLongLong(g_symbol_count);
+}
+
+static PyMethodDef q3huff_methods[] = {
+    {"symbol_count", q3huff_symbol_count, METH_NOARGS, "Huffman symbols decoded so far on this thread"},
+    {"decode_demo", q3huff_decode_demo, METH_VARARGS, "Decode a whole demo buffer without holding the GIL"},
+    {NULL, NULL, 0, NULL}
+};
+
 static struct PyModuleDef q3huff_module = {
     PyModuleDef_HEAD_INIT,
     "_q3huff",
     "C extension for Q3 Huffman decoding",
     -1,
-    NULL
+    q3huff_methods
 };
 
 PyMODINIT_FUNC PyInit__q3huff(void) {
@@ -0,0 +1,223 @@
+"""
+Single-pass analyzers fed by Q3DemoConfigParser.
+
+Every extra figure used to mean another walk over the demo. An analyzer
+instead sees each valid snapshot and each server command once, in demo order,
+during the parse the naming layer needs anyway, and reports a JSON-ready dict
+at the end:
+
+    parser = Q3DemoParser(path, analyzers=create(['jumps', 'weapons']))
+    parser.parse_config()
+    results = {a.name: a.result() for a in parser.analyzers}
+
+Snapshots are CLSnapshot objects, or SnapshotSummary tuples when the native
+decoder ran; analyzers only read serverTime and the player-state fields the two
+share (see structures.client.PlayerStateSummary). Only PM_NORMAL snapshots
+count as movement, so spectating, intermission and death do not. Analyzers
+that need what the whole parse found get the RawInfo in on_parsed().
+"""
+from __future__ import annotations
+
+from abc import ABCMeta, abstractmethod
+from typing import Dict, Iterable, List, Optional, Type
+
+from . import const
+
+PM_NORMAL = 0
+# groundEntityNum while the player is in the air.
+ENTITYNUM_NONE = const.MAX_GENTITIES - 1
+
+WEAPON_NAMES = (
+    'none', 'gauntlet', 'machinegun', 'shotgun', 'grenade_launcher', 'rocket_launcher',
+    'lightning', 'railgun', 'plasmagun', 'bfg', 'grappling_hook',
+)
+
+
+def _horizontal_speed(ps) -> int:
+    speed = (ps.velocity[0] ** 2 + ps.velocity[1] ** 2) ** 0.5
+    # Same guard as the parser's maxSpeed: a frame can carry a NaN velocity.
+    return int(speed) if speed == speed and speed != float('inf') else 0
+
+
+class Analyzer:
+    """Base class; subclasses set `name` and override what they need."""
+
+    name = ''
+
+    def on_snapshot(self, snapshot) -> None:
+        pass
+
+    def on_server_command(self, server_time: int, text: str) -> None:
+        pass
+
+    def on_parsed(self, raw) -> None:
+        """Called once with the RawInfo parse_config() returns."""
+
+    def result(self) -> dict:
+        return {}
+
+
+class _TimedAnalyzer(Analyzer, metaclass=ABCMeta):
+    """Attributes the time between two PM_NORMAL snapshots to the earlier one."""
+
+    def __init__(self) -> None:
+        self._previous = None
+
+    def on_snapshot(self, snapshot) -> None:
+        if snapshot.ps.pm_type != PM_NORMAL:
+            self._previous = None
+            return
+        previous = self._previous
+        self._previous = snapshot
+        if previous is not None and snapshot.serverTime > previous.serverTime:
+            self.add_time(previous, snapshot.serverTime - previous.serverTime)
+
+    @abstractmethod
+    def add_time(self, snapshot, milliseconds: int) -> None:
+        """Credit `milliseconds` to what `snapshot` shows."""
+
+
+class CheckpointSplits(Analyzer):
+    """Start, checkpoint splits and timer value of every correct run.
+
+    Taken from RawInfo.runs, the runs the naming layer times from the parser's
+    client events, so splits and finishes always agree with the demo's time.
+    """
+
+    name = 'checkpoints'
+
+    def __init__(self) -> None:
+        self.runs: List[dict] = []
+
+    def on_parsed(self, raw) -> None:
+        self.runs = [
+            {'start_server_time': run.startServerTime, 'checkpoints': list(run.checkpoints), 'finish': run.time}
+            for run in raw.runs
+        ]
+
+    def result(self) -> dict:
+        return {'runs': self.runs}
+
+
+class Jumps(Analyzer):
+    """Take-offs: leaving the ground with upward velocity."""
+
+    name = 'jumps'
+
+    def __init__(self) -> None:
+        self.jumps = 0
+        self._on_ground: Optional[bool] = None
+
+    def on_snapshot(self, snapshot) -> None:
+        ps = snapshot.ps
+        if ps.pm_type != PM_NORMAL:
+            self._on_ground = None
+            return
+        on_ground = ps.groundEntityNum != ENTITYNUM_NONE
+        if self._on_ground and not on_ground and ps.velocity[2] > 0:
+            self.jumps += 1
+        self._on_ground = on_ground
+
+    def result(self) -> dict:
+        return {'count': self.jumps}
+
+
+class GroundTime(_TimedAnalyzer):
+    name = 'ground_time'
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.ground_ms = 0
+        self.air_ms = 0
+
+    def add_time(self, snapshot, milliseconds: int) -> None:
+        if snapshot.ps.groundEntityNum != ENTITYNUM_NONE:
+            self.ground_ms += milliseconds
+        else:
+            self.air_ms += milliseconds
+
+    def result(self) -> dict:
+        total = self.ground_ms + self.air_ms
+        return {
+            'ground_ms': self.ground_ms,
+            'air_ms': self.air_ms,
+            'ground_ratio': round(self.ground_ms / total, 4) if total else None,
+        }
+
+
+class SpeedCurve(Analyzer):
+    """Top horizontal speed per interval, from the first PM_NORMAL snapshot on."""
+
+    name = 'speed_curve'
+    INTERVAL_MS = 1000
+
+    def __init__(self) -> None:
+        self._start: Optional[int] = None
+        self._buckets: Dict[int, int] = {}
+
+    def on_snapshot(self, snapshot) -> None:
+        if snapshot.ps.pm_type != PM_NORMAL:
+            return
+        if self._start is None:
+            self._start = snapshot.serverTime
+        bucket = (snapshot.serverTime - self._start) // self.INTERVAL_MS
+        speed = _horizontal_speed(snapshot.ps)
+        if speed > self._buckets.get(bucket, -1):
+            self._buckets[bucket] = speed
+
+    def result(self) -> dict:
+        return {
+            'interval_ms': self.INTERVAL_MS,
+            'top_speed': max(self._buckets.values(), default=0),
+            'curve': [[bucket * self.INTERVAL_MS, speed] for bucket, speed in sorted(self._buckets.items())],
+        }
+
+
+class Weapons(_TimedAnalyzer):
+    """Time each weapon was held, and how often the player switched."""
+
+    name = 'weapons'
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.held_ms: Dict[str, int] = {}
+        self.switches = 0
+        self._weapon: Optional[int] = None
+
+    def on_snapshot(self, snapshot) -> None:
+        if snapshot.ps.pm_type == PM_NORMAL:
+            weapon = snapshot.ps.weapon
+            if self._weapon is not None and weapon != self._weapon:
+                self.switches += 1
+            self._weapon = weapon
+        super().on_snapshot(snapshot)
+
+    def add_time(self, snapshot, milliseconds: int) -> None:
+        weapon = snapshot.ps.weapon
+        name = WEAPON_NAMES[weapon] if 0 <= weapon < len(WEAPON_NAMES) else str(weapon)
+        self.held_ms[name] = self.held_ms.get(name, 0) + milliseconds
+
+    def result(self) -> dict:
+        return {'held_ms': self.held_ms, 'switches': self.switches}
+
+
+ANALYZERS: Dict[str, Type[Analyzer]] = {
+    cls.name: cls for cls in (CheckpointSplits, Jumps, GroundTime, SpeedCurve, Weapons)
+}
+
+
+def create(names: Iterable[str]) -> List[Analyzer]:
+    """Fresh analyzers by name; 'all' expands to every registered one."""
+    analyzers: List[Analyzer] = []
+    for name in names:
+        if name == 'all':
+            analyzers.extend(cls() for cls in ANALYZERS.values())
+        elif name in ANALYZERS:
+            analyzers.append(ANALYZERS[name]())
+        else:
+            raise ValueError(f"Unknown analyzer '{name}' (known: {', '.join(ANALYZERS)})")
+    return analyzers
+
+
+def results(analyzers: Iterable[Analyzer]) -> dict:
+    return {analyzer.name: analyzer.result() for analyzer in analyzers}
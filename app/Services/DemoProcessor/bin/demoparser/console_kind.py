@@ -0,0 +1,49 @@
+"""
+Server commands the naming layer reads (console_commands_parser.py), classified
+as they arrive. The parser keeps only lines of these kinds and counts the rest,
+so chat and the like never pile up in memory on long server demos.
+
+The checks run in the order ConsoleComandsParser used to apply them; the first
+match decides the kind.
+"""
+DROPPED = 0
+DATE = 1
+ONLINE_FINISH = 2
+Q3DF_RANK = 3
+OFFLINE_TIME = 4
+OLD1_TIME = 5
+OFFLINE_TIME_NO_NAME = 6
+OLD3_TIME = 7
+TIMER_STARTED = 8
+TIMER_STOPPED = 9
+
+Q3DF_RANK_TOKENS = (
+    'broke the server record',
+    'you are now rank',
+    'is now rank',
+    'set the first record with',
+    'equalled the server record with',
+)
+
+
+def classify(text: str) -> int:
+    if text.startswith('print "Date:'):
+        return DATE
+    if 'reached the finish line in' in text:
+        return ONLINE_FINISH
+    for token in Q3DF_RANK_TOKENS:
+        if token in text:
+            return Q3DF_RANK
+    if text.startswith('print "Time performed by'):
+        return OFFLINE_TIME
+    if text.startswith('NewTime'):
+        return OLD1_TIME
+    if text.startswith('print "^3Time Performed:'):
+        return OFFLINE_TIME_NO_NAME
+    if text.startswith('newTime'):
+        return OLD3_TIME
+    if text.startswith('TimerStarted'):
+        return TIMER_STARTED
+    if text.startswith('TimerStopped'):
+        return TIMER_STOPPED
+    return DROPPED
@@ -0,0 +1,98 @@
+"""
+Run fingerprints: the same run, whatever the bytes around it.
+
+MD5 tells copies of one demo apart as soon as a byte differs - a re-saved
+file, garbage appended to it, another header - although the run in it is the
+same. The fingerprint is taken from the decoded run instead: map, player, the
+timer value, and the player's path through the snapshots just before and after
+the finish, with server times relative to the finish and origins rounded to
+whole units. It is a hex digest, so it compares and indexes like MD5 does.
+
+FinishTrail collects that path during the parse the naming layer needs anyway
+(it is an analyzers.Analyzer); run_fingerprint() combines it with what the
+naming layer found.
+"""
+from __future__ import annotations
+
+import hashlib
+import math
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from .analyzers import PM_NORMAL, Analyzer
+
+# Snapshots looked at up to and including the finish, and PM_NORMAL ones after it.
+TRAIL_BEFORE = 24
+TRAIL_AFTER = 8
+
+Sample = Tuple[int, Tuple[int, int, int]]
+
+
+def _unit(value: float) -> int:
+    # A corrupt frame can carry a NaN or infinite origin.
+    return int(round(value)) if math.isfinite(value) else 0
+
+
+def _sample(snapshot) -> Sample:
+    origin = snapshot.ps.origin
+    return snapshot.serverTime, (_unit(origin[0]), _unit(origin[1]), _unit(origin[2]))
+
+
+class FinishTrail(Analyzer):
+    """(serverTime, rounded origin) samples around every finish, keyed by the finish's server time.
+
+    A finish is the defrag timer's finish bit in stats[12] changing while in
+    PM_NORMAL; run_fingerprint() is given the one nearest the naming layer's finish.
+    """
+
+    name = 'finish_trail'
+
+    def __init__(self) -> None:
+        self.trails: Dict[int, List[Sample]] = {}
+        # Snapshots, not just PM_NORMAL ones; the trail keeps only those.
+        self._recent: Deque = deque(maxlen=TRAIL_BEFORE)
+        self._open: List[list] = []
+        self._stat: Optional[int] = None
+
+    def on_snapshot(self, snapshot) -> None:
+        # Runs for every snapshot, so it only keeps the snapshot and watches
+        # the timer; samples are made for the few that end up in a trail.
+        self._recent.append(snapshot)
+        if self._open:
+            self._extend(snapshot)
+        stat = snapshot.ps.stats[12]
+        if stat == self._stat:
+            return
+        previous, self._stat = self._stat, stat
+        if previous is not None and (previous ^ stat) & 8 and snapshot.ps.pm_type == PM_NORMAL:
+            trail = [_sample(recent) for recent in self._recent if recent.ps.pm_type == PM_NORMAL]
+            self.trails[snapshot.serverTime] = trail
+            self._open.append([TRAIL_AFTER, trail])
+
+    def _extend(self, snapshot) -> None:
+        if snapshot.ps.pm_type != PM_NORMAL:
+            return
+        sample = _sample(snapshot)
+        for pending in self._open:
+            pending[1].append(sample)
+            pending[0] -= 1
+        self._open = [pending for pending in self._open if pending[0] > 0]
+
+    def near(self, server_time: int) -> Optional[Tuple[int, List[Sample]]]:
+        """(finish server time, samples) of the finish closest to `server_time`, or None."""
+        if not self.trails:
+            return None
+        finish = min(self.trails, key=lambda key: abs(key - server_time))
+        return finish, self.trails[finish]
+
+    def result(self) -> dict:
+        return {'finishes': len(self.trails)}
+
+
+def run_fingerprint(map_name: str, player: str, time_ms: int, finish_server_time: int, trail: List[Sample]) -> str:
+    """32 hex digits identifying a run; equal for every copy of it."""
+    digest = hashlib.sha256()
+    digest.update(f'{(map_name or "").lower()}\n{player or ""}\n{time_ms}\n'.encode('utf-8', 'replace'))
+    for server_time, (x, y, z) in trail:
+        digest.update(f'{server_time - finish_server_time}:{x},{y},{z};'.encode())
+    return digest.hexdigest()[:32]
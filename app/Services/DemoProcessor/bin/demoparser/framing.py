@@ -0,0 +1,125 @@
+"""
+Header-only scan of a demo's message framing.
+
+Every message starts with an 8-byte header (sequence, length) that
+Q3MessageStream reads before the payload. Walking from header to header,
+without reading a payload or touching the Huffman decoder, already tells how
+many messages there are and how many bytes they carry, whether sequence
+numbers skip, and whether the file ends cleanly, in a few milliseconds even
+for a large demo. scan_framing() returns that, and estimate_parse_seconds()
+turns it into the expected cost of a full parse, so callers can reject a
+broken file, pick a timeout or route a big demo before decoding anything.
+"""
+from __future__ import annotations
+
+import mmap
+import struct
+from dataclasses import asdict, dataclass
+
+from . import const, native
+from .huffman import _HAS_C_EXTENSION
+
+HEADER = struct.Struct('<ii')
+
+# Payload bytes decoded per second by a whole parse, measured on defrag demos
+# for each decode path, and what a parse costs before the first byte.
+NATIVE_BYTES_PER_SECOND = 6e6
+C_READER_BYTES_PER_SECOND = 2.5e6
+PYTHON_READER_BYTES_PER_SECOND = 0.3e6
+PARSE_OVERHEAD_SECONDS = 0.05
+
+
+@dataclass
+class FramingScan:
+    file_bytes: int = 0
+    messages: int = 0
+    payload_bytes: int = 0
+    largest_message: int = 0
+    first_sequence: int = -1
+    last_sequence: int = -1
+    # Places where a sequence number is not the previous one plus one, and
+    # how many numbers those jumps skipped in total.
+    sequence_gaps: int = 0
+    missing_sequences: int = 0
+    out_of_order: int = 0
+    end_marker: bool = False
+    # The last header or payload is cut short; a parse stops there quietly.
+    truncated: bool = False
+    # A length outside 0..Q3_MESSAGE_MAX_SIZE; a parse fails with ErrorCantOpenFile there.
+    bad_length: bool = False
+    # Bytes after the end marker or after the point the scan had to stop.
+    trailing_bytes: int = 0
+
+    @property
+    def broken(self) -> bool:
+        """Nothing a parse could use: no complete message, or a corrupt length."""
+        return self.bad_length or self.messages == 0
+
+    def to_dict(self) -> dict:
+        result = asdict(self)
+        result['broken'] = self.broken
+        result['estimated_parse_seconds'] = round(estimate_parse_seconds(self), 3)
+        return result
+
+
+def scan_buffer(data) -> FramingScan:
+    """FramingScan of a demo held in memory (bytes, or an mmap)."""
+    scan = FramingScan(file_bytes=len(data))
+    unpack_from = HEADER.unpack_from
+    size = len(data)
+    position = 0
+    previous = None
+    while True:
+        if size - position < HEADER.size:
+            scan.truncated = position != size
+            break
+        sequence, length = unpack_from(data, position)
+        if sequence == -1 and length == -1:
+            scan.end_marker = True
+            position += HEADER.size
+            break
+        if length < 0 or length > const.Q3_MESSAGE_MAX_SIZE:
+            scan.bad_length = True
+            break
+        if size - position - HEADER.size < length:
+            scan.truncated = True
+            break
+        position += HEADER.size + length
+        scan.messages += 1
+        scan.payload_bytes += length
+        if length > scan.largest_message:
+            scan.largest_message = length
+        if previous is None:
+            scan.first_sequence = sequence
+        elif sequence <= previous:
+            scan.out_of_order += 1
+        elif sequence != previous + 1:
+            scan.sequence_gaps += 1
+            scan.missing_sequences += sequence - previous - 1
+        previous = sequence
+    if previous is not None:
+        scan.last_sequence = previous
+    if not scan.truncated:
+        scan.trailing_bytes = size - position
+    return scan
+
+
+def scan_framing(file_name: str) -> FramingScan:
+    """FramingScan of a demo file; only the pages holding headers are read."""
+    with open(file_name, 'rb') as handle:
+        try:
+            with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return scan_buffer(data)
+        except ValueError:  # empty file
+            return scan_buffer(b'')
+
+
+def estimate_parse_seconds(scan: FramingScan) -> float:
+    """Expected wall time of a full parse in this build, from the payload size."""
+    if native.AVAILABLE:
+        rate = NATIVE_BYTES_PER_SECOND
+    elif _HAS_C_EXTENSION:
+        rate = C_READER_BYTES_PER_SECOND
+    else:
+        rate = PYTHON_READER_BYTES_PER_SECOND
+    return PARSE_OVERHEAD_SECONDS + scan.payload_bytes / rate
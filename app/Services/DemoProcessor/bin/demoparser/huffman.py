@@ -29,6 +29,12 @@ try:
     _HAS_C_EXTENSION = True
 except ImportError:
     _HAS_C_EXTENSION = False
+try:
+    from ._q3huff import symbol_count as _c_symbol_count
+except ImportError:
+    # No extension, or one built before it counted symbols.
+    def _c_symbol_count() -> int:
+        return 0
 from .parser_exceptions import (
     ErrorBadCommandInParseGameState,
     ErrorDeltaFrameTooOld,
@@ -49,6 +55,8 @@ class Q3HuffmanNode:
 
 class Q3HuffmanMapper:
     rootNode: "Q3HuffmanNode | None" = None
+    # Symbols decoded by the pure-Python reader in this process (for metrics).
+    symbolCount: int = 0
 
     @classmethod
     def decode_symbol(cls, reader: BitStreamReader) -> int:
@@ -59,6 +67,7 @@ class Q3HuffmanMapper:
             if bit < 0:
                 return -1
             node = node.left if bit == 0 else node.right
+        cls.symbolCount += 1
         return const.Q3_HUFFMAN_NYT_SYM if node is None else node.symbol
 
     @classmethod
@@ -133,7 +142,8 @@ class _Q3HuffmanReaderPython:
             decoded = 0
             for offset in range(0, bits, 8):
                 sym = Q3HuffmanMapper.decode_symbol(self.stream)
-                if sym == const.Q3_HUFFMAN_NYT_SYM:
+                # -1 is the end of the data; the C reader stops on either.
+                if sym < 0 or sym == const.Q3_HUFFMAN_NYT_SYM:
                     return -1
                 decoded |= sym << offset
             if fragment_bits:
@@ -141,6 +151,9 @@ class _Q3HuffmanReaderPython:
             value |= decoded
         if neg and bits > 0 and (value & (1 << (bits - 1))):
             value |= -1 ^ ((1 << bits) - 1)
+        elif value & 0x80000000:
+            # 32-bit reads are signed, as in the engine and the C reader.
+            value -= 1 << 32
         return value
 
     def readNumber(self, bits: int) -> int:
@@ -176,7 +189,8 @@ class _Q3HuffmanReaderPython:
 
     def readData(self, data: bytearray, length: int) -> None:
         for index in range(min(length, len(data))):
-            data[index] = self.readByte()
+            # Past the end readByte is -1, which the C reader stores as 0xFF.
+            data[index] = self.readByte() & 0xFF
 
     def readStringBase(self, limit: int, stop_at_newline: bool) -> str:
         chars: List[str] = []
@@ -314,3 +328,8 @@ if _HAS_C_EXTENSION:
     Q3HuffmanReader = _Q3HuffmanReaderC
 else:
     Q3HuffmanReader = _Q3HuffmanReaderPython
+
+
+def decoded_symbol_count() -> int:
+    """Huffman symbols decoded so far by either reader; the C reader's count is per thread."""
+    return Q3HuffmanMapper.symbolCount + _c_symbol_count()
@@ -0,0 +1,128 @@
+"""
+Whole-demo decoding in _q3huff.
+
+decode_demo() in the extension runs the framing, gamestate, snapshot and
+packet-entity loop of Q3DemoConfigParser in C and releases the GIL while it
+does, so several demos can be parsed on threads of one process. It returns only
+what the naming layer reads - configstrings, server commands, logged errors and
+a PlayerStateSummary per valid snapshot - and this module replays those through
+the same Q3DemoConfigParser methods a message-by-message parse uses, so client
+events, times and console lines come out identical.
+
+What the replay does not fill in is the snapshot and entity bookkeeping
+(client.snapshots, parseEntities, baselines), which nothing after the parse
+reads. DEMOPARSER_NO_NATIVE=1 turns the path off.
+"""
+from __future__ import annotations
+
+import os
+import struct
+from itertools import islice
+
+from .parser_exceptions import (
+    ErrorBadCommandInParseGameState,
+    ErrorBaselineNumberOutOfRange,
+    ErrorCantOpenFile,
+    ErrorDeltaFrameTooOld,
+    ErrorDeltaFromInvalidFrame,
+    ErrorDeltaParseEntitiesNumTooOld,
+    ErrorParsePacketEntitiesEndOfMessage,
+    ErrorParseSnapshotInvalidsize,
+    ErrorUnableToParseDeltaEntityState,
+)
+from .structures.client import PlayerStateSummary, SnapshotSummary
+
+try:
+    from ._q3huff import decode_demo as _c_decode_demo
+    from .huffman import Q3HuffmanReader as READER
+    AVAILABLE = not os.environ.get('DEMOPARSER_NO_NATIVE')
+except ImportError:
+    # No extension, or one built before it could decode whole demos.
+    READER = None
+    AVAILABLE = False
+
+# Status codes of _q3huff.decode_demo.
+DECODE_OK = 0
+DECODE_BAD_LENGTH = 1
+DECODE_FALLBACK = 2
+
+# Indexed by the error codes _q3huff.decode_demo reports.
+ERRORS = (
+    ErrorBaselineNumberOutOfRange,
+    ErrorUnableToParseDeltaEntityState,
+    ErrorBadCommandInParseGameState,
+    ErrorDeltaFromInvalidFrame,
+    ErrorDeltaFrameTooOld,
+    ErrorDeltaParseEntitiesNumTooOld,
+    ErrorParseSnapshotInvalidsize,
+    ErrorParsePacketEntitiesEndOfMessage,
+)
+
+# serverTime, messageNum, commandTime, pm_type, pm_flags, clientNum,
+# movementDir, groundEntityNum, weapon, origin[3], velocity[3], viewangles[3],
+# stats[16] - see dd_record_snapshot in _q3huff.c.
+SNAPSHOT_RECORD = struct.Struct('=9i9f16i')
+
+
+def iter_snapshots(records: bytes):
+    for values in SNAPSHOT_RECORD.iter_unpack(records):
+        ps = PlayerStateSummary(
+            commandTime=values[2],
+            pm_type=values[3],
+            pm_flags=values[4],
+            clientNum=values[5],
+            movementDir=values[6],
+            groundEntityNum=values[7],
+            weapon=values[8],
+            origin=values[9:12],
+            velocity=values[12:15],
+            viewangles=values[15:18],
+            stats=values[18:],
+        )
+        yield SnapshotSummary(values[0], values[1], ps)
+
+
+def decode_demo(parser, data: bytes) -> bool:
+    """Fill `parser` (a fresh Q3DemoConfigParser) from a whole demo file.
+
+    False when the demo has to be parsed message by message instead; the parser
+    is left untouched then.
+    """
+    result = _c_decode_demo(data)
+    status = result['status']
+    if status == DECODE_BAD_LENGTH:
+        raise ErrorCantOpenFile()
+    if status != DECODE_OK:
+        return False
+
+    clc = parser.clc
+    configs = result['configs']
+    seen_snapshot = result['configs_before_first_snapshot'] >= 0
+    split = result['configs_before_first_snapshot'] if seen_snapshot else len(configs)
+    for key, value in configs[:split]:
+        clc.configs[key] = value
+    # The client config is read from the configstrings in place at the first snapshot.
+    if seen_snapshot:
+        parser._init_client_config()
+    for key, value in configs[split:]:
+        clc.configs[key] = value
+
+    for code in result['errors']:
+        parser._log_error(ERRORS[code]())
+    # Commands and snapshots are replayed in the order they were in the demo;
+    # each command carries how many snapshots came before it.
+    snapshots = iter_snapshots(result['snapshots'])
+    replayed = 0
+    for key, server_time, snapshots_before, value in result['commands']:
+        for snapshot in islice(snapshots, snapshots_before - replayed):
+            parser._snapshot_done(snapshot)
+        replayed = snapshots_before
+        parser.serverTime = server_time
+        parser._store_server_command(key, value)
+    for snapshot in snapshots:
+        parser._snapshot_done(snapshot)
+
+    clc.clientNum = result['client_num']
+    clc.checksumFeed = result['checksum_feed']
+    clc.serverMessageSequence = result['sequence']
+    return True
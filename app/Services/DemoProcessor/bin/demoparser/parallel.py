@@ -0,0 +1,360 @@
+"""
+Two-phase parallel decoding for very large demos.
+
+The Q3 Huffman table is static and every netfield has a fixed width, so which
+values a message contains - and in what order they are read - depends only on
+the bytes of that message, never on earlier snapshots. Only applying the
+deltas needs the previous frames.
+
+Phase one runs in worker processes: each message is decoded through a
+recording reader into a flat list of records, with player-state and entity
+deltas kept as (field index, raw value) pairs. Phase two runs in the parent:
+the same Q3DemoConfigParser walks every message in order, but reads its values
+from those records instead of from the bitstream, so all state handling stays
+in one place and the result is identical to a sequential parse.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from collections import deque
+from typing import Deque, Iterator, List, Optional, Tuple
+
+from . import const
+from . import parser as _parser
+from .parser import Q3DemoConfigParser, Q3DemoMessage, Q3MessageStream
+from .structures.mapper import MapperFactory
+from .structures.player import EntityState, PlayerState
+
+# Below this a sequential parse finishes before a pool is worth starting.
+PARALLEL_MIN_BYTES = 64 * 1024 * 1024
+# Messages read ahead per round; each worker gets a contiguous share.
+BATCH_MESSAGES = 4096
+
+_ENTITY_REMOVED = 0
+_ENTITY_UNCHANGED = 1
+_ENTITY_INVALID = 2
+
+# Player-state arrays in the order they follow the field deltas on the wire.
+_PS_ARRAYS = (
+    ('stats', const.MAX_STATS, False),
+    ('persistant', const.MAX_PERSISTANT, False),
+    ('ammo', const.MAX_WEAPONS, False),
+    ('powerups', const.MAX_POWERUPS, True),
+)
+
+
+def default_workers() -> int:
+    return min(os.cpu_count() or 1, 8)
+
+
+def auto_workers(file_name: str, size: Optional[int] = None) -> int:
+    """Workers worth using for this demo; 0 means parse it sequentially.
+
+    Phase two still applies every delta in Python, so with the C reader the
+    sequential parse is already as fast as phase two alone. The split pays off
+    when bit decoding is the cost - large demos on the pure-Python reader.
+    `size` stands in for the file's size when the demo is not on disk.
+    """
+    from .huffman import _HAS_C_EXTENSION
+
+    if _HAS_C_EXTENSION or (os.path.getsize(file_name) if size is None else size) < PARALLEL_MIN_BYTES:
+        return 0
+    return default_workers()
+
+
+class _CapturingReader:
+    """Hands one netfield read through to the real reader and remembers the value."""
+
+    __slots__ = ("_reader", "value")
+
+    def __init__(self, reader) -> None:
+        self._reader = reader
+        self.value: object = None
+
+    def readLong(self) -> int:
+        self.value = self._reader.readLong()
+        return self.value
+
+    def readByte(self) -> int:
+        self.value = self._reader.readByte()
+        return self.value
+
+    def readNumBits(self, bits: int) -> int:
+        self.value = self._reader.readNumBits(bits)
+        return self.value
+
+    def readFloatIntegral(self) -> float:
+        self.value = self._reader.readFloatIntegral()
+        return self.value
+
+
+class _ValueReader:
+    """Answers any netfield read with a value decoded in phase one."""
+
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value: object = None
+
+    def readLong(self) -> object:
+        return self.value
+
+    def readByte(self) -> object:
+        return self.value
+
+    def readNumBits(self, bits: int) -> object:
+        return self.value
+
+    def readFloatIntegral(self) -> object:
+        return self.value
+
+
+class _RecordingReader:
+    """Phase one: decodes a message and writes down every value the parser asks for."""
+
+    def __init__(self, data: bytes) -> None:
+        # Looked up on the parser module so a swapped-in reader class is honoured.
+        self._reader = _parser.Q3HuffmanReader(data)
+        self._capture = _CapturingReader(self._reader)
+        self.records: List[object] = []
+
+    def isEOD(self) -> bool:
+        value = self._reader.isEOD()
+        self.records.append(value)
+        return value
+
+    def readByte(self) -> int:
+        value = self._reader.readByte()
+        self.records.append(value)
+        return value
+
+    def readShort(self) -> int:
+        value = self._reader.readShort()
+        self.records.append(value)
+        return value
+
+    def readLong(self) -> int:
+        value = self._reader.readLong()
+        self.records.append(value)
+        return value
+
+    def readNumBits(self, bits: int) -> int:
+        value = self._reader.readNumBits(bits)
+        self.records.append(value)
+        return value
+
+    def readString(self) -> str:
+        value = self._reader.readString()
+        self.records.append(value)
+        return value
+
+    def readBigString(self) -> str:
+        value = self._reader.readBigString()
+        self.records.append(value)
+        return value
+
+    def readData(self, data: bytearray, length: int) -> None:
+        self._reader.readData(data, length)
+        self.records.append(bytes(data[:length]))
+
+    def readDeltaEntity(self, state: EntityState, number: int) -> bool:
+        reader = self._reader
+        if reader.readNumBits(1) == 1:
+            state.number = const.MAX_GENTITIES - 1
+            self.records.append(_ENTITY_REMOVED)
+            return True
+        if reader.readNumBits(1) == 0:
+            state.number = number
+            self.records.append(_ENTITY_UNCHANGED)
+            return True
+        count = reader.readByte()
+        if count < 0 or count > MapperFactory.EntityStateFieldNum:
+            self.records.append(_ENTITY_INVALID)
+            return False
+        state.number = number
+        capture = self._capture
+        fields: List[Tuple[int, bool, object]] = []
+        for index in range(count):
+            if reader.readNumBits(1) == 0:
+                continue
+            reset = reader.readNumBits(1) == 0
+            capture.value = None
+            MapperFactory.update_entity_state(state, index, capture, reset)
+            fields.append((index, reset, capture.value))
+        self.records.append(fields)
+        return True
+
+    def readDeltaPlayerState(self, state: PlayerState) -> bool:
+        reader = self._reader
+        fields: List[Tuple[int, object]] = []
+        arrays: List[Tuple[int, int, int]] = []
+        count = reader.readByte()
+        if count < 0 or count > MapperFactory.PlayerStateFieldNum:
+            self.records.append((False, fields, arrays))
+            return False
+        capture = self._capture
+        for index in range(count):
+            if reader.readNumBits(1) == 0:
+                continue
+            MapperFactory.update_player_state(state, index, capture, False)
+            fields.append((index, capture.value))
+        if reader.readNumBits(1) != 0:
+            for array_index, (_, length, is_long) in enumerate(_PS_ARRAYS):
+                if reader.readNumBits(1) == 0:
+                    continue
+                bits = reader.readNumBits(length)
+                for idx in range(length):
+                    if bits & (1 << idx):
+                        arrays.append((array_index, idx, reader.readLong() if is_long else reader.readShort()))
+        self.records.append((True, fields, arrays))
+        return True
+
+
+class _ReplayReader:
+    """Phase two: gives the parser the values phase one decoded, in the same order."""
+
+    def __init__(self, records: List[object]) -> None:
+        self._next = iter(records).__next__
+        self._value = _ValueReader()
+
+    def isEOD(self) -> bool:
+        return self._next()
+
+    def readByte(self) -> int:
+        return self._next()
+
+    def readShort(self) -> int:
+        return self._next()
+
+    def readLong(self) -> int:
+        return self._next()
+
+    def readNumBits(self, bits: int) -> int:
+        return self._next()
+
+    def readString(self) -> str:
+        return self._next()
+
+    def readBigString(self) -> str:
+        return self._next()
+
+    def readData(self, data: bytearray, length: int) -> None:
+        chunk = self._next()
+        data[:len(chunk)] = chunk
+
+    def readDeltaEntity(self, state: EntityState, number: int) -> bool:
+        record = self._next()
+        if record == _ENTITY_REMOVED:
+            state.number = const.MAX_GENTITIES - 1
+            return True
+        if record == _ENTITY_UNCHANGED:
+            state.number = number
+            return True
+        if record == _ENTITY_INVALID:
+            return False
+        state.number = number
+        value = self._value
+        for index, reset, raw in record:
+            value.value = raw
+            MapperFactory.update_entity_state(state, index, value, reset)
+        return True
+
+    def readDeltaPlayerState(self, state: PlayerState) -> bool:
+        ok, fields, arrays = self._next()
+        value = self._value
+        for index, raw in fields:
+            value.value = raw
+            MapperFactory.update_player_state(state, index, value, False)
+        for array_index, idx, raw in arrays:
+            getattr(state, _PS_ARRAYS[array_index][0])[idx] = raw
+        return ok
+
+
+def _decode_chunk(chunk: List[Tuple[int, bytes]]) -> List[Optional[List[object]]]:
+    """Phase one for a contiguous run of messages.
+
+    The throwaway parser only drives the reads; its state is never used. A
+    message that raises comes back as None and is parsed the ordinary way in
+    phase two, which raises the same error at the same point.
+    """
+    parser = Q3DemoConfigParser()
+    results: List[Optional[List[object]]] = []
+    for sequence, data in chunk:
+        reader = _RecordingReader(data)
+        try:
+            parser.parse_with_reader(Q3DemoMessage(sequence=sequence, size=len(data), data=data), reader)
+        except Exception:
+            results.append(None)
+            continue
+        results.append(reader.records)
+    return results
+
+
+def _read_batches(stream: Q3MessageStream, size: int) -> Iterator[List[Q3DemoMessage]]:
+    batch: List[Q3DemoMessage] = []
+    while True:
+        message = stream.next_message()
+        if message is None:
+            break
+        batch.append(message)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _split(batch: List[Q3DemoMessage], parts: int) -> List[List[Q3DemoMessage]]:
+    step = max(1, -(-len(batch) // parts))
+    return [batch[index:index + step] for index in range(0, len(batch), step)]
+
+
+def parse_messages_parallel(parser: Q3DemoConfigParser, stream: Q3MessageStream, workers: int, batch_size: int = BATCH_MESSAGES,
+                            deadline: Optional[float] = None) -> bool:
+    """Feed every message of `stream` into `parser`, decoding them on `workers` processes.
+
+    One batch is always being decoded while the previous one is applied.
+    With a `deadline` (time.monotonic()), stops between batches once it has
+    passed; True if it did.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        in_flight: Deque = deque()
+
+        def apply_oldest() -> bool:
+            chunks, futures = in_flight.popleft()
+            for chunk, future in zip(chunks, futures):
+                for message, records in zip(chunk, future.result()):
+                    if records is None:
+                        keep_going = parser.parse(message)
+                    else:
+                        keep_going = parser.parse_with_reader(message, _ReplayReader(records))
+                    if not keep_going:
+                        return False
+            return True
+
+        def cancel_all() -> None:
+            for _, pending in in_flight:
+                for future in pending:
+                    future.cancel()
+
+        for batch in _read_batches(stream, batch_size):
+            if deadline is not None and parser.messages and time.monotonic() >= deadline:
+                cancel_all()
+                return True
+            chunks = _split(batch, workers)
+            futures = [pool.submit(_decode_chunk, [(m.sequence, m.data) for m in chunk]) for chunk in chunks]
+            in_flight.append((chunks, futures))
+            if len(in_flight) > 1 and not apply_oldest():
+                cancel_all()
+                return False
+        while in_flight:
+            if deadline is not None and parser.messages and time.monotonic() >= deadline:
+                cancel_all()
+                return True
+            if not apply_oldest():
+                return False
+    return False
@@ -4,11 +4,13 @@ Credit: based on DemoCleaner3 by ivan200 — https://github.com/ivan200/DemoClea
 
 from __future__ import annotations
 
+import io
 import struct
+import time
 from dataclasses import dataclass
-from typing import Optional
+from typing import Dict, Optional, Tuple
 
-from . import const, q3_svc
+from . import console_kind, const, native, q3_svc
 from .huffman import Q3HuffmanReader
 from .parser_exceptions import (
     ErrorBadCommandInParseGameState,
@@ -21,16 +23,27 @@ from .parser_exceptions import (
     ErrorParseSnapshotInvalidsize,
     ErrorUnableToParseDeltaEntityState,
 )
-from .structures.client import CLSnapshot, ClientConnection, ClientState
+from .framing import NATIVE_BYTES_PER_SECOND
+from .sources import COMPRESSED_SUFFIXES, read_demo
+from .structures.client import CLSnapshot, ClientConnection, ClientState, ConsoleLine
 from .structures.client_event import ClientEvent
 from .structures.mapper import MapperFactory
 from .structures.player import EntityState
 from .utils import split_config
 import sys
 import os
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# ext and raw_info live next to the package, not inside it. Put that directory
+# on the path once, here, rather than on every parse_config call.
+_BIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _BIN_DIR not in sys.path:
+    sys.path.append(_BIN_DIR)
 from ext import Ext
 
+# With a deadline, the uninterruptible native decode is only used when twice
+# its estimated time still fits in what is left.
+NATIVE_DEADLINE_MARGIN = 2.0
+
 
 def _get_or_create(dictionary, key, factory):
     value = dictionary.get(key)
@@ -40,6 +53,12 @@ def _get_or_create(dictionary, key, factory):
     return value
 
 
+class TimeResult:
+    def __init__(self, time: int, has_error: bool) -> None:
+        self.Time = time
+        self.HasError = has_error
+
+
 @dataclass
 class Q3DemoMessage:
     sequence: int
@@ -48,8 +67,9 @@ class Q3DemoMessage:
 
 
 class Q3MessageStream:
-    def __init__(self, file_name: str) -> None:
-        self._handle = open(file_name, 'rb')
+    def __init__(self, source) -> None:
+        # A path, or a binary file object positioned at the first message.
+        self._handle = open(source, 'rb') if isinstance(source, (str, os.PathLike)) else source
 
     def next_message(self) -> Optional[Q3DemoMessage]:
         header = self._handle.read(8)
@@ -65,20 +85,63 @@ class Q3MessageStream:
             return None
         return Q3DemoMessage(sequence=sequence, size=msg_length, data=data)
 
+    def read_all(self) -> bytes:
+        """The rest of the file, for decoders that frame the messages themselves."""
+        return self._handle.read()
+
+    def rewind(self) -> None:
+        self._handle.seek(0)
+
     def close(self) -> None:
         self._handle.close()
 
 
+def message_offsets(file_name: str, sequences, data=None) -> Dict[int, Tuple[int, int]]:
+    """(offset of the header, offset past the data) of the messages with these sequence numbers.
+
+    Reads only the 8-byte message headers, so it is cheap next to a parse.
+    `data` is the demo itself when it was parsed from memory.
+    """
+    wanted = set(sequences)
+    offsets: Dict[int, Tuple[int, int]] = {}
+    with (open(file_name, 'rb') if data is None else io.BytesIO(data)) as handle:
+        position = 0
+        while wanted:
+            header = handle.read(8)
+            if len(header) != 8:
+                break
+            sequence, msg_length = struct.unpack('<ii', header)
+            if msg_length < 0 or msg_length > const.Q3_MESSAGE_MAX_SIZE:
+                break
+            end = position + 8 + msg_length
+            if sequence in wanted:
+                wanted.discard(sequence)
+                offsets[sequence] = (position, end)
+            handle.seek(msg_length, os.SEEK_CUR)
+            position = end
+    return offsets
+
+
 class Q3DemoConfigParser:
-    def __init__(self) -> None:
+    def __init__(self, analyzers=None) -> None:
         self.clc = ClientConnection()
         self.client = ClientState()
         self.serverTime = 0
+        # analyzers.Analyzer instances, fed every valid snapshot and server command.
+        self.analyzers: list = list(analyzers) if analyzers else []
+        # Messages parsed so far and their size with headers, for partial results.
+        self.messages = 0
+        self.messageBytes = 0
 
     def parse(self, message: Q3DemoMessage) -> bool:
+        return self.parse_with_reader(message, Q3HuffmanReader(message.data))
+
+    def parse_with_reader(self, message: Q3DemoMessage, reader: Q3HuffmanReader) -> bool:
+        """Parse one message, taking its values from `reader` rather than decoding `message.data`."""
+        self.messages += 1
+        self.messageBytes += 8 + message.size
         self.serverTime = 0
         self.clc.serverMessageSequence = message.sequence
-        reader = Q3HuffmanReader(message.data)
         reader.readLong()
         while not reader.isEOD():
             command = reader.readByte()
@@ -98,8 +161,18 @@ class Q3DemoConfigParser:
 
     def _parse_server_command(self, reader: Q3HuffmanReader) -> None:
         key = reader.readLong()
-        value = reader.readString()
-        self.clc.console[key] = (self.serverTime, value)
+        self._store_server_command(key, reader.readString())
+
+    def _store_server_command(self, key: int, value: str) -> None:
+        for analyzer in self.analyzers:
+            analyzer.on_server_command(self.serverTime, value)
+        kind = console_kind.classify(value)
+        if kind == console_kind.DROPPED:
+            self.clc.consoleDropped += 1
+            # A resent sequence number replaces whatever was stored under it.
+            self.clc.console.pop(key, None)
+            return
+        self.clc.console[key] = ConsoleLine(self.serverTime, kind, value)
 
     def _parse_game_state(self, reader: Q3HuffmanReader) -> None:
         reader.readLong()
@@ -129,20 +202,7 @@ class Q3DemoConfigParser:
 
     def _parse_snapshot(self, decoder: Q3HuffmanReader) -> None:
         if self.client.clientConfig is None:
-            self.client.clientConfig = {}
-            game_cfg = self.clc.configs.get(const.Q3_DEMO_CFG_FIELD_GAME)
-            if game_cfg is not None:
-                game_config = split_config(game_cfg)
-                self.client.isCheatsOn = Ext.GetOrZero(game_config, 'sv_cheats') > 0
-            client_cfg = self.clc.configs.get(const.Q3_DEMO_CFG_FIELD_CLIENT)
-            if client_cfg is not None:
-                client_config = split_config(client_cfg)
-                self.client.clientConfig = client_config
-                self.client.dfvers = Ext.GetOrZero(client_config, 'defrag_vers')
-                mapname = Ext.GetOrNull(client_config, 'mapname')
-                self.client.mapname = mapname or ''
-                self.client.mapNameChecksum = self._map_checksum(self.client.mapname)
-                self.client.isOnline = Ext.GetOrZero(client_config, 'defrag_gametype') > 4
+            self._init_client_config()
         new_snap = CLSnapshot()
         new_snap.serverCommandNum = self.clc.serverCommandSequence
         new_snap.serverTime = decoder.readLong()
@@ -187,9 +247,33 @@ class Q3DemoConfigParser:
         self.client.snap.ping = 0
         self.client.snapshots[self.client.snap.messageNum & const.PACKET_MASK] = self.client.snap
         self.client.newSnapshots = True
-        self._update_client_events(new_snap)
+        self._snapshot_done(new_snap)
+
+    def _init_client_config(self) -> None:
+        """Read the game and client configstrings; done once, at the first snapshot."""
+        self.client.clientConfig = {}
+        game_cfg = self.clc.configs.get(const.Q3_DEMO_CFG_FIELD_GAME)
+        if game_cfg is not None:
+            game_config = split_config(game_cfg)
+            self.client.isCheatsOn = Ext.GetOrZero(game_config, 'sv_cheats') > 0
+        client_cfg = self.clc.configs.get(const.Q3_DEMO_CFG_FIELD_CLIENT)
+        if client_cfg is not None:
+            client_config = split_config(client_cfg)
+            self.client.clientConfig = client_config
+            self.client.dfvers = Ext.GetOrZero(client_config, 'defrag_vers')
+            mapname = Ext.GetOrNull(client_config, 'mapname')
+            self.client.mapname = mapname or ''
+            self.client.mapNameChecksum = self._map_checksum(self.client.mapname)
+            self.client.isOnline = Ext.GetOrZero(client_config, 'defrag_gametype') > 4
+
+    # `snapshot` is a CLSnapshot, or a SnapshotSummary from the native decoder;
+    # left unannotated so the compiled build accepts both.
+    def _snapshot_done(self, snapshot) -> None:
+        self._update_client_events(snapshot)
+        for analyzer in self.analyzers:
+            analyzer.on_snapshot(snapshot)
 
-    def _update_client_events(self, snapshot: CLSnapshot) -> None:
+    def _update_client_events(self, snapshot) -> None:
         if self.client.dfvers <= 0 or not self.client.mapname:
             return
         result = self._get_time(snapshot.ps, int(snapshot.serverTime), self.client.dfvers, self.client.mapNameChecksum)
@@ -323,17 +407,12 @@ class Q3DemoConfigParser:
             return 0
         return sum(map(ord, mapname.lower())) & 0xFF
 
-    class TimeResult:
-        def __init__(self, time: int, has_error: bool) -> None:
-            self.Time = time
-            self.HasError = has_error
-
-    def _get_time(self, ps, server_time: int, df_ver: int, checksum: int) -> 'Q3DemoConfigParser.TimeResult':
+    def _get_time(self, ps, server_time: int, df_ver: int, checksum: int) -> TimeResult:
         value = (ps.stats[7] << 16) | (ps.stats[8] & 0xFFFF)
         if value == 0:
-            return self.TimeResult(0, False)
+            return TimeResult(0, False)
         if (self.client.isOnline and df_ver != 190) or (df_ver >= 19112 and self.client.isCheatsOn):
-            return self.TimeResult(value, False)
+            return TimeResult(value, False)
         value ^= abs(int(ps.origin[0])) & 0xFFFF
         value ^= abs(int(ps.velocity[0])) << 16
         value ^= ps.stats[0] & 0xFF if ps.stats[0] > 0 else 150
@@ -355,31 +434,101 @@ class Q3DemoConfigParser:
         local_sum = sum((value >> (6 * idx)) & 0x3F for idx in range(3))
         local_sum += (value >> 18) & 0xF
         has_error = local != (local_sum & 0x3F)
-        return self.TimeResult(value, has_error)
+        return TimeResult(value, has_error)
 
     def _log_error(self, exc: Exception) -> None:
         self.clc.errors[str(exc)] = ''
 
 
 class Q3DemoParser:
-    def __init__(self, file_name: str) -> None:
+    def __init__(self, file_name: str, workers: int = 0, analyzers=None, data=None, deadline=None) -> None:
         self.file_name = file_name
+        # The demo itself when it is not read from file_name - bytes-like, or
+        # a binary stream such as an upload - and file_name then only names
+        # it (the naming layer reads markers from the name).
+        self.data = data
+        # More than one worker decodes messages in parallel (see parallel.py);
+        # only worth it for very large demos.
+        self.workers = workers
+        # See analyzers.py; their results are read off the instances afterwards.
+        self.analyzers = list(analyzers) if analyzers else []
+        # time.monotonic() at which to stop and return what has been parsed so
+        # far; checked between messages. The RawInfo then carries `progress`.
+        self.deadline = deadline
 
     def parse_config(self):
-        sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        # Imported here so the parser layer does not pull in the naming and
+        # validation layers until a demo is actually parsed.
         from raw_info import RawInfo
-        parser = Q3DemoConfigParser()
-        stream = Q3MessageStream(self.file_name)
+        parser = Q3DemoConfigParser(self.analyzers)
+        demo_path = self.file_name
+        data = self.data
+        if data is not None and hasattr(data, 'read'):
+            # The whole demo is needed in memory anyway by the native decoder
+            # and for run offsets.
+            data = data.read()
+        if data is None and self.file_name.lower().endswith(COMPRESSED_SUFFIXES):
+            # Decompressed into memory, and named as the demo inside (sources.py).
+            name, data = read_demo(self.file_name)
+            demo_path = os.path.join(os.path.dirname(self.file_name), name)
+        total = len(data) if data is not None else os.path.getsize(self.file_name)
+        deadline = self.deadline
+        stream = Q3MessageStream(self.file_name if data is None else io.BytesIO(data))
+        started = time.monotonic()
+        stopped = False
         try:
-            while True:
-                message = stream.next_message()
-                if message is None:
-                    break
-                if not parser.parse(message):
-                    break
+            if self.workers > 1:
+                from .parallel import parse_messages_parallel
+                stopped = parse_messages_parallel(parser, stream, self.workers, deadline=deadline)
+            elif not self._parse_native(parser, stream, deadline):
+                while True:
+                    # The first message, with the gamestate, is always parsed.
+                    if deadline is not None and parser.messages and time.monotonic() >= deadline:
+                        stopped = True
+                        break
+                    message = stream.next_message()
+                    if message is None:
+                        break
+                    if not parser.parse(message):
+                        break
         finally:
             stream.close()
-        return RawInfo(self.file_name, parser.clc, parser.client)
+        progress = None
+        if stopped:
+            progress = {
+                'messages': parser.messages,
+                'bytes': parser.messageBytes,
+                'total_bytes': total,
+                'fraction': round(parser.messageBytes / total, 4) if total else 0.0,
+                'seconds': round(time.monotonic() - started, 3),
+            }
+        raw = RawInfo(demo_path, parser.clc, parser.client, demoData=data, progress=progress)
+        for analyzer in self.analyzers:
+            analyzer.on_parsed(raw)
+        return raw
+
+    @staticmethod
+    def _parse_native(parser: Q3DemoConfigParser, stream: Q3MessageStream, deadline=None) -> bool:
+        """Decode the whole demo in one _q3huff call, without the GIL (native.py).
+
+        Only taken when the C reader is the one in use, so forcing the
+        pure-Python reader still parses everything in Python. False, with the
+        stream rewound, when the demo has to be parsed message by message.
+
+        The call cannot be interrupted, so with a `deadline` it is only made
+        when the demo should take well under the time left (framing.py's
+        rate); otherwise the message loop parses it and can stop in time.
+        """
+        if not native.AVAILABLE or Q3HuffmanReader is not native.READER:
+            return False
+        data = stream.read_all()
+        if deadline is not None and NATIVE_DEADLINE_MARGIN * len(data) / NATIVE_BYTES_PER_SECOND > deadline - time.monotonic():
+            stream.rewind()
+            return False
+        if native.decode_demo(parser, data):
+            return True
+        stream.rewind()
+        return False
 
     @staticmethod
     def get_raw_config_strings(file_name: str):
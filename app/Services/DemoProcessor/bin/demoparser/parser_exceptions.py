@@ -65,3 +65,13 @@ class ErrorInvalidFieldCount(ParserEx):
 class ErrorMatchPhysics(ParserEx):
     def __init__(self) -> None:
         super().__init__("Cvar: physics do not match reported physics")
+
+
+class ErrorNoDemoInArchive(ParserEx):
+    def __init__(self) -> None:
+        super().__init__("Archive does not contain a demo")
+
+
+class ErrorDemoTooLarge(ParserEx):
+    def __init__(self) -> None:
+        super().__init__("Demo is too large to decompress")
@@ -0,0 +1,45 @@
+"""
+Optional mypyc build of the parser's pure-Python hot path.
+
+parser.py and structures/{mapper,player,client}.py are compiled into native
+modules that sit next to their sources. The package only uses them while they
+are complete, newer than the sources and loadable, and imports the .py files
+otherwise (see _compiled.py), so a failed or stale build never breaks parsing.
+
+mypy and a C compiler are needed at build time only:
+
+    pip install mypy
+    python3 setup_mypyc.py build_ext --inplace
+"""
+import os
+
+from setuptools import setup
+from mypyc.build import mypycify
+
+from _compiled import COMPILED_MODULES, RUNTIME_GROUP
+
+# Module names are resolved from the directory above (demoparser.parser, ...).
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+setup(
+    name="demoparser_compiled",
+    ext_modules=mypycify(
+        [
+            # bin/ has an __init__.py of its own; without this mypy would name
+            # the modules bin.demoparser.* and compile them twice.
+            "--explicit-package-bases",
+            # _q3huff and the naming layer next to the package are not compiled.
+            "--ignore-missing-imports",
+            "--follow-imports=silent",
+        ] + [os.path.join("demoparser", *module.split(".")) + ".py" for module in COMPILED_MODULES],
+        opt_level="3",
+        group_name=RUNTIME_GROUP,
+        target_dir=os.path.join("demoparser", "build", "mypyc"),
+    ),
+    options={
+        "build": {"build_base": os.path.join("demoparser", "build")},
+        # Always relink: _compiled.py trusts a compiled module only while it
+        # is newer than its source.
+        "build_ext": {"force": True},
+    },
+)
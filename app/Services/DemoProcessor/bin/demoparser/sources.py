@@ -0,0 +1,274 @@
+"""
+Compressed demo sources.
+
+Stored demos are kept compressed (7z by default, see DemoProcessorService),
+and decompressing one to a temporary file before parsing it means writing and
+reading the demo back once more. read_demo() decompresses straight into
+memory instead: .gz and .xz/.lzma with the standard library, .zip members
+through zipfile, and .7z by reading `7z x -so` from a pipe, so nothing touches
+the disk but the archive itself.
+
+Besides the bytes, it returns the name of the demo inside the archive. The
+naming layer reads the country and TAS markers from the file name, so a demo
+has to be named as it was stored, not after its archive.
+
+iter_archive() walks every member of an uploaded .zip, .7z or .rar the same
+way, one demo in memory at a time; 7-Zip formats are decompressed in one
+`7z x -so` pass, split into members by the sizes its listing reports. Members
+that are not demos are listed but never kept in memory.
+
+Nothing is decompressed past MAX_DEMO_BYTES: a small file that expands
+without bound would otherwise take the worker's memory with it.
+"""
+from __future__ import annotations
+
+import os
+import re
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .parser_exceptions import ErrorDemoTooLarge, ErrorNoDemoInArchive
+
+DEMO_NAME_RE = re.compile(r"\.dm_\d+$", re.IGNORECASE)
+STREAM_SUFFIXES = ('.gz', '.xz', '.lzma')
+ARCHIVE_SUFFIXES = ('.zip', '.7z')
+# Upload formats iter_archive() reads; RAR goes through 7-Zip as well.
+UPLOAD_ARCHIVE_SUFFIXES = ('.zip', '.7z', '.rar')
+COMPRESSED_SUFFIXES = STREAM_SUFFIXES + ARCHIVE_SUFFIXES
+
+# Largest demo decompressed into memory; real demos stay well below it.
+MAX_DEMO_BYTES = 256 * 1024 * 1024
+READ_CHUNK = 1024 * 1024
+
+# 7-Zip ships as 7z (p7zip-full), 7za or 7zz depending on the distribution.
+SEVEN_ZIP_NAMES = ('7z', '7za', '7zz')
+
+
+def is_compressed(path) -> bool:
+    return os.fspath(path).lower().endswith(COMPRESSED_SUFFIXES)
+
+
+def seven_zip() -> str:
+    import shutil
+
+    for name in SEVEN_ZIP_NAMES:
+        found = shutil.which(name)
+        if found:
+            return found
+    raise FileNotFoundError("7-Zip is not installed (looked for 7z, 7za and 7zz)")
+
+
+def _read_limited(handle, limit: int = MAX_DEMO_BYTES) -> bytes:
+    """All of `handle`, read in chunks; ErrorDemoTooLarge once it passes `limit`."""
+    chunks: List[bytes] = []
+    total = 0
+    while True:
+        chunk = handle.read(READ_CHUNK)
+        if not chunk:
+            return b''.join(chunks)
+        total += len(chunk)
+        if total > limit:
+            raise ErrorDemoTooLarge()
+        chunks.append(chunk)
+
+
+def _pick_member(names: List[str], member: Optional[str]) -> str:
+    if member is not None:
+        if member not in names:
+            raise ErrorNoDemoInArchive()
+        return member
+    for name in names:
+        if DEMO_NAME_RE.search(name):
+            return name
+    raise ErrorNoDemoInArchive()
+
+
+def _seven_zip_entries(path: str) -> List[Dict[str, str]]:
+    """The file entries of `7z l -slt`, in archive order, as {property: value}."""
+    import subprocess
+
+    # -p with no password, so an encrypted archive fails instead of prompting.
+    process = subprocess.run(
+        [seven_zip(), 'l', '-slt', '-ba', '-p', path],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+    )
+    if process.returncode != 0:
+        raise OSError(f"7z could not list {path}: {_last_line(process.stderr) or process.returncode}")
+    entries: List[Dict[str, str]] = []
+    entry: Dict[str, str] = {}
+    for line in process.stdout.decode('utf-8', 'replace').splitlines() + ['']:
+        key, separator, value = line.partition(' = ')
+        if separator:
+            entry[key] = value
+            continue
+        # Blocks without a Size are the archive's own description, not members.
+        if 'Path' in entry and 'Size' in entry and entry.get('Folder') != '+' and not entry.get('Attributes', '').startswith('D'):
+            entries.append(entry)
+        entry = {}
+    return entries
+
+
+def _last_line(stderr: bytes) -> str:
+    lines = stderr.decode('utf-8', 'replace').strip().splitlines()
+    return lines[-1] if lines else ''
+
+
+def _read_seven_zip(path: str, member: str) -> bytes:
+    import subprocess
+
+    # -so writes the member to stdout; read straight off the pipe.
+    process = subprocess.Popen(
+        [seven_zip(), 'x', '-so', '-p', path, member],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+    )
+    try:
+        data = _read_limited(process.stdout)
+        if process.wait() != 0:
+            raise OSError(f"7z could not extract {member} from {path}: {_last_line(process.stderr.read()) or process.returncode}")
+        return data
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+        process.stderr.close()
+
+
+def read_demo(path, member: Optional[str] = None) -> Tuple[str, bytes]:
+    """(demo file name, decompressed demo) for a compressed demo.
+
+    `member` picks one file of a .zip or .7z archive; by default it is the
+    first one named like a demo. A .gz or .xz file holds one demo, named as
+    the file without its compression suffix. A demo over MAX_DEMO_BYTES
+    raises ErrorDemoTooLarge.
+    """
+    # The decompressors are imported only here, so plain demos do not pay
+    # for them at start-up.
+    path = os.fspath(path)
+    lower = path.lower()
+    if lower.endswith('.gz'):
+        import gzip
+        with gzip.open(path, 'rb') as handle:
+            return os.path.basename(path)[:-3], _read_limited(handle)
+    if lower.endswith(('.xz', '.lzma')):
+        import lzma
+        with lzma.open(path, 'rb') as handle:
+            return os.path.splitext(os.path.basename(path))[0], _read_limited(handle)
+    if lower.endswith('.zip'):
+        import zipfile
+        with zipfile.ZipFile(path) as archive:
+            name = _pick_member([info.filename for info in archive.infolist() if not info.is_dir()], member)
+            if archive.getinfo(name).file_size > MAX_DEMO_BYTES:
+                raise ErrorDemoTooLarge()
+            with archive.open(name) as handle:
+                return os.path.basename(name), _read_limited(handle)
+    if lower.endswith('.7z'):
+        entries = {entry['Path']: entry for entry in _seven_zip_entries(path)}
+        name = _pick_member(list(entries), member)
+        if int(entries[name].get('Size') or 0) > MAX_DEMO_BYTES:
+            raise ErrorDemoTooLarge()
+        return os.path.basename(name), _read_seven_zip(path, name)
+    raise ValueError(f"Not a compressed demo: {path}")
+
+
+@dataclass
+class ArchiveMember:
+    name: str  # path inside the archive
+    size: int
+    mtime: Optional[int]  # Unix time the archive recorded for the file, if any
+    # The decompressed demo; None for members that are not demos, and for
+    # demos that could not be read (see `error`).
+    data: Optional[bytes] = None
+    error: Optional[str] = None
+
+    @property
+    def is_demo(self) -> bool:
+        return DEMO_NAME_RE.search(self.name) is not None
+
+
+def _local_timestamp(value: datetime) -> int:
+    return int(time.mktime(value.timetuple()))
+
+
+def _iter_zip(path: str) -> Iterator[ArchiveMember]:
+    import zipfile
+    import zlib
+
+    with zipfile.ZipFile(path) as archive:
+        for info in archive.infolist():
+            if info.is_dir():
+                continue
+            member = ArchiveMember(info.filename, info.file_size, _local_timestamp(datetime(*info.date_time)))
+            if member.is_demo:
+                try:
+                    if info.file_size > MAX_DEMO_BYTES:
+                        raise ErrorDemoTooLarge()
+                    with archive.open(info) as handle:
+                        member.data = _read_limited(handle)
+                except (ErrorDemoTooLarge, zipfile.BadZipFile, RuntimeError, OSError, EOFError, zlib.error) as e:
+                    # One corrupt, encrypted or oversized member does not
+                    # lose the rest of the archive.
+                    member.error = str(e) or type(e).__name__
+            yield member
+
+
+def _skip(handle, size: int) -> int:
+    """Read and drop `size` bytes; how many there were."""
+    skipped = 0
+    while skipped < size:
+        chunk = handle.read(min(READ_CHUNK, size - skipped))
+        if not chunk:
+            break
+        skipped += len(chunk)
+    return skipped
+
+
+def _iter_seven_zip(path: str) -> Iterator[ArchiveMember]:
+    import subprocess
+
+    entries = _seven_zip_entries(path)
+    # Without member names, -so writes every file back to back in archive
+    # order: one decompression pass, even for a solid archive.
+    process = subprocess.Popen(
+        [seven_zip(), 'x', '-so', '-p', path],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+    )
+    try:
+        for entry in entries:
+            size = int(entry.get('Size') or 0)
+            try:
+                mtime = _local_timestamp(datetime.strptime(entry.get('Modified', '')[:19], '%Y-%m-%d %H:%M:%S'))
+            except ValueError:
+                mtime = None
+            member = ArchiveMember(entry['Path'], size, mtime)
+            keep = member.is_demo and size <= MAX_DEMO_BYTES
+            if member.is_demo and not keep:
+                member.error = str(ErrorDemoTooLarge())
+            # Members that are not kept are read past in chunks.
+            data = process.stdout.read(size) if keep else None
+            extracted = len(data) if data is not None else _skip(process.stdout, size)
+            if extracted != size:
+                process.wait()
+                raise OSError(f"7z could not extract {entry['Path']} from {path}: {_last_line(process.stderr.read()) or 'unexpected end of data'}")
+            member.data = data
+            yield member
+        if process.wait() != 0:
+            raise OSError(f"7z could not extract {path}: {_last_line(process.stderr.read()) or process.returncode}")
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+        process.stderr.close()
+
+
+def iter_archive(path) -> Iterator[ArchiveMember]:
+    """Every file in a .zip, .7z or .rar upload, in archive order; demos come decompressed."""
+    path = os.fspath(path)
+    if path.lower().endswith('.zip'):
+        return _iter_zip(path)
+    if path.lower().endswith(('.7z', '.rar')):
+        return _iter_seven_zip(path)
+    raise ValueError(f"Not an archive: {path}")
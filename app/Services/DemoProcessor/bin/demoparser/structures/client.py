@@ -1,18 +1,44 @@
 from __future__ import annotations
 
 from dataclasses import dataclass, field
-from typing import Dict, List, Tuple
+from typing import Dict, List, NamedTuple, Tuple
 
-import sys
-import os
-sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-from demoparser import const
+from .. import const
 from .player import PlayerState, EntityState
 
 
 dataclass_client = dataclass
 
 
+class ConsoleLine(NamedTuple):
+    """A server command worth keeping; `kind` is one of console_kind's constants."""
+    serverTime: int
+    kind: int
+    text: str
+
+
+class PlayerStateSummary(NamedTuple):
+    """The PlayerState fields client events and times are built from (see native.py)."""
+    commandTime: int
+    pm_type: int
+    pm_flags: int
+    clientNum: int
+    movementDir: int
+    groundEntityNum: int
+    weapon: int
+    origin: Tuple[float, float, float]
+    velocity: Tuple[float, float, float]
+    viewangles: Tuple[float, float, float]
+    stats: Tuple[int, ...]
+
+
+class SnapshotSummary(NamedTuple):
+    """A valid snapshot as the native decoder reports it; stands in for CLSnapshot."""
+    serverTime: int
+    messageNum: int
+    ps: PlayerStateSummary
+
+
 @dataclass_client
 class ClientConnection:
     clientNum: int = 0
@@ -23,7 +49,9 @@ class ClientConnection:
     serverMessageSequence: int = 0
     serverCommandSequence: int = 0
     lastExecutedServerCommand: int = 0
-    console: Dict[int, Tuple[int, str]] = field(default_factory=dict)
+    # Only the lines console_kind recognises, keyed by command sequence.
+    console: Dict[int, ConsoleLine] = field(default_factory=dict)
+    consoleDropped: int = 0
     configs: Dict[int, str] = field(default_factory=dict)
     errors: Dict[str, str] = field(default_factory=dict)
     entityBaselines: Dict[int, EntityState] = field(default_factory=dict)
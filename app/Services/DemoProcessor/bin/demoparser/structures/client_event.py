@@ -2,10 +2,7 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 
-import sys
-import os
-sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-from demoparser import const
+from .. import const
 from .client import CLSnapshot
 
 
@@ -23,6 +20,7 @@ class ClientEvent:
     timeHasError: bool = False
     timeByServerTime: int = 0
     serverTime: int = 0
+    messageNum: int = 0
     playerNum: int = 0
     playerMode: int = 0
     userStat: int = 0
@@ -39,6 +37,7 @@ class ClientEvent:
             self.time = time_value
         self.timeHasError = time_has_error
         self.serverTime = snapshot.serverTime
+        self.messageNum = snapshot.messageNum
         self.playerNum = snapshot.ps.clientNum
         self.userStat = snapshot.ps.stats[12]
         self.playerMode = snapshot.ps.pm_type
@@ -1,18 +1,15 @@
 from __future__ import annotations
 
-from typing import Callable
+from typing import Callable, ClassVar
 
-import sys
-import os
-sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-from demoparser import const
+from .. import const
 
 from .player import EntityState, PlayerState, TrType
 
 
 class MapperFactory:
-    EntityStateFieldNum = 51
-    PlayerStateFieldNum = 48
+    EntityStateFieldNum: ClassVar[int] = 51
+    PlayerStateFieldNum: ClassVar[int] = 48
 
     @staticmethod
     def update_entity_state(state: EntityState, number: int, reader, reset: bool) -> None:
@@ -92,19 +92,20 @@ class EntityState:
         self.generic1 = other.generic1
 
 
+class StatIndex(IntEnum):
+    STAT_HEALTH = 0
+    STAT_ITEMS = 1
+    STAT_WEAPONS = 2
+    STAT_ARMOR = 3
+    STAT_DEAD_YAW = 4
+    STAT_CLIENTS_READY = 5
+    STAT_MAX_HEALTH = 6
+    STAT_TIMER_UPPER = 7
+    STAT_TIMER_LOWER = 8
+
+
 @dataclass
 class PlayerState:
-    class StatIndex(IntEnum):
-        STAT_HEALTH = 0
-        STAT_ITEMS = 1
-        STAT_WEAPONS = 2
-        STAT_ARMOR = 3
-        STAT_DEAD_YAW = 4
-        STAT_CLIENTS_READY = 5
-        STAT_MAX_HEALTH = 6
-        STAT_TIMER_UPPER = 7
-        STAT_TIMER_LOWER = 8
-
     commandTime: int = 0
     pm_type: int = 0
     bobCycle: int = 0
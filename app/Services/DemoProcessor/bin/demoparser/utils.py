@@ -1,10 +1,13 @@
 from __future__ import annotations
 
-import math
+import struct
 from typing import Dict
 
 debug = False
 
+_UINT32 = struct.Struct('<I')
+_FLOAT32 = struct.Struct('<f')
+
 
 def angle2short(value: float) -> int:
     return int(value * 65536.0 / 360.0) & 0xFFFF
@@ -15,10 +18,8 @@ def short2angle(value: int) -> float:
 
 
 def raw_bits_to_float(bits: int) -> float:
-    sign = -1 if bits & 0x80000000 else 1
-    exponent = (bits >> 23) & 0xFF
-    mantissa = ((bits & 0x7FFFFF) | 0x800000) if exponent > 0 else (bits & 0x7FFFFF) << 1
-    return sign * mantissa * math.pow(2.0, exponent - 150)
+    # The IEEE single the bits spell, NaN and infinity included, as in the C reader.
+    return _FLOAT32.unpack(_UINT32.pack(bits & 0xFFFFFFFF))[0]
 
 
 def split_config(src: str) -> Dict[str, str]:
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Filename-only demo classification.
+
+Runs the extractors `Demo.GetDemoFromRawInfo` falls back on - time, player and
+country, validity note, user id - over bare filenames, without opening a
+single demo. Over a directory of stored demos that sorts out, in seconds,
+which names are already in the canonical shape, which ones collide with each
+other, and which ones actually need a real parse.
+
+Usage: filename_classifier.py <directory|-> [--recursive] [--incorrect-only] [--duplicates]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import sys
+from collections import defaultdict
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from demo import Demo, normalize_country_code
+
+
+# What Demo.fillDemoNewName writes for a timed run:
+# map[physic]MM.SS.mmm(player.country){key=value}[userId].dm_68
+_CANONICAL_RE = re.compile(
+    r"^(?P<map>[^\[]+)\[(?P<physic>[^\]]+)\]"
+    r"(?P<time>\d{2,3}\.\d{2}\.\d{3})"
+    r"\((?P<player>.+)\)"
+    r"(?:\{\w+=\w+\})?"
+    r"(?:\[\d+\]|\[spect\])?"
+    r"\.dm_\d+$"
+)
+# The map[physic] head alone, for names that are not fully canonical.
+_MAP_AND_PHYSIC_RE = re.compile(r"^([^\[]+)\[([^\]]+)\]")
+_DEMO_EXTENSION_RE = re.compile(r"\.dm_\d+$", re.IGNORECASE)
+_COLOR_RE = re.compile(r"\^.")
+
+
+@dataclass
+class FilenameInfo:
+    """Everything that can be said about a demo from its name alone."""
+    filename: str
+    path: Optional[str] = None
+    map_name: Optional[str] = None
+    physics: Optional[str] = None
+    time_seconds: Optional[float] = None
+    player_name: Optional[str] = None
+    country: Optional[str] = None
+    validity: Optional[Dict[str, str]] = None
+    user_id: Optional[int] = None
+    is_canonical: bool = False
+
+    @property
+    def run_key(self) -> Optional[Tuple[str, str, float, str]]:
+        """Identity of the run the name describes, or None if the name is not a timed run."""
+        if not self.is_canonical:
+            return None
+        return (
+            (self.map_name or '').lower(),
+            (self.physics or '').lower(),
+            self.time_seconds or 0.0,
+            (self.player_name or '').lower(),
+        )
+
+    def to_dict(self) -> Dict[str, object]:
+        return asdict(self)
+
+
+def normalize_file_name(filename: str) -> str:
+    """Same as Demo._get_normalized_file_name, minus the Path round trip."""
+    stem, dot, suffix = filename.rpartition('.')
+    if not dot:
+        return _COLOR_RE.sub('', filename) if '^' in filename else filename
+    if '^' in stem:
+        stem = _COLOR_RE.sub('', stem)
+    return f"{stem}.{suffix.lower()}"
+
+
+def classify_name(filename: str) -> FilenameInfo:
+    """Classify one demo filename (a bare name, not a path)."""
+    normalized = normalize_file_name(filename)
+    info = FilenameInfo(filename=filename)
+
+    partname = Demo._get_name_and_country(normalized)
+    if partname:
+        player, country = Demo._try_get_name_and_country(partname, None)
+        info.player_name = player or None
+        info.country = normalize_country_code(country) or None
+
+    time = Demo._try_get_time_from_file_name(normalized)
+    if time is not None:
+        info.time_seconds = time.total_seconds()
+
+    validity = Demo._get_validities(normalized)
+    if validity:
+        info.validity = {validity[0]: validity[1]}
+
+    stem = normalized.rpartition('.')[0] or normalized
+    user_id = Demo._try_get_user_id_from_stem(stem)
+    if user_id >= 0:
+        info.user_id = user_id
+
+    head = _MAP_AND_PHYSIC_RE.match(normalized)
+    if head:
+        info.map_name = head.group(1)
+        info.physics = head.group(2)
+
+    info.is_canonical = _CANONICAL_RE.match(normalized) is not None and time is not None
+    return info
+
+
+def classify_names(filenames: Iterable[str]) -> List[FilenameInfo]:
+    """Classify many filenames; the patterns are compiled once at import."""
+    classify = classify_name
+    return [classify(name) for name in filenames]
+
+
+def iter_demo_names(directory: str, recursive: bool = False) -> Iterator[str]:
+    """Yield demo paths under a directory from the listing alone - no stat, no open."""
+    is_demo = _DEMO_EXTENSION_RE.search
+    pending = [directory]
+    while pending:
+        current = pending.pop()
+        with os.scandir(current) as entries:
+            for entry in entries:
+                if recursive and entry.is_dir(follow_symlinks=False):
+                    pending.append(entry.path)
+                elif is_demo(entry.name):
+                    yield entry.path
+
+
+def find_duplicate_runs(infos: Iterable[FilenameInfo]) -> Dict[Tuple[str, str, float, str], List[FilenameInfo]]:
+    """Group canonical names that describe the same run (map, physics, time, player)."""
+    groups: Dict[Tuple[str, str, float, str], List[FilenameInfo]] = defaultdict(list)
+    for info in infos:
+        key = info.run_key
+        if key is not None:
+            groups[key].append(info)
+    return {key: members for key, members in groups.items() if len(members) > 1}
+
+
+def _build_cli() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Classify demo files by filename only, without parsing them.")
+    parser.add_argument("directory", help="Directory to list, or - to read one filename per line from stdin")
+    parser.add_argument("--recursive", action="store_true", help="Descend into subdirectories")
+    parser.add_argument("--incorrect-only", action="store_true", help="Only print names that are not in the canonical shape")
+    parser.add_argument("--duplicates", action="store_true", help="Print groups of names describing the same run instead")
+    return parser
+
+
+def main() -> None:
+    args = _build_cli().parse_args()
+
+    if args.directory == '-':
+        paths = [line.rstrip('\n') for line in sys.stdin if line.strip()]
+    else:
+        if not os.path.isdir(args.directory):
+            print(f"Error: Directory not found: {args.directory}", file=sys.stderr)
+            sys.exit(1)
+        paths = list(iter_demo_names(args.directory, args.recursive))
+
+    infos = classify_names(os.path.basename(path) for path in paths)
+    for path, info in zip(paths, infos):
+        info.path = path
+
+    if args.duplicates:
+        for key, members in sorted(find_duplicate_runs(infos).items()):
+            print(json.dumps({"run": list(key), "files": [member.path or member.filename for member in members]}))
+        return
+
+    for info in infos:
+        if args.incorrect_only and info.is_canonical:
+            continue
+        print(json.dumps(info.to_dict()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Differential fuzzing and throughput harness: C vs Python Huffman reader.
+
+test_c_extension.py only compares the final metadata of real demos, which
+says little about damaged input or about reads whose results never reach the
+metadata. This mutates demo bytes (bit flips, truncation, bogus message
+lengths), parses every case with both readers in lockstep, one message at a
+time, and checks that the parser asked for and got the same primitives -
+every read, its arguments, its result and the state each delta produced - and
+that both raised the same exception at the same point.
+
+It also times an unmutated parse with each reader and reports symbols and MB
+decoded per second, so a faster C reader can be checked and measured at once.
+
+Usage: python3 fuzz_readers.py [demo ...] [--count N] [--cases N] [--seed S] [--save-failures DIR]
+"""
+import argparse
+import random
+import struct
+import sys
+import time
+import warnings
+from dataclasses import fields, is_dataclass
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+warnings.filterwarnings('ignore')
+
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir))
+
+from demoparser import const
+from demoparser.huffman import _HAS_C_EXTENSION, _Q3HuffmanReaderPython, decoded_symbol_count
+from demoparser.parser import Q3DemoConfigParser, Q3DemoMessage
+from demoparser.parser_exceptions import ErrorCantOpenFile
+if _HAS_C_EXTENSION:
+    from demoparser.huffman import _Q3HuffmanReaderC
+
+HEADER = struct.Struct('<ii')
+MUTATIONS = ('bitflip', 'truncate', 'length')
+
+
+def iter_messages(data: bytes) -> Iterator[Q3DemoMessage]:
+    """Q3MessageStream.next_message over bytes in memory."""
+    pos = 0
+    while len(data) - pos >= HEADER.size:
+        sequence, length = HEADER.unpack_from(data, pos)
+        pos += HEADER.size
+        if sequence == -1 and length == -1:
+            return
+        if length < 0 or length > const.Q3_MESSAGE_MAX_SIZE:
+            raise ErrorCantOpenFile()
+        if len(data) - pos < length:
+            return
+        yield Q3DemoMessage(sequence=sequence, size=length, data=data[pos:pos + length])
+        pos += length
+
+
+def header_offsets(data: bytes) -> List[int]:
+    offsets = []
+    pos = 0
+    while len(data) - pos >= HEADER.size:
+        _, length = HEADER.unpack_from(data, pos)
+        if length < 0 or length > const.Q3_MESSAGE_MAX_SIZE:
+            break
+        offsets.append(pos)
+        pos += HEADER.size + length
+    return offsets
+
+
+def mutate(data: bytes, rng: random.Random) -> Tuple[str, bytes]:
+    """(description, mutated copy) of a demo."""
+    kind = rng.choice(MUTATIONS)
+    if kind == 'truncate':
+        cut = rng.randrange(len(data))
+        return f'truncate@{cut}', data[:cut]
+    if kind == 'length':
+        offsets = header_offsets(data)
+        if offsets:
+            offset = rng.choice(offsets)
+            length = HEADER.unpack_from(data, offset)[1]
+            bogus = rng.choice((-1, 0, const.Q3_MESSAGE_MAX_SIZE + 1, length + rng.randint(-16, 16), rng.getrandbits(31)))
+            mutated = bytearray(data)
+            struct.pack_into('<i', mutated, offset + 4, bogus)
+            return f'length@{offset}={bogus}', bytes(mutated)
+    mutated = bytearray(data)
+    flips = []
+    for _ in range(rng.randint(1, 8)):
+        bit = rng.randrange(len(mutated) * 8)
+        mutated[bit >> 3] ^= 1 << (bit & 7)
+        flips.append(bit)
+    return 'bitflip@' + ','.join(map(str, flips)), bytes(mutated)
+
+
+def _state_values(state) -> tuple:
+    values = []
+    for field in fields(state):
+        value = getattr(state, field.name)
+        if is_dataclass(value):
+            value = _state_values(value)
+        elif isinstance(value, (list, bytearray)):
+            value = tuple(value)
+        values.append(value)
+    return tuple(values)
+
+
+class _TracingReader:
+    """Passes each read the parser makes through to `reader` and writes it down."""
+
+    def __init__(self, reader, trace: list) -> None:
+        self._reader = reader
+        self._trace = trace
+
+    def _call(self, name: str, *args):
+        result = getattr(self._reader, name)(*args)
+        self._trace.append((name, args, result))
+        return result
+
+    def isEOD(self) -> bool:
+        return self._call('isEOD')
+
+    def readByte(self) -> int:
+        return self._call('readByte')
+
+    def readShort(self) -> int:
+        return self._call('readShort')
+
+    def readLong(self) -> int:
+        return self._call('readLong')
+
+    def readNumBits(self, bits: int) -> int:
+        return self._call('readNumBits', bits)
+
+    def readString(self) -> str:
+        return self._call('readString')
+
+    def readBigString(self) -> str:
+        return self._call('readBigString')
+
+    def readData(self, data: bytearray, length: int) -> None:
+        self._reader.readData(data, length)
+        self._trace.append(('readData', (length,), bytes(data)))
+
+    def readDeltaEntity(self, state, number: int) -> bool:
+        ok = self._reader.readDeltaEntity(state, number)
+        self._trace.append(('readDeltaEntity', (number,), (ok, _state_values(state))))
+        return ok
+
+    def readDeltaPlayerState(self, state) -> bool:
+        ok = self._reader.readDeltaPlayerState(state)
+        self._trace.append(('readDeltaPlayerState', (), (ok, _state_values(state))))
+        return ok
+
+
+def _describe(exc: Optional[BaseException]) -> Optional[str]:
+    return None if exc is None else f'{type(exc).__name__}: {exc}'
+
+
+def _same(a: list, b: list) -> bool:
+    # repr() as well, so a NaN read by both readers counts as the same value.
+    return a == b or repr(a) == repr(b)
+
+
+def compare_readers(data: bytes) -> Optional[str]:
+    """None when both readers read `data` identically, otherwise where they first differ."""
+    parsers = (Q3DemoConfigParser(), Q3DemoConfigParser())
+    readers = (_Q3HuffmanReaderPython, _Q3HuffmanReaderC)
+    # Framing is the same code for both readers; a bogus length just ends the
+    # messages both of them see.
+    messages = list(_messages_until_error(data))
+    for index, message in enumerate(messages):
+        traces: Tuple[list, list] = ([], [])
+        outcomes = []
+        for parser, reader, trace in zip(parsers, readers, traces):
+            try:
+                parser.parse_with_reader(message, _TracingReader(reader(message.data), trace))
+                outcomes.append(None)
+            except Exception as e:
+                outcomes.append(e)
+        if not _same(*traces):
+            step = next((i for i, (a, b) in enumerate(zip(*traces)) if not _same([a], [b])), min(map(len, traces)))
+            python_read = traces[0][step] if step < len(traces[0]) else None
+            c_read = traces[1][step] if step < len(traces[1]) else None
+            return f'message {index} (sequence {message.sequence}), read {step}: Python {python_read!r}, C {c_read!r}'
+        if _describe(outcomes[0]) != _describe(outcomes[1]):
+            return f'message {index} (sequence {message.sequence}): Python raised {_describe(outcomes[0])}, C raised {_describe(outcomes[1])}'
+        if outcomes[0] is not None:
+            return None
+    return None
+
+
+def _messages_until_error(data: bytes) -> Iterator[Q3DemoMessage]:
+    messages = iter_messages(data)
+    while True:
+        try:
+            yield next(messages)
+        except (StopIteration, ErrorCantOpenFile):
+            return
+
+
+def throughput(data: bytes, reader, runs: int = 1) -> Tuple[float, int]:
+    """(best seconds, symbols decoded) for a plain message-by-message parse with `reader`."""
+    best = float('inf')
+    symbols = 0
+    messages = list(_messages_until_error(data))
+    for _ in range(runs):
+        parser = Q3DemoConfigParser()
+        before = decoded_symbol_count()
+        started = time.perf_counter()
+        for message in messages:
+            parser.parse_with_reader(message, reader(message.data))
+        best = min(best, time.perf_counter() - started)
+        symbols = decoded_symbol_count() - before
+    return best, symbols
+
+
+def _rate(symbols: int, size: int, seconds: float) -> str:
+    if seconds <= 0:
+        return 'n/a'
+    return f'{symbols / seconds / 1e6:.2f} Msym/s, {size / seconds / 1e6:.2f} MB/s'
+
+
+def find_demos(count: int, rng: random.Random) -> List[Path]:
+    demos_dir = current_dir.parent.parent.parent.parent / 'storage' / 'app' / 'demos'
+    demos = [p for pattern in ('*.dm_68', '*.dm_91') for p in demos_dir.rglob(pattern)]
+    rng.shuffle(demos)
+    return demos[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Differential fuzzing and throughput of the C vs Python Huffman reader')
+    parser.add_argument('demos', nargs='*', type=Path, help='Seed demos (default: random demos from storage/app/demos)')
+    parser.add_argument('--count', type=int, default=10, help='Seed demos to pick when none are given (default: 10)')
+    parser.add_argument('--cases', type=int, default=50, help='Mutated cases per seed demo (default: 50)')
+    parser.add_argument('--seed', type=int, default=None, help='Random seed, to repeat a run')
+    parser.add_argument('--runs', type=int, default=1, help='Timed parses per reader for throughput (best is kept)')
+    parser.add_argument('--save-failures', type=Path, help='Write each mismatching case here')
+    args = parser.parse_args()
+
+    if not _HAS_C_EXTENSION:
+        print("ERROR: C extension not available! Build it first:")
+        print("  cd demoparser && python3 setup.py build_ext --inplace")
+        sys.exit(1)
+
+    seed = args.seed if args.seed is not None else random.randrange(1 << 32)
+    rng = random.Random(seed)
+    demos = args.demos or find_demos(args.count, rng)
+    if not demos:
+        print("No demo files given or found")
+        sys.exit(1)
+    print(f"Seed {seed}, {len(demos)} demos, {args.cases} mutated cases each\n")
+
+    totals = {'python': [0.0, 0], 'c': [0.0, 0]}
+    total_bytes = 0
+    cases = mismatches = 0
+    for demo in demos:
+        data = demo.read_bytes()
+        rates = []
+        for name, reader in (('python', _Q3HuffmanReaderPython), ('c', _Q3HuffmanReaderC)):
+            seconds, symbols = throughput(data, reader, args.runs)
+            totals[name][0] += seconds
+            totals[name][1] += symbols
+            rates.append(f'{name}: {_rate(symbols, len(data), seconds)}')
+        total_bytes += len(data)
+
+        failures = []
+        for case in [('original', data)] + [mutate(data, rng) for _ in range(args.cases)]:
+            cases += 1
+            difference = compare_readers(case[1])
+            if difference is not None:
+                failures.append((case, difference))
+        mismatches += len(failures)
+        print(f"{'FAIL' if failures else 'OK  '} {demo.name} ({'; '.join(rates)})")
+        for (description, mutated), difference in failures:
+            print(f"       {description}: {difference}")
+            if args.save_failures:
+                args.save_failures.mkdir(parents=True, exist_ok=True)
+                (args.save_failures / f'{demo.stem}.{description.replace(",", "_")}{demo.suffix}'[:200]).write_bytes(mutated)
+
+    print(f"\n{'='*60}")
+    print(f"Cases: {cases}, mismatches: {mismatches}")
+    for name, (seconds, symbols) in totals.items():
+        print(f"{name:>6}: {_rate(symbols, total_bytes, seconds)}")
+    print(f"{'='*60}")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
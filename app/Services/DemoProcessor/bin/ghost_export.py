@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Compact ghost files for the web replay viewer.
+
+Showing a run used to mean serving the whole demo, or parsing it again for the
+positions. This walks the player states once (as an analyzer, see
+demoparser/analyzers.py) and writes only what the viewer draws: a few KB per
+run that the browser decodes without any demo parsing.
+
+File layout, little-endian:
+
+    header  '<4sB3xfIii'  magic b'DFGH', version, origin scale (game units
+                          per step), frame count, serverTime of the first
+                          frame, run time in ms (-1 when no finished run)
+    frames  per frame: zigzag varints for the milliseconds since the previous
+            frame and the x, y, z origin deltas in scale steps, then pitch
+            and yaw as uint16 (ANGLE2SHORT) and one flag byte (FLAG_*)
+
+The first frame's deltas are from (0, 0, 0). Origins are quantized before they
+are delta-encoded, so decoding adds no drift. Frames a straight line between
+their neighbours already reproduces within the tolerances are dropped; frames
+whose flags change are always kept.
+
+Only the recorded player's PM_NORMAL frames are exported, and only the fastest
+finished run when the demo has one (--whole exports everything). The run is
+the one the naming layer times (RawInfo.runs), from its start to its finish.
+
+Usage: ghost_export.py <demo> [-o OUT] [--tolerance UNITS] [--angle-tolerance DEG] [--whole]
+"""
+import argparse
+import struct
+import sys
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Tuple
+
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir))
+
+from demoparser.analyzers import ENTITYNUM_NONE, PM_NORMAL, Analyzer
+
+MAGIC = b'DFGH'
+VERSION = 1
+HEADER = struct.Struct('<4sB3xfIii')
+ANGLES_AND_FLAGS = struct.Struct('<HHB')
+
+DEFAULT_SCALE = 0.125
+DEFAULT_TOLERANCE = 1.0
+DEFAULT_ANGLE_TOLERANCE = 1.0
+# Longest stretch a single interpolated segment may cover; bounds the cost of
+# checking the frames it replaces.
+MAX_SEGMENT_MS = 1000
+
+FLAG_ON_GROUND = 1
+FLAG_DUCKED = 2
+FLAG_JUMP_HELD = 4
+
+# pm_flags bits (bg_public.h).
+PMF_DUCKED = 1
+PMF_JUMP_HELD = 2
+
+
+class GhostFrame(NamedTuple):
+    server_time: int
+    origin: Tuple[float, float, float]
+    pitch: float
+    yaw: float
+    flags: int
+
+
+class GhostRecorder(Analyzer):
+    """Keeps one GhostFrame per PM_NORMAL snapshot of the recorded player."""
+
+    name = 'ghost'
+
+    def __init__(self) -> None:
+        self.frames: List[GhostFrame] = []
+        self._client: Optional[int] = None
+
+    def on_snapshot(self, snapshot) -> None:
+        ps = snapshot.ps
+        if self._client is None:
+            self._client = ps.clientNum
+        if ps.pm_type != PM_NORMAL or ps.clientNum != self._client:
+            return
+        if self.frames and snapshot.serverTime <= self.frames[-1].server_time:
+            return
+        flags = 0
+        if ps.groundEntityNum != ENTITYNUM_NONE:
+            flags |= FLAG_ON_GROUND
+        if ps.pm_flags & PMF_DUCKED:
+            flags |= FLAG_DUCKED
+        if ps.pm_flags & PMF_JUMP_HELD:
+            flags |= FLAG_JUMP_HELD
+        self.frames.append(GhostFrame(
+            int(snapshot.serverTime), tuple(float(v) for v in ps.origin),
+            float(ps.viewangles[0]), float(ps.viewangles[1]), flags,
+        ))
+
+    def result(self) -> dict:
+        return {'frames': len(self.frames)}
+
+
+def _angle_delta(a: float, b: float) -> float:
+    return (a - b + 180.0) % 360.0 - 180.0
+
+
+def _fits(frames: List[GhostFrame], start: int, end: int, tolerance: float, angle_tolerance: float) -> bool:
+    """Whether a straight segment from frames[start] to frames[end] stands in for every frame between."""
+    a, b = frames[start], frames[end]
+    span = b.server_time - a.server_time
+    if span > MAX_SEGMENT_MS:
+        return False
+    pitch_step = _angle_delta(b.pitch, a.pitch)
+    yaw_step = _angle_delta(b.yaw, a.yaw)
+    for frame in frames[start + 1:end]:
+        if frame.flags != a.flags:
+            return False
+        t = (frame.server_time - a.server_time) / span
+        for axis in range(3):
+            expected = a.origin[axis] + (b.origin[axis] - a.origin[axis]) * t
+            if abs(frame.origin[axis] - expected) > tolerance:
+                return False
+        if abs(_angle_delta(frame.pitch, a.pitch + pitch_step * t)) > angle_tolerance:
+            return False
+        if abs(_angle_delta(frame.yaw, a.yaw + yaw_step * t)) > angle_tolerance:
+            return False
+    return True
+
+
+def simplify(frames: List[GhostFrame], tolerance: float, angle_tolerance: float) -> List[GhostFrame]:
+    """Drop frames that interpolating between the kept ones reproduces within the tolerances."""
+    if tolerance <= 0 or len(frames) < 3:
+        return list(frames)
+    kept = [frames[0]]
+    anchor = 0
+    for end in range(2, len(frames)):
+        if not _fits(frames, anchor, end, tolerance, angle_tolerance):
+            anchor = end - 1
+            kept.append(frames[anchor])
+    kept.append(frames[-1])
+    return kept
+
+
+def _write_varint(out: bytearray, value: int) -> None:
+    value = (value << 1) ^ (value >> 63)   # zigzag
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return (value >> 1) ^ -(value & 1), pos
+        shift += 7
+
+
+def _angle_to_short(angle: float) -> int:
+    return int(round(angle * 65536 / 360.0)) & 0xFFFF
+
+
+def encode(frames: List[GhostFrame], run_ms: int = -1, scale: float = DEFAULT_SCALE) -> bytes:
+    out = bytearray(HEADER.pack(MAGIC, VERSION, scale, len(frames), frames[0].server_time if frames else 0, run_ms))
+    time = frames[0].server_time if frames else 0
+    position = (0, 0, 0)
+    for frame in frames:
+        quantized = tuple(int(round(v / scale)) for v in frame.origin)
+        _write_varint(out, frame.server_time - time)
+        for axis in range(3):
+            _write_varint(out, quantized[axis] - position[axis])
+        out += ANGLES_AND_FLAGS.pack(_angle_to_short(frame.pitch), _angle_to_short(frame.yaw), frame.flags)
+        time, position = frame.server_time, quantized
+    return bytes(out)
+
+
+def decode(data: bytes) -> dict:
+    """Reference decoder, the same steps the viewer takes."""
+    magic, version, scale, count, time, run_ms = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError('Not a version %d ghost file' % VERSION)
+    pos = HEADER.size
+    position = [0, 0, 0]
+    frames = []
+    for _ in range(count):
+        delta, pos = _read_varint(data, pos)
+        time += delta
+        for axis in range(3):
+            step, pos = _read_varint(data, pos)
+            position[axis] += step
+        pitch, yaw, flags = ANGLES_AND_FLAGS.unpack_from(data, pos)
+        pos += ANGLES_AND_FLAGS.size
+        frames.append(GhostFrame(
+            time, tuple(v * scale for v in position), pitch * 360.0 / 65536, yaw * 360.0 / 65536, flags,
+        ))
+    return {'run_ms': run_ms, 'frames': frames}
+
+
+def _fastest_run(raw):
+    """The TimedRun of raw.fin, the fastest correct finish; None without one."""
+    if raw.fin is None or not raw.runs:
+        return None
+    finish = raw.fin[1]
+    for run in raw.runs:
+        if run.finishServerTime == finish.serverTime:
+            return run
+    return min(raw.runs, key=lambda run: run.time)
+
+
+def export_ghost(demo: Path, tolerance: float = DEFAULT_TOLERANCE, angle_tolerance: float = DEFAULT_ANGLE_TOLERANCE,
+                 whole: bool = False, scale: float = DEFAULT_SCALE) -> Tuple[bytes, dict]:
+    """(ghost file bytes, summary) for one demo, in a single parse."""
+    from demoparser.parser import Q3DemoParser
+
+    recorder = GhostRecorder()
+    raw = Q3DemoParser(str(demo), analyzers=[recorder]).parse_config()
+    frames = recorder.frames
+    run = None if whole else _fastest_run(raw)
+    if run is not None:
+        frames = [frame for frame in frames if run.startServerTime <= frame.server_time <= run.finishServerTime]
+    kept = simplify(frames, tolerance, angle_tolerance)
+    data = encode(kept, run.time if run is not None else -1, scale)
+    return data, {'frames': len(frames), 'kept': len(kept), 'bytes': len(data),
+                  'run_ms': run.time if run is not None else None}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write a compact ghost file for the web replay viewer')
+    parser.add_argument('demo', type=Path)
+    parser.add_argument('-o', '--output', type=Path, help='Ghost file (default: the demo name with .ghost)')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='Position error in game units a dropped frame may have (0 keeps every frame)')
+    parser.add_argument('--angle-tolerance', type=float, default=DEFAULT_ANGLE_TOLERANCE,
+                        help='View angle error in degrees a dropped frame may have')
+    parser.add_argument('--whole', action='store_true', help='Export the whole demo, not just the fastest run')
+    args = parser.parse_args()
+
+    data, summary = export_ghost(args.demo, args.tolerance, args.angle_tolerance, args.whole)
+    output = args.output or args.demo.with_suffix('.ghost')
+    output.write_bytes(data)
+    print(f"{output}: {summary['kept']}/{summary['frames']} frames, {summary['bytes']} bytes", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,476 @@
+#!/usr/bin/env python3
+"""
+Watch-folder ingestion daemon for demo uploads.
+
+Watches a spool directory, parses every demo that lands in it on a pool of
+worker processes, and writes one result file per demo - metadata JSON plus
+digests - atomically, either next to the demo or into a results directory.
+PHP only has to pick finished result files up instead of blocking a queue
+worker on a subprocess per demo.
+
+Uploads must appear in the spool complete: write them elsewhere on the same
+filesystem and rename them in, or write them in place and close them - the
+daemon reacts to IN_MOVED_TO and IN_CLOSE_WRITE. On start-up, and whenever the
+kernel event queue overflows, the spool is rescanned for demos that have no
+result yet, so nothing is lost across restarts.
+
+A backlog found on start-up is parsed longest first, and demos over --large-mb
+go to a lane of their own, one process each with a timeout (scheduling.py),
+so a pathological upload does not hold up the ordinary ones.
+
+Counters are collected from the workers into one registry (metrics.py),
+served on --metrics-port and/or written to a textfile-collector file.
+
+With --threads the workers are threads of the daemon itself. The C extension
+decodes a whole demo without holding the GIL (demoparser/native.py), so
+threads parse in parallel without a process per worker; without the extension
+they would run one at a time.
+
+Usage: ingest_daemon.py <spool_dir> [--results-dir DIR] [--workers N] [--threads] [--max-in-flight N] [--once]
+                        [--index PATH] [--large-mb MB] [--large-workers N] [--large-timeout SECONDS]
+                        [--metrics-port PORT] [--metrics-file PATH]
+"""
+import argparse
+import ctypes
+import ctypes.util
+import hashlib
+import json
+import os
+import re
+import select
+import signal
+import struct
+import sys
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Executor, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Deque, Dict, List, Optional
+
+# Add current directory to path to import from the new implementation
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir))
+
+import metrics
+from scheduling import LARGE_DEMO_BYTES, LARGE_DEMO_TIMEOUT, TimeoutLane, demo_size, longest_first
+
+_DEMO_NAME_RE = re.compile(r"\.dm_\d+$", re.IGNORECASE)
+
+# <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+_EVENT_HEADER = struct.Struct('iIII')
+
+# How often the daemon rewrites --metrics-file while it is busy.
+METRICS_WRITE_INTERVAL = 10.0
+
+# Worker processes are recycled after this many demos, so a leak in one parse
+# cannot grow a long-running worker without bound.
+TASKS_PER_WORKER = 500
+
+
+def is_demo_name(name: str) -> bool:
+    return not name.startswith('.') and _DEMO_NAME_RE.search(name) is not None
+
+
+class RecyclingPool(Executor):
+    """A process pool that is replaced by a fresh one every `tasks` submissions.
+
+    max_tasks_per_child only exists from Python 3.11; before that, this is how
+    workers get recycled. A replaced pool finishes the demos it already has,
+    and is dropped once it has.
+    """
+
+    def __init__(self, workers: int, tasks: int) -> None:
+        self.workers = workers
+        self.tasks = tasks
+        self._pool = ProcessPoolExecutor(max_workers=workers)
+        # Futures not done yet, per pool; done ones remove themselves.
+        self._pending: set = set()
+        self._retired: List[tuple] = []
+        self._submitted = 0
+
+    def submit(self, fn, /, *args, **kwargs):
+        if self._submitted >= self.tasks:
+            self._pool.shutdown(wait=False)
+            self._retired = [(pool, pending) for pool, pending in self._retired if pending]
+            self._retired.append((self._pool, self._pending))
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            self._pending = set()
+            self._submitted = 0
+        self._submitted += 1
+        future = self._pool.submit(fn, *args, **kwargs)
+        pending = self._pending
+        pending.add(future)
+        future.add_done_callback(pending.discard)
+        return future
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        for pool in [pool for pool, _ in self._retired] + [self._pool]:
+            pool.shutdown(wait=wait, cancel_futures=cancel_futures)
+        self._retired = []
+
+
+def process_pool(workers: int) -> Executor:
+    """Worker processes that are recycled after TASKS_PER_WORKER demos each."""
+    if sys.version_info >= (3, 11):
+        return ProcessPoolExecutor(max_workers=workers, max_tasks_per_child=TASKS_PER_WORKER)
+    return RecyclingPool(workers, workers * TASKS_PER_WORKER)
+
+
+def file_digests(path: Path) -> Dict[str, str]:
+    """MD5 (what BatchDemoRenamer deduplicates by) and SHA-256, in one read."""
+    md5 = hashlib.md5()
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for chunk in iter(lambda: handle.read(1024 * 1024), b''):
+            md5.update(chunk)
+            sha256.update(chunk)
+    return {'md5': md5.hexdigest(), 'sha256': sha256.hexdigest()}
+
+
+def process_demo(path: str, return_metrics: bool = True, index_path: Optional[str] = None) -> dict:
+    """Worker side: digest and parse one demo. Never raises.
+
+    With `index_path`, a demo already in the duplicate index (demo_index.py)
+    is answered from it without parsing.
+
+    A worker process's metrics for this demo travel back under '_metrics';
+    worker threads already record into the daemon's own registry.
+    """
+    from renamer import parse_demo_metadata
+
+    demo = Path(path)
+    result: dict = {'file': demo.name}
+    started = time.perf_counter()
+    try:
+        result['size'] = demo.stat().st_size
+        result.update(file_digests(demo))
+        if index_path:
+            from demo_index import metadata_with_index
+            # The index keeps run fingerprints as well (demo_index.py).
+            metadata = metadata_with_index(Path(index_path), demo, lambda path: parse_demo_metadata(path, fingerprint=True),
+                                           key=(result['size'], result['md5']))
+        else:
+            metadata = parse_demo_metadata(demo)
+        if metadata:
+            result['metadata'] = metadata
+        else:
+            result['error'] = 'Could not parse demo file'
+    except Exception as e:
+        result['error'] = str(e)
+    result['parse_seconds'] = round(time.perf_counter() - started, 3)
+    if return_metrics:
+        result['_metrics'] = metrics.REGISTRY.take_state()
+    return result
+
+
+def write_json_atomic(target: Path, payload: dict) -> None:
+    """Readers only ever see a missing file or a complete one."""
+    temp = target.with_name(f'.{target.name}.tmp')
+    with open(temp, 'w', encoding='utf-8') as handle:
+        json.dump(payload, handle)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(temp, target)
+
+
+class InotifyWatcher:
+    """Just enough inotify, through libc, to hear about files arriving in one directory."""
+
+    def __init__(self, directory: Path) -> None:
+        libc_name = ctypes.util.find_library('c') or 'libc.so.6'
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_CLOEXEC | os.O_NONBLOCK)
+        if self._fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(str(directory)), IN_CLOSE_WRITE | IN_MOVED_TO)
+        if wd < 0:
+            error = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(error, os.strerror(error))
+        self.overflowed = False
+
+    def wait(self, timeout: float) -> List[str]:
+        """Names of files closed or moved in since the last call, waiting up to `timeout`."""
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        names: List[str] = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            _, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            raw_name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                self.overflowed = True
+            elif raw_name:
+                names.append(os.fsdecode(raw_name))
+        return names
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+class PollingWatcher:
+    """Fallback where inotify is not available: notice new names by listing the directory."""
+
+    def __init__(self, directory: Path) -> None:
+        self._directory = directory
+        self._seen = set(os.listdir(directory))
+        self.overflowed = False
+
+    def wait(self, timeout: float) -> List[str]:
+        time.sleep(timeout)
+        current = set(os.listdir(self._directory))
+        new_names = sorted(current - self._seen)
+        self._seen = current
+        return new_names
+
+    def close(self) -> None:
+        pass
+
+
+class IngestDaemon:
+    def __init__(self, spool: Path, results_dir: Optional[Path], workers: int, max_in_flight: int, metrics_file: Optional[Path] = None, threads: bool = False, index_path: Optional[Path] = None,
+                 large_bytes: int = LARGE_DEMO_BYTES, large_lane: Optional[TimeoutLane] = None) -> None:
+        self.spool = spool
+        self.results_dir = results_dir
+        self.workers = workers
+        self.threads = threads
+        self.index_path = index_path
+        self.max_in_flight = max(1, max_in_flight)
+        self.queue: Deque[str] = deque()
+        self.large_bytes = large_bytes
+        self.large_queue: Deque[str] = deque()
+        self.lane = large_lane if large_lane is not None else TimeoutLane()
+        self.known: set = set()
+        self.in_flight: Dict = {}
+        self.pool: Optional[Executor] = None
+        # In flight when a worker died; they run one at a time until the
+        # demo that kills workers is found.
+        self.suspects: Deque[str] = deque()
+        self.alone: Optional[str] = None
+        self.running = True
+        self.stats = {'parsed': 0, 'errors': 0}
+        self.metrics_file = metrics_file
+        self._metrics_dirty = False
+        self._metrics_written = 0.0
+
+    # Result files ---------------------------------------------------------
+
+    def result_path(self, name: str) -> Path:
+        directory = self.results_dir or self.spool
+        return directory / f'{name}.json'
+
+    def has_result(self, name: str) -> bool:
+        return self.result_path(name).exists()
+
+    # Queueing -------------------------------------------------------------
+
+    def enqueue(self, name: str) -> None:
+        if not is_demo_name(name) or name in self.known:
+            return
+        self.known.add(name)
+        self.queue.append(name)
+
+    def rescan(self) -> None:
+        """Queue every demo in the spool that has no result yet."""
+        found = []
+        with os.scandir(self.spool) as entries:
+            for entry in entries:
+                if entry.is_file() and is_demo_name(entry.name) and not self.has_result(entry.name):
+                    found.append(entry.name)
+        # A backlog is parsed longest first, so it does not end on one big demo.
+        for name in longest_first(found, lambda name: demo_size(self.spool / name)):
+            self.enqueue(name)
+
+    @property
+    def busy(self) -> bool:
+        return bool(self.in_flight or self.lane)
+
+    # Main loop ------------------------------------------------------------
+
+    def run(self, once: bool = False) -> dict:
+        try:
+            watcher = InotifyWatcher(self.spool)
+        except (OSError, AttributeError):
+            print('inotify unavailable, polling the spool directory', file=sys.stderr, flush=True)
+            watcher = PollingWatcher(self.spool)
+
+        self.rescan()
+        self.pool = self._make_pool()
+        try:
+            while self.running:
+                self._collect()
+                self._submit()
+                if once and not self.queue and not self.large_queue and not self.suspects and not self.busy:
+                    break
+                # Keep draining events even when the pool is full - the
+                # names just wait in the queue; only the parsing is capped.
+                for name in watcher.wait(0.2 if self.busy else 1.0):
+                    self.enqueue(name)
+                if watcher.overflowed:
+                    watcher.overflowed = False
+                    self.rescan()
+                self._write_metrics()
+            while self.busy:
+                self._collect(block=True)
+        finally:
+            watcher.close()
+            self.lane.close()
+            self.pool.shutdown()
+        self._write_metrics(force=True)
+        return self.stats
+
+    def _make_pool(self) -> Executor:
+        if self.threads:
+            return ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='parse')
+        return process_pool(self.workers)
+
+    def stop(self, *_args) -> None:
+        self.running = False
+
+    def _submit(self) -> None:
+        index_path = str(self.index_path) if self.index_path else None
+        while self.suspects and not self.in_flight:
+            name = self.suspects.popleft()
+            if self._start(name, index_path, self.suspects):
+                self.alone = name
+        while not self.suspects and self.queue and len(self.in_flight) < self.max_in_flight:
+            self._start(self.queue.popleft(), index_path, self.queue)
+        while self.large_queue and self.lane.has_room:
+            name = self.large_queue.popleft()
+            self.lane.submit(name, process_demo, str(self.spool / name), True, index_path)
+
+    def _start(self, name: str, index_path: Optional[str], retry: Deque[str]) -> bool:
+        """Submit one demo to the pool; False if it was not submitted."""
+        path = self.spool / name
+        if not path.exists() or self.has_result(name):
+            self.known.discard(name)
+            return False
+        if self.large_bytes and demo_size(path) >= self.large_bytes:
+            self.large_queue.append(name)
+            return False
+        try:
+            future = self.pool.submit(process_demo, str(path), not self.threads, index_path)
+        except BrokenProcessPool:
+            retry.appendleft(name)
+            self._replace_pool()
+            return False
+        self.in_flight[future] = name
+        return True
+
+    def _replace_pool(self) -> None:
+        """A dead worker breaks the whole process pool; start a new one.
+
+        The demos still in flight did nothing wrong as far as anyone knows,
+        so they are run again rather than failed.
+        """
+        self.suspects.extend(self.in_flight.values())
+        self.in_flight.clear()
+        self.alone = None
+        self.pool.shutdown(wait=False)
+        self.pool = self._make_pool()
+
+    def _collect(self, block: bool = False) -> None:
+        done = [future for future in self.in_flight if future.done()]
+        if block and not done and self.in_flight:
+            wait(self.in_flight, timeout=0.2 if self.lane else None, return_when=FIRST_COMPLETED)
+            done = [future for future in self.in_flight if future.done()]
+        elif block and not done:
+            time.sleep(0.2)
+        finished = []
+        broken = False
+        for future in done:
+            name = self.in_flight.pop(future)
+            try:
+                finished.append((name, future.result()))
+            except BrokenProcessPool as e:
+                # A worker died (killed, out of memory), taking every demo in
+                # flight with it. Only one that ran alone is known to be the cause.
+                broken = True
+                if name == self.alone:
+                    finished.append((name, {'file': name, 'error': f'worker died parsing this demo: {e}'}))
+                else:
+                    self.suspects.append(name)
+            except Exception as e:
+                finished.append((name, {'file': name, 'error': f'worker failed: {e}'}))
+            if name == self.alone:
+                self.alone = None
+        if broken:
+            self._replace_pool()
+        for name, result, error in self.lane.poll():
+            finished.append((name, result if result is not None else {'file': name, 'error': error}))
+        for name, result in finished:
+            worker_metrics = result.pop('_metrics', None)
+            if worker_metrics:
+                metrics.REGISTRY.merge(worker_metrics)
+            if worker_metrics or self.threads:
+                self._metrics_dirty = True
+            self.stats['errors' if 'error' in result else 'parsed'] += 1
+            try:
+                write_json_atomic(self.result_path(name), result)
+            except OSError as e:
+                print(f'Error writing result for {name}: {e}', file=sys.stderr, flush=True)
+            self.known.discard(name)
+
+    def _write_metrics(self, force: bool = False) -> None:
+        if not self.metrics_file or not self._metrics_dirty:
+            return
+        now = time.monotonic()
+        if not force and now - self._metrics_written < METRICS_WRITE_INTERVAL:
+            return
+        try:
+            metrics.write_textfile(str(self.metrics_file))
+        except OSError as e:
+            print(f'Error writing metrics: {e}', file=sys.stderr, flush=True)
+        self._metrics_dirty = False
+        self._metrics_written = now
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Parse demos dropped into a spool directory')
+    parser.add_argument('spool', type=Path, help='Directory to watch for new demos')
+    parser.add_argument('--results-dir', type=Path, help='Write <demo>.json here instead of next to the demo')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Parser processes or threads (default: CPU count)')
+    parser.add_argument('--threads', action='store_true', help='Parse on threads of this process instead of worker processes (needs the C extension)')
+    parser.add_argument('--max-in-flight', type=int, help='Demos handed to the pool at once (default: 2 x workers)')
+    parser.add_argument('--once', action='store_true', help='Process what is in the spool now, then exit')
+    parser.add_argument('--index', type=Path, help='Duplicate-demo index (demo_index.py): known demos are not parsed again')
+    parser.add_argument('--large-mb', type=float, default=LARGE_DEMO_BYTES / (1024 * 1024),
+                        help='Demos this large are parsed in a lane of their own (default: %(default)g, 0 disables)')
+    parser.add_argument('--large-workers', type=int, default=1, help='Processes for the large-demo lane (default: 1)')
+    parser.add_argument('--large-timeout', type=float, default=LARGE_DEMO_TIMEOUT,
+                        help='Seconds before a large demo is given up on (default: %(default)g, 0 for none)')
+    parser.add_argument('--metrics-port', type=int, help='Serve Prometheus metrics on 127.0.0.1:PORT/metrics')
+    parser.add_argument('--metrics-file', type=Path, help='Keep a textfile-collector .prom file up to date')
+    args = parser.parse_args()
+
+    if not args.spool.is_dir():
+        print(f'Error: Spool directory not found: {args.spool}', file=sys.stderr)
+        sys.exit(1)
+    if args.results_dir:
+        args.results_dir.mkdir(parents=True, exist_ok=True)
+
+    if args.metrics_port:
+        metrics.serve(args.metrics_port)
+
+    daemon = IngestDaemon(args.spool, args.results_dir, args.workers, args.max_in_flight or 2 * args.workers, args.metrics_file, args.threads, args.index,
+                          int(args.large_mb * 1024 * 1024), TimeoutLane(args.large_workers, args.large_timeout or None))
+    signal.signal(signal.SIGTERM, daemon.stop)
+    signal.signal(signal.SIGINT, daemon.stop)
+    stats = daemon.run(once=args.once)
+    print(f"Parsed: {stats['parsed']}, errors: {stats['errors']}", flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,304 @@
+"""
+Prometheus-style metrics for the demo processor.
+
+A small registry of counters, gauges and histograms rendered in the text
+exposition format. One-shot runs (process_single_demo.py) add their numbers
+to a node_exporter textfile-collector file, so counts accumulate across every
+PHP-spawned process; the ingestion daemon keeps one registry for its whole
+life and can also serve it on a local port.
+
+Parse throughput is rate(demo_parser_bytes_total) / rate(demo_parser_parse_seconds_sum),
+and the same over demo_parser_huffman_symbols_total for symbols per second.
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+LabelValues = Tuple[str, ...]
+
+SIZE_BUCKETS: Sequence[Tuple[int, str]] = (
+    (1024 * 1024, 'lt_1mb'),
+    (10 * 1024 * 1024, '1_10mb'),
+    (100 * 1024 * 1024, '10_100mb'),
+)
+SECONDS_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _format_value(value: float) -> str:
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ''
+    pairs = ','.join(
+        '{0}="{1}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in zip(names, values)
+    )
+    return '{' + pairs + '}'
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, registry: 'Registry', name: str, documentation: str, labelnames: Sequence[str]) -> None:
+        self._registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values: Dict[LabelValues, object] = {}
+
+    def _key(self, labels: Sequence[str]) -> LabelValues:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f'{self.name} expects labels {self.labelnames}')
+        return tuple(str(label) for label in labels)
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        for labels, value in sorted(self.values.items()):
+            lines.append(f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}')
+        return lines
+
+    def merge(self, labels: LabelValues, value) -> None:
+        self.values[labels] = self.values.get(labels, 0) + value
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, labels: Sequence[str] = ()) -> None:
+        key = self._key(labels)
+        with self._registry.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def set(self, value: float, labels: Sequence[str] = ()) -> None:
+        key = self._key(labels)
+        with self._registry.lock:
+            self.values[key] = value
+
+    def merge(self, labels: LabelValues, value) -> None:
+        self.values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, registry: 'Registry', name: str, documentation: str, labelnames: Sequence[str], buckets: Sequence[float]) -> None:
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, labels: Sequence[str] = ()) -> None:
+        key = self._key(labels)
+        with self._registry.lock:
+            series = self.values.get(key)
+            if series is None:
+                # Per-bucket counts (not cumulative), then +Inf, sum and count.
+                series = [0] * (len(self.buckets) + 1) + [0.0, 0]
+                self.values[key] = series
+            index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def merge(self, labels: LabelValues, value) -> None:
+        series = self.values.get(labels)
+        if series is None:
+            self.values[labels] = list(value)
+        else:
+            for index, amount in enumerate(value):
+                series[index] += amount
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        names = self.labelnames + ('le',)
+        for labels, series in sorted(self.values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else _format_value(bound)
+                lines.append(f'{self.name}_bucket{_format_labels(names, labels + (le,))} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(series[-2])}')
+            lines.append(f'{self.name}_count{_format_labels(self.labelnames, labels)} {series[-1]}')
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self._metrics: Dict[str, _Metric] = {}
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._add(Counter(self, name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._add(Gauge(self, name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = SECONDS_BUCKETS) -> Histogram:
+        return self._add(Histogram(self, name, documentation, labelnames, buckets))
+
+    def _add(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def empty_copy(self) -> 'Registry':
+        """The same metrics, with no values recorded."""
+        copy = Registry()
+        for metric in self._metrics.values():
+            if isinstance(metric, Histogram):
+                copy.histogram(metric.name, metric.documentation, metric.labelnames, metric.buckets)
+            else:
+                copy._add(type(metric)(copy, metric.name, metric.documentation, metric.labelnames))
+        return copy
+
+    def render(self) -> str:
+        with self.lock:
+            lines: List[str] = []
+            for metric in self._metrics.values():
+                lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def state(self) -> Dict[str, List[list]]:
+        """Every recorded value, as plain JSON-able data (see merge)."""
+        with self.lock:
+            return {
+                name: [[list(labels), value] for labels, value in metric.values.items()]
+                for name, metric in self._metrics.items()
+                if metric.values
+            }
+
+    def take_state(self) -> Dict[str, List[list]]:
+        """state(), then forget it - for handing a worker's numbers to its parent."""
+        state = self.state()
+        with self.lock:
+            for metric in self._metrics.values():
+                metric.values.clear()
+        return state
+
+    def merge(self, state: Dict[str, List[list]]) -> None:
+        """Add counters and histograms from `state`; gauges take its value."""
+        with self.lock:
+            for name, entries in state.items():
+                metric = self._metrics.get(name)
+                if metric is None:
+                    continue
+                for labels, value in entries:
+                    metric.merge(tuple(labels), value)
+
+
+REGISTRY = Registry()
+
+DEMOS = REGISTRY.counter('demo_parser_demos_total', 'Demos run through the parser, by result.', ('result',))
+PARSE_SECONDS = REGISTRY.histogram('demo_parser_parse_seconds', 'Wall time to parse and name one demo, by file size.', ('size',))
+BYTES = REGISTRY.counter('demo_parser_bytes_total', 'Demo bytes parsed.')
+SYMBOLS = REGISTRY.counter('demo_parser_huffman_symbols_total', 'Huffman symbols decoded.')
+ERRORS = REGISTRY.counter('demo_parser_errors_total', 'Parser errors, by parser_exceptions class.', ('error',))
+CACHE_HITS = REGISTRY.counter('demo_parser_cache_hits_total', 'Demos answered without decoding, by cache.', ('cache',))
+PREFETCHED = REGISTRY.counter('demo_parser_prefetch_demos_total', 'Demos read ahead, by whether the parser had to wait for them.', ('result',))
+PREFETCH_STALL_SECONDS = REGISTRY.counter('demo_parser_prefetch_stall_seconds_total', 'Time spent waiting for demos still being read ahead.')
+C_EXTENSION = REGISTRY.gauge('demo_parser_c_extension', '1 when the _q3huff C reader is loaded, 0 on the pure-Python fallback.')
+
+_error_classes: Optional[Dict[str, str]] = None
+
+
+def error_class(message: str) -> str:
+    """parser_exceptions class name for an error message the parser logged."""
+    global _error_classes
+    if _error_classes is None:
+        from demoparser.parser_exceptions import ParserEx
+
+        _error_classes = {str(cls()): cls.__name__ for cls in ParserEx.__subclasses__()}
+    return _error_classes.get(message, 'Other')
+
+
+def size_bucket(size: int) -> str:
+    for bound, label in SIZE_BUCKETS:
+        if size < bound:
+            return label
+    return 'ge_100mb'
+
+
+def observe_parse(size: int, seconds: float, symbols: int, logged_errors: Iterable[str], exception: Optional[BaseException], ok: bool) -> None:
+    """Record one parse attempt."""
+    from demoparser.huffman import _HAS_C_EXTENSION
+    from demoparser.parser_exceptions import ParserEx
+
+    C_EXTENSION.set(1 if _HAS_C_EXTENSION else 0)
+    DEMOS.inc(labels=('ok' if ok else 'error',))
+    PARSE_SECONDS.observe(seconds, labels=(size_bucket(size),))
+    BYTES.inc(size)
+    SYMBOLS.inc(symbols)
+    for message in logged_errors:
+        ERRORS.inc(labels=(error_class(message),))
+    if exception is not None:
+        ERRORS.inc(labels=(type(exception).__name__ if isinstance(exception, ParserEx) else 'Exception',))
+
+
+def write_textfile(path: str, registry: Registry = REGISTRY) -> None:
+    """Replace `path` with this registry's numbers (for a process that owns them all)."""
+    temp = f'{path}.{os.getpid()}.tmp'
+    with open(temp, 'w', encoding='utf-8') as handle:
+        handle.write(registry.render())
+    os.replace(temp, path)
+
+
+def accumulate_textfile(path: str, registry: Registry = REGISTRY) -> None:
+    """Add this process's numbers to `path`, for short-lived processes.
+
+    The running totals live in a JSON sidecar next to the .prom file, guarded
+    by a lock, so concurrent PHP-spawned runs do not lose each other's counts.
+    """
+    import fcntl
+
+    state_path = os.path.join(os.path.dirname(path) or '.', f'.{os.path.basename(path)}.state.json')
+    with open(state_path, 'a+', encoding='utf-8') as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            handle.seek(0)
+            content = handle.read()
+            totals = registry.empty_copy()
+            if content:
+                try:
+                    totals.merge(json.loads(content))
+                except ValueError:
+                    pass
+            totals.merge(registry.state())
+            handle.seek(0)
+            handle.truncate()
+            json.dump(totals.state(), handle)
+            handle.flush()
+            write_textfile(path, totals)
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def serve(port: int, registry: Registry = REGISTRY, host: str = '127.0.0.1'):
+    """Serve /metrics on a background thread; returns the server."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path.split('?')[0] not in ('/', '/metrics'):
+                self.send_error(404)
+                return
+            body = registry.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args) -> None:
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,84 @@
+"""
+Read-ahead for batch parsing.
+
+On spinning or network storage a worker spends the start of every demo
+waiting for cold reads. Prefetcher walks a list of demos a few entries ahead
+of whoever consumes it, on a small pool of I/O threads: each file gets
+posix_fadvise(WILLNEED), which queues the whole file for read-ahead at once,
+and is then read through so it sits in the page cache by the time a parser
+opens it. File reads release the GIL, so this overlaps with decoding in the
+same process as well as in worker processes.
+
+The time consumers spend waiting for a demo that is still being read is
+counted (Prefetcher.stall_seconds, and demo_parser_prefetch_* in metrics.py);
+a large stall means the storage, not the parser, sets the pace.
+"""
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Deque, Iterable, Iterator, Tuple
+
+import metrics
+
+DEFAULT_DEPTH = 4
+READ_CHUNK = 1024 * 1024
+
+
+def warm(path) -> int:
+    """Pull a file into the page cache; returns the bytes read. Never raises."""
+    try:
+        with open(path, 'rb', buffering=0) as handle:
+            if hasattr(os, 'posix_fadvise'):
+                os.posix_fadvise(handle.fileno(), 0, 0, os.POSIX_FADV_WILLNEED)
+            buffer = bytearray(READ_CHUNK)
+            total = 0
+            while True:
+                count = handle.readinto(buffer)
+                if not count:
+                    return total
+                total += count
+    except OSError:
+        # The parse that follows reports it.
+        return 0
+
+
+class Prefetcher:
+    """Yields paths in order, each once it has been read ahead; `depth` paths are in flight."""
+
+    def __init__(self, depth: int = DEFAULT_DEPTH, threads: int = 0) -> None:
+        self.depth = max(0, depth)
+        self.threads = threads or min(self.depth, 4)
+        self.stall_seconds = 0.0
+        self.stalls = 0
+        self.ready = 0
+
+    def iterate(self, paths: Iterable) -> Iterator:
+        if not self.depth:
+            yield from paths
+            return
+        pending: Deque[Tuple[object, object]] = deque()
+        with ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix='prefetch') as pool:
+            for path in paths:
+                pending.append((path, pool.submit(warm, path)))
+                if len(pending) > self.depth:
+                    yield self._wait(*pending.popleft())
+            while pending:
+                yield self._wait(*pending.popleft())
+
+    def _wait(self, path, future):
+        if future.done():
+            self.ready += 1
+            metrics.PREFETCHED.inc(labels=('ready',))
+            return path
+        started = time.perf_counter()
+        future.result()
+        waited = time.perf_counter() - started
+        self.stalls += 1
+        self.stall_seconds += waited
+        metrics.PREFETCHED.inc(labels=('stalled',))
+        metrics.PREFETCH_STALL_SECONDS.inc(waited)
+        return path
+
+    def summary(self) -> str:
+        return f"prefetch depth {self.depth}: {self.ready} ready, {self.stalls} stalled, {self.stall_seconds:.2f} s waiting"
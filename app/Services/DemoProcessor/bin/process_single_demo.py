@@ -2,9 +2,20 @@
 """
 Single demo processor - returns suggested filename and metadata for a single demo file
 Compatible wrapper for the new Python-native DemoCleaner3 implementation
+
+`-` instead of a path reads the demo from stdin, so an upload can be piped in
+from memory; --name gives its original filename, which the naming layer reads.
+
+--time-budget SECONDS stops the parse that long after start-up and prints what
+it has, with "partial": true, instead of being killed by the caller's timeout.
+
+A compressed demo (.gz, .xz, .zip, .7z) is decompressed once, up front, so
+--scan, --workers auto and the parse all see the demo inside; the index still
+knows it by the compressed file's size and MD5.
 """
 import sys
 import os
+import time
 import warnings
 import json
 from pathlib import Path
@@ -16,25 +27,194 @@ warnings.filterwarnings('ignore')
 current_dir = Path(__file__).parent
 sys.path.insert(0, str(current_dir))
 
+from demoparser.sources import is_compressed
 from renamer import suggest_name, parse_demo_metadata
 
+
+def get_workers(demo_file: Path, data=None) -> int:
+    """--workers N decodes on N processes; --workers auto lets the parser decide by size."""
+    if '--workers' not in sys.argv:
+        return 0
+    index = sys.argv.index('--workers')
+    value = sys.argv[index + 1] if index + 1 < len(sys.argv) else ''
+    if value == 'auto':
+        from demoparser.parallel import auto_workers
+        return auto_workers(str(demo_file), None if data is None else len(data))
+    try:
+        return int(value)
+    except ValueError:
+        print(f"Error: --workers expects a number or 'auto', got: {value!r}", file=sys.stderr)
+        sys.exit(1)
+
+
+def get_metrics_file():
+    """--metrics-file PATH (or DEMO_PROCESSOR_METRICS_FILE): add this run to a textfile-collector file."""
+    if '--metrics-file' in sys.argv:
+        index = sys.argv.index('--metrics-file')
+        return sys.argv[index + 1] if index + 1 < len(sys.argv) else None
+    return os.environ.get('DEMO_PROCESSOR_METRICS_FILE') or None
+
+
+def get_index():
+    """--index PATH (or DEMO_PROCESSOR_INDEX): answer known demos from the duplicate index (demo_index.py).
+
+    --index-ref REF records what the first upload of a demo was stored as.
+    """
+    path = None
+    if '--index' in sys.argv:
+        index = sys.argv.index('--index')
+        path = sys.argv[index + 1] if index + 1 < len(sys.argv) else None
+    path = path or os.environ.get('DEMO_PROCESSOR_INDEX') or None
+    ref = None
+    if '--index-ref' in sys.argv:
+        index = sys.argv.index('--index-ref')
+        ref = sys.argv[index + 1] if index + 1 < len(sys.argv) else None
+    return (Path(path), ref) if path else (None, None)
+
+
+def get_analyze():
+    """--analyze NAME[,NAME...] (or 'all'): run analyzers from demoparser/analyzers.py in the same parse."""
+    if '--analyze' not in sys.argv:
+        return ()
+    index = sys.argv.index('--analyze')
+    value = sys.argv[index + 1] if index + 1 < len(sys.argv) else ''
+    names = tuple(name for name in value.split(',') if name)
+    from demoparser.analyzers import ANALYZERS
+    unknown = [name for name in names if name != 'all' and name not in ANALYZERS]
+    if not names or unknown:
+        print(f"Error: --analyze expects a comma-separated list of {', '.join(ANALYZERS)} or 'all', got: {value!r}", file=sys.stderr)
+        sys.exit(1)
+    return names
+
+
+def get_deadline(started: float):
+    """--time-budget SECONDS: the time.monotonic() at which the parse returns what it has, or None."""
+    if '--time-budget' not in sys.argv:
+        return None
+    index = sys.argv.index('--time-budget')
+    value = sys.argv[index + 1] if index + 1 < len(sys.argv) else ''
+    try:
+        budget = float(value)
+    except ValueError:
+        budget = 0.0
+    if budget <= 0:
+        print(f"Error: --time-budget expects a positive number of seconds, got: {value!r}", file=sys.stderr)
+        sys.exit(1)
+    return started + budget
+
+
+def get_stdin_demo():
+    """(name, bytes) for `-`: the demo from stdin, named by --name NAME."""
+    name = None
+    if '--name' in sys.argv:
+        index = sys.argv.index('--name')
+        name = sys.argv[index + 1] if index + 1 < len(sys.argv) else None
+    if not name or Path(name).name != name:
+        print("Error: reading a demo from stdin needs --name <original file name>", file=sys.stderr)
+        sys.exit(1)
+    return Path(name), sys.stdin.buffer.read()
+
+
+def get_compressed_demo(demo_file: Path, output_json: bool):
+    """(path of the demo inside, its bytes) for a compressed demo; exits on a bad archive."""
+    from demoparser.sources import read_demo
+    try:
+        name, data = read_demo(demo_file)
+    except Exception as e:
+        if output_json:
+            print(json.dumps({"error": str(e)}), file=sys.stderr)
+        else:
+            print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    return demo_file.parent / name, data
+
+
+def get_metadata(demo_file: Path, workers: int, index_path, index_ref, analyze=(), data=None, deadline=None, key=None):
+    """--fingerprint adds the run fingerprint (demoparser/fingerprint.py); the index always records it.
+
+    `key` is the (size, MD5) the index knows the demo by, when that is not of `data`.
+    """
+    fingerprint = '--fingerprint' in sys.argv
+    # Indexed metadata carries no analysis, so analyzing always parses.
+    if not index_path or analyze:
+        return parse_demo_metadata(demo_file, workers=workers, analyze=analyze, data=data, deadline=deadline, fingerprint=fingerprint)
+    from demo_index import metadata_with_index
+    return metadata_with_index(index_path, demo_file,
+                               lambda demo: parse_demo_metadata(demo, workers=workers, data=data, deadline=deadline, fingerprint=True),
+                               index_ref, data, key)
+
+
+def scan(demo_file: Path, data=None) -> None:
+    """--scan: framing statistics from the message headers alone, no decoding (demoparser/framing.py).
+
+    Prints them as JSON, with the estimated parse time and whether the demo
+    belongs in the large-demo lane; exits 1 when the file is unusable.
+    """
+    from demoparser.framing import scan_buffer, scan_framing
+    from scheduling import LARGE_DEMO_BYTES
+
+    result = (scan_framing(str(demo_file)) if data is None else scan_buffer(data)).to_dict()
+    result['large'] = result['file_bytes'] >= LARGE_DEMO_BYTES
+    print(json.dumps(result))
+    sys.exit(1 if result['broken'] else 0)
+
+
+def write_metrics(metrics_file: str) -> None:
+    import metrics
+    try:
+        metrics.accumulate_textfile(metrics_file)
+    except OSError as e:
+        print(f"Warning: could not write metrics to {metrics_file}: {e}", file=sys.stderr)
+
+
 def main():
+    metrics_file = get_metrics_file()
+    try:
+        process()
+    finally:
+        if metrics_file:
+            write_metrics(metrics_file)
+
+
+def process():
+    started = time.monotonic()
     if len(sys.argv) < 2:
-        print("Usage: process_single_demo.py <demo_file> [--json]", file=sys.stderr)
+        print("Usage: process_single_demo.py <demo_file> [--json] [--workers N|auto] [--metrics-file PATH] [--index PATH [--index-ref REF]] [--analyze NAMES]"
+              " [--time-budget SECONDS] [--fingerprint]", file=sys.stderr)
+        print("       process_single_demo.py <demo_file> --scan", file=sys.stderr)
+        print("       process_single_demo.py - --name <original file name> [options]   (demo on stdin)", file=sys.stderr)
         sys.exit(1)
 
-    demo_file = Path(sys.argv[1])
     output_json = '--json' in sys.argv
+    data = None
+    if sys.argv[1] == '-':
+        demo_file, data = get_stdin_demo()
+    else:
+        demo_file = Path(sys.argv[1])
+        if not demo_file.exists():
+            print(f"Error: Demo file not found: {demo_file}", file=sys.stderr)
+            sys.exit(1)
 
-    if not demo_file.exists():
-        print(f"Error: Demo file not found: {demo_file}", file=sys.stderr)
-        sys.exit(1)
+    index_path, index_ref = get_index()
+    key = None
+    if data is None and is_compressed(demo_file):
+        if index_path:
+            from demo_index import content_key
+            key = content_key(demo_file)
+        demo_file, data = get_compressed_demo(demo_file, output_json)
+
+    if '--scan' in sys.argv:
+        scan(demo_file, data)
+
+    workers = get_workers(demo_file, data)
+    analyze = get_analyze()
+    deadline = get_deadline(started)
 
     # Get suggested name using the new Python implementation
     try:
         if output_json:
             # Output full metadata as JSON
-            metadata = parse_demo_metadata(demo_file)
+            metadata = get_metadata(demo_file, workers, index_path, index_ref, analyze, data, deadline, key)
             if metadata:
                 print(json.dumps(metadata))
                 sys.exit(0)
@@ -43,7 +223,11 @@ def main():
                 sys.exit(1)
         else:
             # Original behavior: output just the suggested filename
-            suggested = suggest_name(demo_file)
+            if index_path:
+                metadata = get_metadata(demo_file, workers, index_path, index_ref, data=data, deadline=deadline, key=key)
+                suggested = metadata['suggested_filename'] if metadata else None
+            else:
+                suggested = suggest_name(demo_file, workers=workers, data=data, deadline=deadline)
             if suggested:
                 print(suggested)
                 sys.exit(0)
@@ -18,6 +18,19 @@ from ext import Ext, ListMap
 from game_info import GameInfo
 
 
+@dataclass
+class TimedRun:
+    """One correct finish: start and finish snapshots, its time and checkpoint splits."""
+    startServerTime: int
+    finishServerTime: int
+    time: int
+    timeHasError: bool
+    checkpoints: List[int]
+    isTr: bool
+    startMessage: int
+    finishMessage: int
+
+
 @dataclass
 class RawInfo:
     demoPath: str
@@ -28,10 +41,16 @@ class RawInfo:
     clientEvents: List[ClientEvent] = field(init=False)
     lastClientEvent: Optional[ClientEvent] = field(init=False)
     fin: Optional[Tuple[str, ClientEvent]] = field(init=False)
+    runs: List[TimedRun] = field(init=False)
     maxSpeed: int = field(init=False)
     isCpmInSnapshots: Optional[bool] = field(init=False)
     gameInfo: GameInfo | None = field(init=False)
     cpData: List[int] = field(default_factory=list)
+    # The demo itself, when it was parsed from memory rather than from demoPath.
+    demoData: Optional[bytes] = field(default=None, repr=False)
+    # How far a parse stopped by its deadline got (Q3DemoParser.parse_config);
+    # None when the whole demo was parsed.
+    progress: Optional[Dict[str, float]] = field(default=None)
 
     # constants
     keyDemoName = "demoname"
@@ -49,6 +68,7 @@ class RawInfo:
         self.consoleComandsParser = ConsoleComandsParser(self.clc.console)
         self.clientEvents = list(self.client.clientEvents)
         self.lastClientEvent = self.client.lastClientEvent
+        self.runs = []
         self.fin = self._get_correct_finish_event()
         self.maxSpeed = self.client.maxSpeed
         self.isCpmInSnapshots = self.client.isCpmInSnapshots
@@ -100,6 +120,30 @@ class RawInfo:
                 return info
         return None
 
+    # ------------------------------------------------------------------
+    def getRunsInfo(self) -> List[Dict[str, object]]:
+        """Every correct run, with the byte range of its start and finish messages for cropping."""
+        if not self.runs:
+            return []
+        from demoparser.parser import message_offsets
+        sequences = [run.startMessage for run in self.runs] + [run.finishMessage for run in self.runs]
+        offsets = message_offsets(self.demoPath, sequences, self.demoData)
+        return [
+            {
+                'start_server_time': run.startServerTime,
+                'finish_server_time': run.finishServerTime,
+                'time_ms': run.time,
+                'time_has_error': run.timeHasError,
+                'checkpoints': run.checkpoints,
+                'is_tr': run.isTr,
+                'start_message': run.startMessage,
+                'finish_message': run.finishMessage,
+                'start_offset': offsets.get(run.startMessage, (None, None))[0],
+                'finish_offset': offsets.get(run.finishMessage, (None, None))[1],
+            }
+            for run in self.runs
+        ]
+
     # ------------------------------------------------------------------
     def _build_game_info(self) -> GameInfo:
         client_cfg = split_config(self.rawConfig.get(const.Q3_DEMO_CFG_FIELD_CLIENT)) if self.rawConfig.get(const.Q3_DEMO_CFG_FIELD_CLIENT) else {}
@@ -110,33 +154,58 @@ class RawInfo:
 
     # ------------------------------------------------------------------
     def _get_correct_finish_event(self) -> Optional[Tuple[str, ClientEvent]]:
+        """The fastest correct finish; every correct one is kept in `runs`, in demo order."""
         correct: List[Tuple[str, ClientEvent]] = []
         for idx in range(len(self.clientEvents) - 1, -1, -1):
-            finish_type = self._is_finish_correct(idx)
+            finish_type, start_idx = self._check_finish(idx)
             ev = self.clientEvents[idx]
             if finish_type != self.FinishType.INCORRECT and ev.timeNoError > 0:
                 correct.append((finish_type, ev))
+                self.runs.append(self._timed_run(finish_type, start_idx, idx))
+        self.runs.reverse()
         if correct:
             return min(correct, key=lambda item: item[1].timeNoError)
         return None
 
+    def _timed_run(self, finish_type: str, start_idx: int, finish_idx: int) -> TimedRun:
+        start = self.clientEvents[start_idx]
+        finish = self.clientEvents[finish_idx]
+        return TimedRun(
+            startServerTime=start.serverTime,
+            finishServerTime=finish.serverTime,
+            time=finish.timeNoError,
+            timeHasError=finish.timeHasError,
+            checkpoints=[
+                ev.serverTime - start.serverTime
+                for ev in self.clientEvents[start_idx + 1:finish_idx] if ev.eventCheckPoint
+            ],
+            isTr=finish_type == self.FinishType.CORRECT_TR,
+            startMessage=start.messageNum,
+            finishMessage=finish.messageNum,
+        )
+
     def _is_finish_correct(self, index: int) -> str:
+        return self._check_finish(index)[0]
+
+    def _check_finish(self, index: int) -> Tuple[str, int]:
+        """Finish type of the event at `index`, and the index of the start or reset it is timed from."""
         events = self.clientEvents
         current = events[index]
         if not current.eventFinish:
-            return self.FinishType.INCORRECT
+            return self.FinishType.INCORRECT, -1
         for prev_index in range(index - 1, -1, -1):
             prev = events[prev_index]
             if prev.eventChangePmType or prev.eventFinish:
-                return self.FinishType.INCORRECT
+                return self.FinishType.INCORRECT, -1
             current.timeByServerTime = current.serverTime - prev.serverTime
             if prev.eventTimeReset:
-                return self.FinishType.CORRECT_TR
+                return self.FinishType.CORRECT_TR, prev_index
             if prev.eventStartTime:
-                return self.FinishType.CORRECT_TR if self._has_start_before(prev_index) else self.FinishType.CORRECT_START
+                finish_type = self.FinishType.CORRECT_TR if self._has_start_before(prev_index) else self.FinishType.CORRECT_START
+                return finish_type, prev_index
             if prev.eventStartFile or prev.eventChangeUser:
-                return self.FinishType.INCORRECT
-        return self.FinishType.INCORRECT
+                return self.FinishType.INCORRECT, -1
+        return self.FinishType.INCORRECT, -1
 
     def _has_start_before(self, index: int) -> bool:
         events = self.clientEvents
@@ -4,22 +4,70 @@ Linux-compatible reimplementation of DemoCleaner3's FileHelper.renameFile logic.
 """
 from __future__ import annotations
 
-import argparse
 import sys
 import os
 import stat
+import time
 from dataclasses import dataclass
 from enum import Enum
 from pathlib import Path
-from typing import Callable, Optional
-if __package__ in (None, ""):
-    from demoparser.parser import Q3DemoParser
-    from demo import Demo
-else:
-    from .demoparser.parser import Q3DemoParser
-    from .demo import Demo
+from typing import Callable, Dict, Optional, Sequence, Set
 
 
+def _load_pipeline():
+    """Import the parser and the naming/validation layers on first use.
+
+    Every upload spawns a fresh interpreter for this module, and the parser,
+    `demo`, `raw_info` and their regex and datetime trees are most of its
+    start-up time. Callers that only rename files never need them at all.
+    """
+    if __package__ in (None, ""):
+        from demoparser.parser import Q3DemoParser
+        from demo import Demo
+    else:
+        from .demoparser.parser import Q3DemoParser
+        from .demo import Demo
+    return Q3DemoParser, Demo
+
+
+def _parse_demo(file_path: Path, workers: int = 0, analyzers=None, data=None, deadline=None):
+    """Parse a demo and build its Demo; (raw, demo), or None if either step fails.
+
+    `analyzers` (demoparser/analyzers.py) are fed during the same parse.
+    With `data` (bytes-like, or a binary stream), the demo is parsed from it
+    and `file_path` only names it. With a `deadline` (time.monotonic()), the
+    parse stops there and raw.progress says how far it got.
+
+    Every attempt is recorded in the process's metrics (metrics.py).
+    """
+    Q3DemoParser, Demo = _load_pipeline()
+    if __package__ in (None, ""):
+        import metrics
+        from demoparser.huffman import decoded_symbol_count
+    else:
+        from . import metrics
+        from .demoparser.huffman import decoded_symbol_count
+
+    if data is not None and hasattr(data, 'read'):
+        data = data.read()
+    raw = demo = failure = None
+    symbols = decoded_symbol_count()
+    started = time.perf_counter()
+    try:
+        raw = Q3DemoParser(str(file_path), workers=workers, analyzers=analyzers, data=data, deadline=deadline).parse_config()
+        demo = Demo.GetDemoFromRawInfo(raw)
+    except Exception as e:
+        failure = e
+    seconds = time.perf_counter() - started
+    ok = demo is not None and not demo.hasError
+
+    try:
+        size = os.path.getsize(file_path) if data is None else len(data)
+    except OSError:
+        size = 0
+    logged = raw.clc.errors if raw is not None else {}
+    metrics.observe_parse(size, seconds, decoded_symbol_count() - symbols, logged, failure, ok)
+    return (raw, demo) if ok else None
 
 
 class RenameStatus(Enum):
@@ -67,14 +115,56 @@ class FileLogger(Logger):
             handle.write("-------------------------------\n")
 
 
+class DirectoryIndex:
+    """The names in one directory, read with a single scan and kept in memory.
+
+    Keyed case-insensitively: `in` is an exact match, as on the filesystem,
+    and matching() finds every name that differs only in case. Only correct
+    while nothing but the owning FileRenamer adds or removes files in the
+    directory.
+    """
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = Path(directory)
+        self._names: Dict[str, Set[str]] = {}
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                self.add(entry.name)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._names.get(name.lower(), ())
+
+    def matching(self, name: str) -> Set[str]:
+        """Every name in the directory equal to `name` ignoring case."""
+        return set(self._names.get(name.lower(), ()))
+
+    def add(self, name: str) -> None:
+        self._names.setdefault(name.lower(), set()).add(name)
+
+    def discard(self, name: str) -> None:
+        key = name.lower()
+        names = self._names.get(key)
+        if names is None:
+            return
+        names.discard(name)
+        if not names:
+            del self._names[key]
+
+
 class FileRenamer:
-    """Port of DemoCleaner3.ExtClasses.FileHelper.renameFile for Linux environments."""
+    """Port of DemoCleaner3.ExtClasses.FileHelper.renameFile for Linux environments.
+
+    With `use_index`, each directory is scanned once into a DirectoryIndex and
+    existence and collision checks are answered from it instead of a stat per
+    file - on network storage with 100k demos those dominate a batch rename.
+    """
 
     def __init__(
         self,
         on_progress: Optional[Callable[[int], None]] = None,
         on_percent: Optional[Callable[[int], None]] = None,
         logger: Optional[Logger] = None,
+        use_index: bool = False,
     ) -> None:
         self._on_progress = on_progress
         self._on_percent = on_percent
@@ -83,6 +173,8 @@ class FileRenamer:
         self.count_delete_files = 0
         self.count_progress_demos = 0
         self.count_demos_amount = 0
+        self.use_index = use_index
+        self._indexes: Dict[Path, DirectoryIndex] = {}
 
     def set_total(self, total: int) -> None:
         """Set total demos to allow percent callbacks."""
@@ -95,10 +187,29 @@ class FileRenamer:
         if by_value > 0:
             self._update_progress(by_value)
 
+    def index_for(self, directory: Path) -> DirectoryIndex:
+        """The directory's name index, scanning it on first use."""
+        directory = Path(directory)
+        index = self._indexes.get(directory)
+        if index is None:
+            index = self._indexes[directory] = DirectoryIndex(directory)
+        return index
+
+    def relocate(self, source: Path, target: Path) -> None:
+        """Move a file to another path, keeping any scanned index in sync."""
+        os.replace(source, target)
+        self._forget(source)
+        self._remember(target)
+
+    def delete(self, path: Path) -> None:
+        """Delete a file, keeping any scanned index in sync."""
+        self._try_operate(path, path.unlink)
+        self._forget(path)
+
     def rename_file(self, file_path: Path | str, new_name: str, delete_identical: bool = False) -> RenameOutcome:
         """Rename a single file following DemoCleaner3 rules."""
         source = Path(file_path)
-        if not source.exists():
+        if not self._exists(source):
             raise FileNotFoundError(f"File not found: {source}")
 
         if Path(new_name).name != new_name:
@@ -109,12 +220,15 @@ class FileRenamer:
         target_lower = str(target).lower()
 
         if source_lower != target_lower:
-            if target.exists():
+            if self._exists(target):
                 if delete_identical:
                     self._delete_file(source)
                     return RenameOutcome(RenameStatus.DELETED_DUPLICATE, source, target)
                 self._update_progress()
                 return RenameOutcome(RenameStatus.SKIPPED_EXISTING, source, target)
+            if self._case_collision(target):
+                self._update_progress()
+                return RenameOutcome(RenameStatus.SKIPPED_EXISTING, source, target)
             self._move_file(source, target)
             return RenameOutcome(RenameStatus.RENAMED, source, target)
 
@@ -127,6 +241,31 @@ class FileRenamer:
 
     # Internal helpers -------------------------------------------------
 
+    def _exists(self, path: Path) -> bool:
+        if not self.use_index:
+            return path.exists()
+        return path.name in self.index_for(path.parent)
+
+    def _case_collision(self, target: Path) -> bool:
+        """Whether the index holds a name that differs from `target` only in case.
+
+        On a case-insensitive mount os.replace would overwrite that file, so in
+        index mode such a target is skipped - never deleted over, never moved onto.
+        """
+        if not self.use_index:
+            return False
+        return bool(self.index_for(target.parent).matching(target.name))
+
+    def _remember(self, path: Path) -> None:
+        index = self._indexes.get(path.parent)
+        if index is not None:
+            index.add(path.name)
+
+    def _forget(self, path: Path) -> None:
+        index = self._indexes.get(path.parent)
+        if index is not None:
+            index.discard(path.name)
+
     def _update_progress(self, increment: int = 1) -> None:
         if increment <= 0:
             return
@@ -141,6 +280,7 @@ class FileRenamer:
 
     def _delete_file(self, path: Path) -> None:
         self._try_operate(path, path.unlink)
+        self._forget(path)
         self.count_delete_files += 1
         self._update_progress()
         self.logger.log("DeleteFile", str(path))
@@ -150,6 +290,8 @@ class FileRenamer:
             os.replace(source, target)
 
         self._try_operate(source, _rename)
+        self._forget(source)
+        self._remember(target)
         self.count_move_files += 1
         self._update_progress()
         self.logger.log("RenameFile", str(source), str(target))
@@ -169,32 +311,70 @@ class FileRenamer:
             pass
 
 
-def suggest_name(file_path: Path) -> Optional[str]:
-    try:
-        parser = Q3DemoParser(str(file_path))
-        raw = parser.parse_config()
-        demo = Demo.GetDemoFromRawInfo(raw)
-    except Exception:
+def suggest_name(file_path: Path, workers: int = 0, data=None, deadline=None) -> Optional[str]:
+    """The filename DemoCleaner3 would give the demo, or None.
+
+    With `data` (bytes-like, or a binary stream), the demo is read from it and
+    `file_path` is just its original name. With a `deadline`
+    (time.monotonic()), the name comes from whatever was parsed by then.
+    """
+    parsed = _parse_demo(file_path, workers, data=data, deadline=deadline)
+    if parsed is None:
+        return None
+    return Path(parsed[1].demoNewName).name
+
+
+def _run_fingerprint(demo, raw, trail) -> Optional[str]:
+    if __package__ in (None, ""):
+        from demoparser.fingerprint import run_fingerprint
+    else:
+        from .demoparser.fingerprint import run_fingerprint
+
+    if raw.fin is None:
         return None
-    if demo.hasError:
+    finish = raw.fin[1]
+    found = trail.near(finish.serverTime)
+    if found is None:
         return None
-    return Path(demo.demoNewName).name
+    return run_fingerprint(demo.mapName, demo.playerName, finish.timeNoError, *found)
 
 
-def parse_demo_metadata(file_path: Path) -> Optional[dict]:
+def parse_demo_metadata(file_path: Path, workers: int = 0, analyze: Sequence[str] = (), data=None, deadline=None,
+                        fingerprint: bool = False) -> Optional[dict]:
     """
     Parse demo file and return metadata including record date.
     Returns dict with: suggested_filename, record_date (ISO format)
+    `workers` > 1 decodes the demo on that many processes (demoparser/parallel.py).
+    `analyze` names analyzers (demoparser/analyzers.py) to run in the same
+    parse; their results go under "analysis", keyed by name.
+    `data` (bytes-like, or a binary stream) is the demo when it is not read
+    from `file_path`, which then only names it.
+    `deadline` (time.monotonic()) cuts the parse short: what was decoded by
+    then is returned with "partial": true and "progress" - messages and
+    bytes parsed, the fraction of the file, and seconds spent.
+    With `fingerprint`, "fingerprint" identifies the fastest run itself
+    rather than the file (demoparser/fingerprint.py), or is None when the demo
+    has no finish. Its analyzer runs on every snapshot, so it is only added
+    when asked for.
     """
-    try:
-        parser = Q3DemoParser(str(file_path))
-        raw = parser.parse_config()
-        demo = Demo.GetDemoFromRawInfo(raw)
-    except Exception:
-        return None
-
-    if demo.hasError:
+    analyzers = []
+    if analyze:
+        if __package__ in (None, ""):
+            from demoparser.analyzers import create
+        else:
+            from .demoparser.analyzers import create
+        analyzers = create(analyze)
+    trail = None
+    if fingerprint:
+        if __package__ in (None, ""):
+            from demoparser.fingerprint import FinishTrail
+        else:
+            from .demoparser.fingerprint import FinishTrail
+        trail = FinishTrail()
+    parsed = _parse_demo(file_path, workers, analyzers + ([trail] if trail else []), data, deadline)
+    if parsed is None:
         return None
+    raw, demo = parsed
 
     # The cvars the site has rules about, as the demo recorded them - the ones
     # that passed as well as the ones that did not. `validity` only lists what
@@ -233,15 +413,25 @@ def parse_demo_metadata(file_path: Path) -> Optional[dict]:
         "validity": demo.validDict if demo.validDict else None,
         "q3df_login_name": demo.q3dfLoginName if getattr(demo, 'q3dfLoginName', None) else None,
         "q3df_login_name_colored": demo.q3dfLoginNameColored if getattr(demo, 'q3dfLoginNameColored', None) else None,
+        "runs": raw.getRunsInfo(),
         "_debug_original_filename": str(file_path.name),
         "_debug_normalized_filename": demo.normalizedFileName if hasattr(demo, 'normalizedFileName') else None,
         "_debug_demo_country": demo.country if hasattr(demo, 'country') else None,
     }
+    if analyzers:
+        metadata["analysis"] = {analyzer.name: analyzer.result() for analyzer in analyzers}
+    if trail is not None:
+        metadata["fingerprint"] = _run_fingerprint(demo, raw, trail)
+    if raw.progress is not None:
+        metadata["partial"] = True
+        metadata["progress"] = raw.progress
 
     return metadata
 
 
-def _build_cli() -> argparse.ArgumentParser:
+def _build_cli():
+    import argparse
+
     parser = argparse.ArgumentParser(description="Rename a file using DemoCleaner3 rules.")
     parser.add_argument("file", type=Path, help="Path to the demo file to rename")
     parser.add_argument("new_name", nargs="?", help="Optional explicit filename within the same directory")
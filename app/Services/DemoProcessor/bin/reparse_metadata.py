@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Incremental reparse: parse many stored demos again and report only what changed.
+
+Reads JSON lines of {"id": ..., "path": ..., "previous": {metadata}} - the
+previous metadata in the shape process_single_demo.py --json prints - parses
+the demos on a pool of worker processes and writes one JSON line per demo whose
+suggested filename, validity, time, player or settings came out different:
+
+    {"id": 17, "changes": {"player_name": ["defrag", "Tester"],
+                           "settings.sv_fps": ["125", "30"]}, "metadata": {...}}
+
+Dict fields are compared key by key, so a change names the one cvar or
+validity entry that moved. Unchanged demos produce no output at all, so the
+database writes and PHP work that follow scale with the number of changes
+rather than with the size of the archive. Demos that cannot be read or parsed
+are counted and listed on stderr.
+
+Usage: reparse_metadata.py <input.jsonl|-> [--output FILE] [--workers N]
+"""
+import argparse
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
+
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir))
+
+# Metadata keys a reparse can correct; everything else is left to the caller.
+COMPARED_FIELDS = ('suggested_filename', 'validity', 'time_seconds', 'player_name', 'settings')
+
+
+def diff_metadata(previous: dict, current: dict, fields=COMPARED_FIELDS) -> Dict[str, list]:
+    """{field: [was, now]}, with dict fields split into 'field.key' entries."""
+    changes: Dict[str, list] = {}
+    for field in fields:
+        was = previous.get(field)
+        now = current.get(field)
+        if isinstance(was, dict) or isinstance(now, dict):
+            was = was or {}
+            now = now or {}
+            for key in sorted(set(was) | set(now)):
+                if was.get(key) != now.get(key):
+                    changes[f'{field}.{key}'] = [was.get(key), now.get(key)]
+        elif was != now:
+            changes[field] = [was, now]
+    return changes
+
+
+def reparse_one(entry: dict) -> dict:
+    """Worker side: parse one demo and diff it. Never raises."""
+    from renamer import parse_demo_metadata
+
+    result: dict = {'id': entry.get('id')}
+    try:
+        metadata = parse_demo_metadata(Path(entry['path']))
+    except Exception as e:
+        result['error'] = str(e)
+        return result
+    if not metadata:
+        result['error'] = 'Could not parse demo file'
+        return result
+    changes = diff_metadata(entry.get('previous') or {}, metadata)
+    if changes:
+        result['changes'] = changes
+        result['metadata'] = metadata
+    return result
+
+
+def read_entries(handle) -> Iterator[Tuple[int, Optional[dict]]]:
+    """(line number, entry) for every non-blank line; entry is None when the line is not usable."""
+    for line_number, line in enumerate(handle, start=1):
+        if not line.strip():
+            continue
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            yield line_number, None
+            continue
+        yield line_number, entry if isinstance(entry, dict) and entry.get('path') else None
+
+
+def run(entries, output, workers: int) -> dict:
+    """Parse every entry, writing changed records to `output` in input order."""
+    stats = {'read': 0, 'changed': 0, 'unchanged': 0, 'failed': 0}
+    failures: List[str] = []
+    in_flight: Deque = deque()
+
+    def drain(limit: int) -> None:
+        while len(in_flight) > limit:
+            result = in_flight.popleft().result()
+            if 'error' in result:
+                stats['failed'] += 1
+                failures.append(f"{result['id']}: {result['error']}")
+            elif 'changes' in result:
+                stats['changed'] += 1
+                output.write(json.dumps(result) + '\n')
+            else:
+                stats['unchanged'] += 1
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for line_number, entry in entries:
+            stats['read'] += 1
+            if entry is None:
+                stats['failed'] += 1
+                failures.append(f'line {line_number}: not an entry with a path')
+                continue
+            in_flight.append(pool.submit(reparse_one, entry))
+            # Bounded, so a long input never sits in memory as pending futures.
+            drain(2 * workers)
+        drain(0)
+
+    for failure in failures:
+        print(f'  {failure}', file=sys.stderr)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Parse stored demos again and emit only the metadata that changed')
+    parser.add_argument('input', help='JSON lines of {"id", "path", "previous"}, or - for stdin')
+    parser.add_argument('--output', type=Path, help='Write changed records here instead of stdout')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Parser processes (default: CPU count)')
+    args = parser.parse_args()
+
+    source = sys.stdin if args.input == '-' else open(args.input, encoding='utf-8')
+    output = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    try:
+        stats = run(read_entries(source), output, max(1, args.workers))
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+    print(f"Read: {stats['read']}, changed: {stats['changed']}, unchanged: {stats['unchanged']}, failed: {stats['failed']}",
+          file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
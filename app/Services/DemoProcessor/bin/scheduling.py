@@ -0,0 +1,110 @@
+"""
+Size-aware ordering for the batch and pool modes.
+
+Parse time grows roughly with demo size, so feeding a pool in directory order
+can leave one huge demo started last while every other worker sits idle.
+Pools here take the longest demos first, and demos over LARGE_DEMO_BYTES go to
+a lane of their own - one process per demo, killed after a timeout - so a
+pathological file can neither hold up the small demos behind it nor keep a
+worker forever.
+"""
+import multiprocessing
+import os
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+LARGE_DEMO_BYTES = 64 * 1024 * 1024
+LARGE_DEMO_TIMEOUT = 600.0
+
+
+def demo_size(path) -> int:
+    """st_size, or 0 for a path that cannot be stat'ed (it fails fast anyway)."""
+    try:
+        return os.stat(path).st_size
+    except OSError:
+        return 0
+
+
+def longest_first(paths: Iterable, size=demo_size) -> list:
+    """`paths` by descending size; equal sizes keep their order."""
+    return sorted(paths, key=size, reverse=True)
+
+
+def split_lanes(paths: Iterable, large_bytes: int = LARGE_DEMO_BYTES, size=demo_size) -> Tuple[list, list]:
+    """(ordinary, large) paths, each longest first."""
+    ordinary, large = [], []
+    sized = sorted(((size(path), path) for path in paths), key=lambda item: item[0], reverse=True)
+    for length, path in sized:
+        (large if large_bytes and length >= large_bytes else ordinary).append(path)
+    return ordinary, large
+
+
+def _run_job(connection, function: Callable, args: tuple) -> None:
+    try:
+        outcome = (True, function(*args))
+    except BaseException as e:
+        outcome = (False, f'{type(e).__name__}: {e}')
+    connection.send(outcome)
+    connection.close()
+
+
+class TimeoutLane:
+    """Runs each job in a process of its own and kills it after `timeout` seconds.
+
+    A ProcessPoolExecutor cannot cancel a task that has started, so the
+    pathological demos get this instead; a process per demo costs nothing
+    next to parsing one.
+    """
+
+    def __init__(self, workers: int = 1, timeout: Optional[float] = LARGE_DEMO_TIMEOUT) -> None:
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self._jobs: Dict[Any, tuple] = {}
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    @property
+    def has_room(self) -> bool:
+        return len(self._jobs) < self.workers
+
+    def submit(self, key, function: Callable, *args) -> None:
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        process = multiprocessing.Process(target=_run_job, args=(sender, function, args), daemon=True)
+        process.start()
+        sender.close()
+        deadline = time.monotonic() + self.timeout if self.timeout else None
+        self._jobs[key] = (process, receiver, deadline)
+
+    def poll(self) -> List[Tuple[Any, Any, Optional[str]]]:
+        """(key, result, error) for every job that finished, failed or timed out since the last call."""
+        finished = []
+        now = time.monotonic()
+        for key, (process, receiver, deadline) in list(self._jobs.items()):
+            # Liveness first: a job that sends its result and exits between
+            # the two checks must not be reported as having died.
+            alive = process.is_alive()
+            if receiver.poll():
+                try:
+                    ok, value = receiver.recv()
+                except EOFError:
+                    ok, value = False, f'worker exited with code {process.exitcode}'
+                finished.append((key, value if ok else None, None if ok else value))
+            elif not alive:
+                finished.append((key, None, f'worker exited with code {process.exitcode}'))
+            elif deadline is not None and now > deadline:
+                process.kill()
+                finished.append((key, None, f'timed out after {self.timeout:g} s'))
+            else:
+                continue
+            process.join()
+            receiver.close()
+            del self._jobs[key]
+        return finished
+
+    def close(self) -> None:
+        for process, receiver, _ in self._jobs.values():
+            process.kill()
+            process.join()
+            receiver.close()
+        self._jobs.clear()
@@ -63,6 +63,16 @@ public function processDemo(UploadedDemo $demo)
             // Parse the output to extract metadata
             $metadata = $this->parseRenamerOutput($output);
 
+            // A parse stopped by its time budget has only seen the start of
+            // the demo: the time and the name may belong to a slower run than
+            // the best one, or be missing. None of it may become a record, so
+            // the demo fails (and keeps how far it got) for a retry.
+            if (! empty($metadata['partial'])) {
+                $progress = $metadata['progress'] ?? [];
+                throw new \Exception('Demo parse ran out of time after ' . round(($progress['fraction'] ?? 0) * 100, 1)
+                    . '% of the file, partial result discarded: ' . json_encode($progress));
+            }
+
             // Use suggested filename if available, otherwise keep original
             $processedFilename = $metadata['suggested_filename'] ?? $demo->original_filename;
 
@@ -285,9 +295,14 @@ protected function runBatchDemoRenamer($filepath)
         $fileSizeMB = filesize($filepath) / 1024 / 1024;
         $processTimeout = max(120, 120 + (int)($fileSizeMB * 3));
 
-        // Use Symfony Process to properly manage child process lifecycle
+        // The parser stops a little before the timeout and returns what it has
+        // decoded so far, marked partial, instead of being killed with nothing.
+        $timeBudget = $processTimeout - 15;
+
+        // Use Symfony Process to properly manage child process lifecycle.
+        // --workers auto lets the processor split a very large demo across cores.
         $process = new Process(
-            ['python3', '-W', 'ignore', $processSingleScript, $filepath, '--json'],
+            ['python3', '-W', 'ignore', $processSingleScript, $filepath, '--json', '--workers', 'auto', '--time-budget', (string) $timeBudget],
             dirname($this->batchRenamerPath),
         );
         $process->setTimeout($processTimeout);
@@ -329,6 +344,17 @@ protected function parseRenamerOutput($output)
             $metadata['record_date'] = $jsonData['record_date'] ?? null;
             $metadata['validity'] = $jsonData['validity'] ?? null;
 
+            // The parse ran out of time: everything below comes from the part
+            // of the demo that was decoded.
+            if (! empty($jsonData['partial'])) {
+                $metadata['partial'] = true;
+                $metadata['progress'] = $jsonData['progress'] ?? null;
+                Log::warning('Demo parsed only partially before the time budget ran out', [
+                    'suggested_filename' => $jsonData['suggested_filename'],
+                    'progress' => $jsonData['progress'] ?? null,
+                ]);
+            }
+
             // Use fields directly from JSON when available (more reliable than regex parsing)
             if (isset($jsonData['map_name'])) {
                 $metadata['map'] = $jsonData['map_name'];